@@ -1,9 +1,17 @@
+from __future__ import annotations
+
+import os
+import shutil
 from functools import cache
+from typing import TYPE_CHECKING, Optional
+
+from RePoE.parser import manifest, profiler, tracking
 
-from PyPoE.poe.file.dat import RelationalReader
-from PyPoE.poe.file.file_system import FileSystem
-from PyPoE.poe.file.shared.cache import AbstractFileCache
-from PyPoE.poe.file.translations import TranslationFileCache
+# PyPoE is only imported once a module runs, so that the command line and the registry start without it
+if TYPE_CHECKING:
+    from PyPoE.poe.file.dat import RelationalReader
+    from PyPoE.poe.file.file_system import FileSystem
+    from PyPoE.poe.file.shared.cache import AbstractFileCache
 
 
 class Parser_Module:
@@ -13,6 +21,19 @@ class Parser_Module:
     caches: dict[type, AbstractFileCache]
     language: str
 
+    # outputs of other modules (file names relative to data_path, without extension) that write() reads back in
+    inputs: list[str] = []
+    # outputs written by write(), defaults to the module name
+    outputs: list[str] = []
+    # fields of the outputs holding translated text: None to run write() in every language,
+    # otherwise the other languages are derived from the English outputs with localize()
+    localized_fields: Optional[list[str]] = None
+    # whether the module only depends on game files and inputs, so that incremental runs can skip it if those are
+    # unchanged. modules reading anything else, e.g. from the network, have to opt out
+    incremental = True
+    # dat files read by write(), decoded in the background while the modules before it run when prefetching
+    dat_files: list[str] = []
+
     def __init__(
         self,
         file_system: FileSystem,
@@ -59,13 +80,39 @@ class Parser_Module:
         return filename.strip()
 
     def get_cache(self, cache_type: type) -> AbstractFileCache:
+        from PyPoE.poe.file.translations import TranslationFileCache
+
         if cache_type not in self.caches:
             if cache_type == TranslationFileCache:
                 self.caches[cache_type] = cache_type(self.file_system, sequel=self.sequel)
             else:
                 self.caches[cache_type] = cache_type(self.file_system)
+            tracking.track_cache(self.caches[cache_type])
         return self.caches[cache_type]
 
+    @classmethod
+    def output_names(cls) -> list[str]:
+        return cls.outputs or [cls.__name__]
+
     def write(self) -> None:
         """method which writes json files to data_path"""
         raise NotImplementedError
+
+    def localize(self, english_data_path: str) -> None:
+        """
+        method which writes json files to data_path based on the English ones in english_data_path,
+        only re-reading the localized_fields. outputs without localized fields are copied as they are.
+        """
+        if self.localized_fields:
+            raise NotImplementedError
+        for output in self.output_names():
+            self.copy_output(english_data_path, output)
+
+    def copy_output(self, english_data_path: str, output: str) -> None:
+        os.makedirs(os.path.dirname(self.data_path + output), exist_ok=True)
+        for extension in [".json", ".min.json"]:
+            print(f"Copying '{output}{extension}' from '{english_data_path}' ...", end="", flush=True)
+            shutil.copyfile(english_data_path + output + extension, self.data_path + output + extension)
+            print(" Done!")
+            profiler.count_written("copy_output", self.data_path + output + extension)
+            manifest.record(self.data_path + output + extension)
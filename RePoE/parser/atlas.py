@@ -0,0 +1,130 @@
+"""
+packs the exported icons of a family, like the buff or gem icons, into sprite sheets, so that a web page showing
+many of them fetches a few sheets instead of one file per icon. each family gets atlases/<family>.json next to its
+sheets, mapping the name of every icon, its exported path without extension, to its sheet and rectangle.
+
+the sheets and maps are written like the outputs of the modules: the maps are compressed with --compress, and all
+of them are recorded in the manifest under the "atlas" module, so that deltas include them.
+
+the icons cut from the game's ui textures by their IDLFile rectangles (ui_images and the frames of buff_visuals)
+are packed as they were exported, at the size of their rectangle.
+
+usage: python -m RePoE.parser.atlas DATA_DIR
+"""
+
+import argparse
+import glob
+import os
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image
+
+from RePoE.parser import images, manifest, util
+
+DIRECTORY_NAME = "atlases"
+# icons by the patterns of their exported png files
+FAMILIES = {
+    "buff_icons": ["Art/2DArt/BuffIcons/**/*.png"],
+    "ui_images": ["Art/2DArt/UIImages/**/*.png"],
+    "gems": ["Art/2DItems/Gems/**/*.png"],
+    "currency": ["Art/2DItems/Currency/**/*.png"],
+}
+SHEET_SIZE = 2048
+# transparent pixels between the icons, so that scaling a sprite doesn't blend in its neighbours
+PADDING = 1
+EXTENSIONS = [".png", ".webp"]
+
+Placement = Tuple[int, int, int]
+
+
+def pack(sizes: Dict[str, Tuple[int, int]], sheet_size: int = SHEET_SIZE) -> Dict[str, Placement]:
+    """
+    places the rectangles on shelves, the tallest first, starting a new sheet when one is full.
+    returns the sheet, x and y of each rectangle
+    """
+    placements = {}
+    sheet = x = y = shelf_height = 0
+    for name, (width, height) in sorted(sizes.items(), key=lambda item: (-item[1][1], -item[1][0], item[0])):
+        if width > sheet_size or height > sheet_size:
+            raise ValueError(f"'{name}' is larger than a sheet of {sheet_size}x{sheet_size}")
+        if x + width > sheet_size:
+            x, y, shelf_height = 0, y + shelf_height + PADDING, 0
+        if y + height > sheet_size:
+            sheet, x, y, shelf_height = sheet + 1, 0, 0, 0
+        placements[name] = (sheet, x, y)
+        x += width + PADDING
+        shelf_height = max(shelf_height, height)
+    return placements
+
+
+def _family_files(data_path: str, patterns: List[str]) -> Dict[str, str]:
+    files = {}
+    for pattern in patterns:
+        for path in glob.glob(os.path.join(data_path, pattern), recursive=True):
+            name = os.path.splitext(os.path.relpath(path, data_path))[0].replace(os.sep, "/")
+            files[name] = path
+    return files
+
+
+def write_atlas(data_path: str, family: str, patterns: List[str]) -> int:
+    """packs the icons of the family into sheets and writes their map, returns the number of icons"""
+    files = _family_files(data_path, patterns)
+    if not files:
+        return 0
+    icons = {}
+    for name, path in sorted(files.items()):
+        # loaded right away, a family has more icons than a process may have open files
+        with Image.open(path) as icon:
+            icons[name] = icon.convert("RGBA")
+    sizes = {name: icon.size for name, icon in icons.items()}
+    placements = pack(sizes)
+    sheets = []
+    for index in range(max(sheet for sheet, _, _ in placements.values()) + 1):
+        placed = {name: (x, y) for name, (sheet, x, y) in placements.items() if sheet == index}
+        width = max(x + sizes[name][0] for name, (x, _) in placed.items())
+        height = max(y + sizes[name][1] for name, (_, y) in placed.items())
+        image = Image.new("RGBA", (width, height))
+        for name, position in placed.items():
+            image.paste(icons[name], position)
+        sheet_name = f"{family}-{index}"
+        paths = [os.path.join(data_path, DIRECTORY_NAME, sheet_name + ext) for ext in EXTENSIONS]
+        for path in paths:
+            images.save(image, path)
+        manifest.record(*paths)
+        sheets.append(sheet_name)
+    sprites = {
+        name: {"sheet": sheet, "x": x, "y": y, "w": sizes[name][0], "h": sizes[name][1]}
+        for name, (sheet, x, y) in placements.items()
+    }
+    # the sheets of an earlier run that had more of them
+    for ext in EXTENSIONS:
+        for path in glob.glob(os.path.join(data_path, DIRECTORY_NAME, glob.escape(family) + "-*" + ext)):
+            if os.path.basename(path)[: -len(ext)] not in sheets:
+                os.remove(path)
+    util.write_any_json(
+        {"sheets": sheets, "extensions": EXTENSIONS, "sprites": sprites}, data_path, f"{DIRECTORY_NAME}/{family}"
+    )
+    return len(sprites)
+
+
+def write_atlases(data_path: str, language: str = "English", game_version: Optional[str] = None) -> None:
+    """writes the atlases of the families that have exported icons in data_path and adds them to its manifest"""
+    os.makedirs(os.path.join(data_path, DIRECTORY_NAME), exist_ok=True)
+    with manifest.recording() as files:
+        for family, patterns in FAMILIES.items():
+            print(f"Packing '{family}' ...")
+            count = write_atlas(data_path, family, patterns)
+            print(f"Packed {count} icons of '{family}'" if count else f"No icons of '{family}' were exported")
+        util.drain_writes()
+    manifest.update(data_path, files, "atlas", language, game_version)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack exported icons into sprite sheets")
+    parser.add_argument("data_dir")
+    args = parser.parse_args()
+    write_atlases(args.data_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import hashlib
+import os
+import re
+from typing import Optional
+
+from PyPoE.poe.file.file_system import FileSystem
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + f".{os.getpid()}.tmp", "wb") as f:
+        f.write(data)
+    os.replace(path + f".{os.getpid()}.tmp", path)
+
+
+class BundleStore:
+    """
+    local content-addressed copy of the files downloaded from the patch cdn.
+    each file is stored once under objects/ by its sha256, refs/<source>/<path> records which object a path of a
+    cdn url resolved to, and latest/<sequel> remembers the last cdn url seen, for runs without network access.
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+
+    def _ref_path(self, source: str, path: str) -> str:
+        return os.path.join(self.directory, "refs", re.sub(r"[^\w.-]+", "_", source), path)
+
+    def _object_path(self, sha: str) -> str:
+        return os.path.join(self.directory, "objects", sha[:2], sha)
+
+    def get(self, source: str, path: str) -> Optional[bytes]:
+        try:
+            with open(self._ref_path(source, path)) as f:
+                sha = f.read().strip()
+            with open(self._object_path(sha), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        return data if hashlib.sha256(data).hexdigest() == sha else None
+
+    def put(self, source: str, path: str, data: bytes) -> None:
+        sha = hashlib.sha256(data).hexdigest()
+        if not os.path.exists(self._object_path(sha)):
+            _write_atomic(self._object_path(sha), data)
+        _write_atomic(self._ref_path(source, path), sha.encode())
+
+    def get_latest(self, sequel: int) -> Optional[str]:
+        try:
+            with open(os.path.join(self.directory, "latest", str(sequel))) as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return None
+
+    def set_latest(self, sequel: int, url: str) -> None:
+        _write_atomic(os.path.join(self.directory, "latest", str(sequel)), url.encode())
+
+
+class MirroredFileSystem(FileSystem):
+    """FileSystem reading the raw index and bundle files through a BundleStore before going to the cdn"""
+
+    def __init__(self, root_path: str, store: BundleStore, offline: bool = False) -> None:
+        self.source = root_path
+        self.store = store
+        self.offline = offline
+        super().__init__(root_path)
+
+    def _get_file(self, path: str) -> bytes:
+        data = self.store.get(self.source, path)
+        if data is not None:
+            return data
+        if self.offline:
+            raise FileNotFoundError(f"'{path}' of {self.source} has not been synced to {self.store.directory}")
+        data = super()._get_file(path)
+        self.store.put(self.source, path, data)
+        return data
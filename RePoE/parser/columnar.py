@@ -0,0 +1,283 @@
+"""
+exports the numeric data that simulators use as dense columns: mod stat ranges and weights, gem levels and their
+stats, the experience curves of gems, default monster stats and base item properties.
+
+each table is written to columnar/<table>.npz in the data path and recorded in its manifest, an uncompressed zip of
+one .npy file per column that numpy.load reads as it is. the files are placed so that the array data is aligned, and
+load() maps them without copying. string columns hold int32 codes into the `<column>.strings` array of the same
+table, so `table["mod.strings"][table["mod"]]` gives the strings. numbers that an entry doesn't have are nan in float
+columns.
+
+writing doesn't need numpy, reading does.
+
+usage: python -m RePoE.parser.columnar DATA_DIR
+"""
+
+import argparse
+import ast
+import json
+import mmap
+import os
+import struct
+import sys
+import zipfile
+from array import array
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from RePoE.parser import manifest
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+DIRECTORY_NAME = "columnar"
+ALIGNMENT = 64
+NAN = float("nan")
+
+# column kind: (npy dtype, array typecode)
+KINDS = {"i4": ("<i4", "i"), "i8": ("<i8", "q"), "f8": ("<f8", "d"), "str": ("<i4", "i")}
+
+Columns = List[Tuple[str, str]]
+Rows = Iterable[Tuple[Any, ...]]
+
+
+def _number(value: Any) -> float:
+    return NAN if value is None else value
+
+
+def _mods(mods: Dict[str, Any]) -> Dict[str, Tuple[Columns, Rows]]:
+    weight_columns = [("mod", "str"), ("tag", "str"), ("weight", "i4")]
+    return {
+        "mod_stats": (
+            [("mod", "str"), ("stat", "str"), ("min", "i8"), ("max", "i8")],
+            ((id, stat["id"], stat["min"], stat["max"]) for id, mod in mods.items() for stat in mod["stats"]),
+        ),
+        "mod_spawn_weights": (
+            weight_columns,
+            ((id, weight["tag"], weight["weight"]) for id, mod in mods.items() for weight in mod["spawn_weights"]),
+        ),
+        "mod_generation_weights": (
+            weight_columns,
+            ((id, weight["tag"], weight["weight"]) for id, mod in mods.items() for weight in mod["generation_weights"]),
+        ),
+    }
+
+
+GEM_LEVEL_FIELDS = ["required_level", "experience", "cost_multiplier", "damage_effectiveness", "damage_multiplier"]
+
+
+def _gems(gems: Dict[str, Any]) -> Dict[str, Tuple[Columns, Rows]]:
+    return {
+        # the experience column is the experience curve of the gem's base item
+        "gem_levels": (
+            [("gem", "str"), ("level", "i4")] + [(field, "f8") for field in GEM_LEVEL_FIELDS],
+            (
+                (id, int(level), *(_number(per_level.get(field)) for field in GEM_LEVEL_FIELDS))
+                for id, gem in gems.items()
+                for level, per_level in gem["per_level"].items()
+            ),
+        ),
+        "gem_level_stats": (
+            [("gem", "str"), ("level", "i4"), ("stat", "str"), ("value", "f8")],
+            (
+                (id, int(level), stat["id"], _number(stat.get("value")))
+                for id, gem in gems.items()
+                for level, per_level in gem["per_level"].items()
+                for stat in per_level.get("stats", [])
+                if stat and stat.get("id")
+            ),
+        ),
+    }
+
+
+MONSTER_STAT_FIELDS = ["physical_damage", "evasion", "accuracy", "life", "ally_life", "armour", "experience"]
+
+
+def _default_monster_stats(monster_stats: Dict[str, Any]) -> Dict[str, Tuple[Columns, Rows]]:
+    return {
+        "default_monster_stats": (
+            [("level", "i4")] + [(field, "f8") for field in MONSTER_STAT_FIELDS],
+            (
+                (int(level), *(_number(stats.get(field)) for field in MONSTER_STAT_FIELDS))
+                for level, stats in monster_stats.items()
+            ),
+        )
+    }
+
+
+BASE_ITEM_RANGES = ["armour", "evasion", "energy_shield", "ward"]
+BASE_ITEM_PROPERTIES = [
+    "block",
+    "movement_speed",
+    "attack_time",
+    "critical_strike_chance",
+    "physical_damage_min",
+    "physical_damage_max",
+    "range",
+    "charges_max",
+    "charges_per_use",
+    "duration",
+    "life_per_use",
+    "mana_per_use",
+    "stack_size",
+]
+
+
+def _base_item_row(id: str, item: Dict[str, Any]) -> Tuple[Any, ...]:
+    properties = item["properties"]
+    ranges = [properties.get(name, {}) for name in BASE_ITEM_RANGES]
+    return (
+        id,
+        item["item_class"],
+        item["domain"],
+        item["drop_level"],
+        item["inventory_width"],
+        item["inventory_height"],
+        *(_number(value.get(bound)) for value in ranges for bound in ["min", "max"]),
+        *(_number(properties.get(name)) for name in BASE_ITEM_PROPERTIES),
+    )
+
+
+def _base_items(base_items: Dict[str, Any]) -> Dict[str, Tuple[Columns, Rows]]:
+    return {
+        "base_items": (
+            [
+                ("id", "str"),
+                ("item_class", "str"),
+                ("domain", "str"),
+                ("drop_level", "i4"),
+                ("inventory_width", "i4"),
+                ("inventory_height", "i4"),
+            ]
+            + [(f"{name}_{bound}", "f8") for name in BASE_ITEM_RANGES for bound in ["min", "max"]]
+            + [(name, "f8") for name in BASE_ITEM_PROPERTIES],
+            (_base_item_row(id, item) for id, item in base_items.items()),
+        )
+    }
+
+
+# the tables built from each output
+EXPORTS: Dict[str, Callable[[Any], Dict[str, Tuple[Columns, Rows]]]] = {
+    "mods": _mods,
+    "gems": _gems,
+    "default_monster_stats": _default_monster_stats,
+    "base_items": _base_items,
+}
+
+
+def _npy(descr: str, length: int, data: bytes) -> bytes:
+    """the .npy file of a one dimensional array, version 1.0 with the header padded like numpy does"""
+    header = repr({"descr": descr, "fortran_order": False, "shape": (length,)}).encode("latin1")
+    padding = -(10 + len(header) + 1) % ALIGNMENT
+    header += b" " * padding + b"\n"
+    return b"\x93NUMPY\x01\x00" + struct.pack("<H", len(header)) + header + data
+
+
+def _numbers(typecode: str, values: Iterable[Any]) -> bytes:
+    column = array(typecode, values)
+    if sys.byteorder == "big":
+        column.byteswap()
+    return column.tobytes()
+
+
+def _strings(strings: List[str]) -> Tuple[str, bytes]:
+    width = max((len(string) for string in strings), default=0) or 1
+    return f"<U{width}", b"".join(string.encode("utf-32-le").ljust(width * 4, b"\0") for string in strings)
+
+
+def _add_aligned(archive: zipfile.ZipFile, out, name: str, data: bytes) -> None:
+    # the local file header is 30 bytes, the name and an extra field of padding follow it
+    offset = out.tell() + 30 + len(name.encode()) + 4
+    info = zipfile.ZipInfo(name, date_time=(1980, 1, 1, 0, 0, 0))
+    info.compress_type = zipfile.ZIP_STORED
+    padding = -offset % ALIGNMENT
+    info.extra = struct.pack("<HH", 0xA11E, padding) + b"\0" * padding
+    archive.writestr(info, data)
+
+
+def write_table(path: str, columns: Columns, rows: Rows) -> int:
+    """writes the rows as an npz of one array per column, returns the number of rows"""
+    values: List[List[Any]] = [[] for _ in columns]
+    for row in rows:
+        for column, value in zip(values, row):
+            column.append(value)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as out, zipfile.ZipFile(out, "w", zipfile.ZIP_STORED) as archive:
+        for (name, kind), column in zip(columns, values):
+            descr, typecode = KINDS[kind]
+            if kind == "str":
+                codes: Dict[str, int] = {}
+                column = [codes.setdefault(value, len(codes)) for value in column]
+                strings_descr, strings = _strings(list(codes))
+                _add_aligned(archive, out, f"{name}.strings.npy", _npy(strings_descr, len(codes), strings))
+            _add_aligned(archive, out, f"{name}.npy", _npy(descr, len(column), _numbers(typecode, column)))
+    os.replace(tmp_path, path)
+    return len(values[0]) if values else 0
+
+
+def export(data_path: str, language: str = "English", game_version: Optional[str] = None) -> List[str]:
+    """writes the tables of the outputs in data_path that exist and adds them to its manifest, returns their paths"""
+    directory = os.path.join(data_path, DIRECTORY_NAME)
+    os.makedirs(directory, exist_ok=True)
+    with manifest.recording() as files:
+        paths = _export(data_path, directory)
+    manifest.update(data_path, files, "columnar", language, game_version)
+    return paths
+
+
+def _export(data_path: str, directory: str) -> List[str]:
+    paths = []
+    for output, tables_of in EXPORTS.items():
+        path = os.path.join(data_path, output + ".min.json")
+        if not os.path.exists(path):
+            print(f"Skipping '{output}', it has not been written to '{data_path}'")
+            continue
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        for table, (columns, rows) in tables_of(data).items():
+            table_path = os.path.join(directory, table + ".npz")
+            print(f"Writing '{table_path}' ...", end="", flush=True)
+            count = write_table(table_path, columns, rows)
+            print(f" {count} rows")
+            manifest.record(table_path)
+            paths.append(table_path)
+    return paths
+
+
+def load(path: str) -> Dict[str, Any]:
+    """
+    the columns of a table as read-only numpy arrays on a memory map of the file, by column name. the file stays
+    mapped as long as any of the arrays is used
+    """
+    if numpy is None:
+        raise ImportError("Reading columnar tables requires numpy, install it with `pip install repoe[columnar]`")
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    columns = {}
+    with zipfile.ZipFile(path) as archive:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"'{info.filename}' in '{path}' is compressed and can't be mapped")
+            name_length, extra_length = struct.unpack_from("<HH", mapped, info.header_offset + 26)
+            start = info.header_offset + 30 + name_length + extra_length
+            if mapped[start : start + 8] != b"\x93NUMPY\x01\x00":
+                raise ValueError(f"'{info.filename}' in '{path}' is not a version 1.0 npy file")
+            (header_length,) = struct.unpack_from("<H", mapped, start + 8)
+            header = ast.literal_eval(mapped[start + 10 : start + 10 + header_length].decode("latin1"))
+            (length,) = header["shape"]
+            columns[info.filename.removesuffix(".npy")] = numpy.frombuffer(
+                mapped, dtype=header["descr"], count=length, offset=start + 10 + header_length
+            )
+    return columns
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export numeric RePoE outputs as columnar npz tables")
+    parser.add_argument("data_dir")
+    args = parser.parse_args()
+    export(args.data_dir)
+
+
+if __name__ == "__main__":
+    main()
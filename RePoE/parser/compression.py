@@ -0,0 +1,104 @@
+import gzip
+import os
+import shutil
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from RePoE.parser import manifest, profiler
+
+CHUNK_SIZE = 1 << 20
+# levels by the size and time of compressing the big files, see benchmarks/compression.py. above 10, zstd gets
+# 20 to 30 times slower for files about 15% smaller, brotli at 11 is slower still but the smallest format that
+# browsers decode natively
+DEFAULT_LEVELS = {"gz": 9, "br": 11, "zst": 10}
+# packages needed for the formats that the standard library doesn't support
+PACKAGES = {"br": "brotli", "zst": "zstandard"}
+
+# compressions run in threads, the compressors don't hold the gil while they compress a chunk
+_executor: Optional[ThreadPoolExecutor] = None
+_pending: List[Future] = []
+
+
+def parse_formats(specs: List[str]) -> Dict[str, int]:
+    """parses FORMAT or FORMAT:LEVEL specifications into the level of each format"""
+    formats = {}
+    for spec in specs:
+        name, _, level = spec.partition(":")
+        if name not in DEFAULT_LEVELS:
+            raise ValueError(f"Unknown compression format '{name}', choose from {', '.join(DEFAULT_LEVELS)}")
+        if name in PACKAGES and {"br": brotli, "zst": zstandard}[name] is None:
+            raise ValueError(
+                f"The {name} compression requires {PACKAGES[name]}, install it with `pip install repoe[compress]`"
+            )
+        formats[name] = int(level) if level else DEFAULT_LEVELS[name]
+    return formats
+
+
+def _chunks(source):
+    return iter(lambda: source.read(CHUNK_SIZE), b"")
+
+
+def compress_file(path: str, format: str, level: int) -> str:
+    """writes path.<format> next to path, reading and compressing the file in chunks. returns the compressed path"""
+    destination = path + "." + format
+    tmp_path = destination + f".{os.getpid()}.tmp"
+    with open(path, "rb") as source, open(tmp_path, "wb") as out:
+        if format == "gz":
+            # without a file name and time in the header, so that the same file always compresses the same
+            with gzip.GzipFile(filename="", mode="wb", fileobj=out, compresslevel=level, mtime=0) as compressed:
+                shutil.copyfileobj(source, compressed, CHUNK_SIZE)
+        elif format == "br":
+            compressor = brotli.Compressor(quality=level)
+            for chunk in _chunks(source):
+                out.write(compressor.process(chunk))
+            out.write(compressor.finish())
+        elif format == "zst":
+            with zstandard.ZstdCompressor(level=level).stream_writer(out, closefd=False) as compressed:
+                shutil.copyfileobj(source, compressed, CHUNK_SIZE)
+        else:
+            raise ValueError(f"Unknown compression format '{format}'")
+    os.replace(tmp_path, destination)
+    return destination
+
+
+def compress_in_background(path: str, formats: Dict[str, int]) -> None:
+    """compresses the file into each format at the same time, wait for them with wait()"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(thread_name_prefix="compress")
+    _pending.extend(_executor.submit(compress_file, path, format, level) for format, level in formats.items())
+
+
+def wait() -> None:
+    """waits for the running compressions, raises the first error if any of them failed"""
+    error = None
+    while _pending:
+        future = _pending.pop(0)
+        try:
+            path = future.result()
+            profiler.count_written("compress", path)
+            manifest.record(path)
+        except Exception as e:
+            error = error or e
+    if error is not None:
+        raise error
+
+
+def _forget_executor() -> None:
+    # the threads of the executor don't exist in forked processes
+    global _executor
+    _executor = None
+    _pending.clear()
+
+
+os.register_at_fork(after_in_child=_forget_executor)
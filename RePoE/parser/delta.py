@@ -0,0 +1,373 @@
+"""
+deltas between the json outputs of two runs, so that clients can update the files they have instead of downloading
+them again after a patch.
+
+outputs with an object at the root, which is most of them, are keyed by their records: the delta lists the removed
+keys and the records that were added or changed. other outputs get a json patch (rfc 6902). every delta carries the
+sha256 of the canonical json of the file it applies to and of the file it produces, which the applier checks.
+
+the applied files are byte identical to the new ones: the delta names the json writer that writes the new file again
+from its parsed json, one of the serializers of RePoE.parser.json_backend, and the sha256 of the file's bytes. files
+that none of them reproduces are stored whole as text.
+
+usage:
+    python -m RePoE.parser.delta diff OLD_DIR NEW_DIR DELTA_DIR
+    python -m RePoE.parser.delta apply DATA_DIR DELTA_DIR [OUT_DIR]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pydantic_core
+
+from RePoE.parser.manifest import MANIFEST_NAME
+
+INDEX_NAME = "index.json"
+DELTA_EXTENSION = ".delta.json"
+
+
+def _canonical(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+def canonical_hash(value: Any) -> str:
+    """sha256 of the value's json with sorted keys, the same however the file was formatted"""
+    return hashlib.sha256(_canonical(value).encode()).hexdigest()
+
+
+def _json(value: Any, minified: bool) -> bytes:
+    if minified:
+        return json.dumps(value, separators=(",", ":"), sort_keys=True).encode()
+    return json.dumps(value, indent=2, sort_keys=True).encode()
+
+
+def _pydantic(value: Any, minified: bool) -> bytes:
+    return pydantic_core.to_json(value) if minified else pydantic_core.to_json(value, indent=2)
+
+
+# the serializers of RePoE.parser.json_backend that ship with RePoE, for json that was parsed from their files: the
+# nulls left in it are written as they are. (write, sorts keys) by name, in the order they are tried, the one that
+# sorts the keys first because deltas don't need to keep the order of the keys for it. files of the fast backend
+# that neither reproduces, e.g. because orjson formats floats differently, are stored as text, so that applying
+# deltas never needs orjson
+WRITERS: Dict[str, Tuple[Callable[[Any, bool], bytes], bool]] = {
+    "compat_sorted": (_json, True),
+    "compat": (_pydantic, False),
+}
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def find_writer(data: bytes, value: Any, minified: bool) -> Optional[str]:
+    """the writer that writes value, parsed from data, as the same bytes, None if none of them does"""
+    for name, (write, _) in WRITERS.items():
+        if write(value, minified) == data:
+            return name
+    return None
+
+
+def _key_order(old: Dict[str, Any], new: Dict[str, Any]) -> List[str]:
+    """the order of the keys after old was updated to new in place, added keys go to the end"""
+    return [key for key in old if key in new] + [key for key in new if key not in old]
+
+
+def _pointer(path: str, token: Any) -> str:
+    return path + "/" + str(token).replace("~", "~0").replace("/", "~1")
+
+
+def _same(old: Any, new: Any, keep_order=False) -> bool:
+    # 1 == 1.0 == True in python, but not in json
+    if isinstance(old, (dict, list)) and keep_order:
+        return json.dumps(old, separators=(",", ":")) == json.dumps(new, separators=(",", ":"))
+    if isinstance(old, (dict, list)):
+        return _canonical(old) == _canonical(new)
+    return type(old) is type(new) and old == new
+
+
+def json_patch(
+    old: Any, new: Any, path: str = "", ops: Optional[List[Dict[str, Any]]] = None, keep_order=False
+) -> List[Dict[str, Any]]:
+    """
+    the add, remove and replace operations that turn old into new. with keep_order, objects whose keys would end up
+    in a different order than in new are replaced whole
+    """
+    if ops is None:
+        ops = []
+    if isinstance(old, dict) and isinstance(new, dict) and keep_order and _key_order(old, new) != list(new):
+        ops.append({"op": "replace", "path": path, "value": new})
+    elif isinstance(old, dict) and isinstance(new, dict):
+        for key in old:
+            if key not in new:
+                ops.append({"op": "remove", "path": _pointer(path, key)})
+        for key, value in new.items():
+            if key in old:
+                json_patch(old[key], value, _pointer(path, key), ops, keep_order)
+            else:
+                ops.append({"op": "add", "path": _pointer(path, key), "value": value})
+    elif isinstance(old, list) and isinstance(new, list):
+        for i in range(min(len(old), len(new))):
+            json_patch(old[i], new[i], _pointer(path, i), ops, keep_order)
+        for i in range(len(old), len(new)):
+            ops.append({"op": "add", "path": _pointer(path, i), "value": new[i]})
+        # from the end, so that the indices of the others don't shift
+        for i in reversed(range(len(new), len(old))):
+            ops.append({"op": "remove", "path": _pointer(path, i)})
+    elif not _same(old, new):
+        ops.append({"op": "replace", "path": path, "value": new})
+    return ops
+
+
+def _apply_op(document: Any, op: Dict[str, Any]) -> Any:
+    if op["path"] == "":
+        if op["op"] != "replace":
+            raise ValueError(f"Unsupported operation '{op['op']}' on the whole document")
+        return op["value"]
+    *parents, last = [token.replace("~1", "/").replace("~0", "~") for token in op["path"].split("/")[1:]]
+    target = document
+    for token in parents:
+        target = target[int(token)] if isinstance(target, list) else target[token]
+    if isinstance(target, list):
+        index = len(target) if last == "-" else int(last)
+        if op["op"] == "add":
+            target.insert(index, op["value"])
+        elif op["op"] == "remove":
+            del target[index]
+        elif op["op"] == "replace":
+            target[index] = op["value"]
+        else:
+            raise ValueError(f"Unsupported operation '{op['op']}'")
+    elif op["op"] in ("add", "replace"):
+        target[last] = op["value"]
+    elif op["op"] == "remove":
+        del target[last]
+    else:
+        raise ValueError(f"Unsupported operation '{op['op']}'")
+    return document
+
+
+def make_delta(old: Any, new: Any, keep_order=False) -> Dict[str, Any]:
+    """the delta from old to new, with keep_order the applied json has its keys in the same order as new"""
+    delta: Dict[str, Any] = {"source_sha256": canonical_hash(old), "target_sha256": canonical_hash(new)}
+    if isinstance(old, dict) and isinstance(new, dict):
+        delta["remove"] = [key for key in old if key not in new]
+        delta["set"] = {
+            key: value for key, value in new.items() if key not in old or not _same(old[key], value, keep_order)
+        }
+        if keep_order and _key_order(old, new) != list(new):
+            delta["order"] = list(new)
+    else:
+        delta["patch"] = json_patch(old, new, keep_order=keep_order)
+    return delta
+
+
+def apply_delta(old: Any, delta: Dict[str, Any]) -> Any:
+    """applies the delta to the parsed json it was made from, raises ValueError if either side doesn't match"""
+    if canonical_hash(old) != delta["source_sha256"]:
+        raise ValueError("The delta was made from a different version of the file")
+    if "set" in delta:
+        new = dict(old)
+        for key in delta["remove"]:
+            del new[key]
+        new.update(delta["set"])
+        if "order" in delta:
+            new = {key: new[key] for key in delta["order"]}
+    else:
+        new = old
+        for op in delta["patch"]:
+            new = _apply_op(new, op)
+    if canonical_hash(new) != delta["target_sha256"]:
+        raise ValueError("Applying the delta did not produce the expected file")
+    return new
+
+
+def _manifest_files(data_path: str) -> Optional[List[str]]:
+    """json outputs of the data path by the manifest of the run that wrote them, None if there is no manifest"""
+    try:
+        with open(os.path.join(data_path, MANIFEST_NAME)) as f:
+            return sorted(name for name in json.load(f)["files"] if name.endswith(".json"))
+    except FileNotFoundError:
+        return None
+
+
+def _walk_files(data_path: str) -> List[str]:
+    files = []
+    for root, directories, names in os.walk(data_path):
+        # deltas written into the data path, like those of --delta-from
+        directories[:] = [name for name in directories if not os.path.exists(os.path.join(root, name, INDEX_NAME))]
+        files.extend(
+            os.path.relpath(os.path.join(root, name), data_path).replace(os.sep, "/")
+            for name in names
+            if name.endswith(".json") and name != MANIFEST_NAME
+        )
+    return sorted(files)
+
+
+def _game_version(data_path: str) -> Optional[str]:
+    try:
+        with open(os.path.join(data_path, MANIFEST_NAME)) as f:
+            return next((entry["game_version"] for entry in json.load(f)["files"].values()), None)
+    except FileNotFoundError:
+        return None
+
+
+def _load(path: str) -> Any:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _read(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _dump(value: Any, path: str, minified: bool) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        if minified:
+            json.dump(value, f, separators=(",", ":"), ensure_ascii=False)
+        else:
+            json.dump(value, f, indent=2, ensure_ascii=False)
+    os.replace(path + ".tmp", path)
+
+
+def _write(data: bytes, path: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "wb") as f:
+        f.write(data)
+    os.replace(path + ".tmp", path)
+
+
+def _file_delta(name: str, data: bytes, new: Any, old: Any = None, has_old=False) -> Dict[str, Any]:
+    """the delta that writes the file of name with data, parsed into new, from old"""
+    writer = find_writer(data, new, name.endswith(".min.json"))
+    if writer is None:
+        return {"target_sha256": canonical_hash(new), "file_sha256": _sha256(data), "text": data.decode("utf-8")}
+    if not has_old:
+        delta = {"target_sha256": canonical_hash(new), "content": new}
+    else:
+        delta = make_delta(old, new, keep_order=not WRITERS[writer][1])
+    return {**delta, "writer": writer, "file_sha256": _sha256(data)}
+
+
+def _file_data(name: str, delta: Dict[str, Any], new: Any) -> bytes:
+    if "text" in delta:
+        data = delta["text"].encode("utf-8")
+    else:
+        data = WRITERS[delta["writer"]][0](new, name.endswith(".min.json"))
+    if _sha256(data) != delta["file_sha256"]:
+        raise ValueError("Writing the updated file did not produce the expected bytes")
+    return data
+
+
+def _remove_deltas(delta_path: str) -> None:
+    """
+    removes the files of earlier deltas written to delta_path, and the directories left empty. directories with
+    anything else in them are never touched, the deltas of other languages can be in directories below
+    """
+    index_path = os.path.join(delta_path, INDEX_NAME)
+    if not os.path.exists(index_path):
+        if os.path.exists(delta_path) and os.listdir(delta_path):
+            raise ValueError(f"'{delta_path}' is not empty and has no {INDEX_NAME} of earlier deltas to replace")
+        return
+    for name in _load(index_path)["files"]:
+        path = os.path.join(delta_path, name + DELTA_EXTENSION)
+        if os.path.exists(path):
+            os.remove(path)
+    os.remove(index_path)
+    for root, _, _ in os.walk(delta_path, topdown=False):
+        if root != delta_path and not os.listdir(root):
+            os.rmdir(root)
+
+
+def write_deltas(old_path: str, new_path: str, delta_path: str) -> Dict[str, str]:
+    """
+    writes a delta for every json output of new_path that differs from the one in old_path, and an index of what
+    happened to each file. added files are written whole into their delta. returns the status of each file
+    """
+    new_files = _manifest_files(new_path)
+    if new_files is None:
+        new_files = _walk_files(new_path)
+    # without a manifest, the old files that are not outputs anymore can't be told apart from other files there
+    old_files = set(_manifest_files(old_path) or [])
+    old_files.update(name for name in new_files if os.path.isfile(os.path.join(old_path, name)))
+    _remove_deltas(delta_path)
+    files: Dict[str, str] = {}
+    for name in new_files:
+        data = _read(os.path.join(new_path, name))
+        new = json.loads(data)
+        if name in old_files:
+            old_data = _read(os.path.join(old_path, name))
+            if old_data == data:
+                files[name] = "unchanged"
+                continue
+            delta = _file_delta(name, data, new, json.loads(old_data), has_old=True)
+            files[name] = "changed"
+        else:
+            delta = _file_delta(name, data, new)
+            files[name] = "added"
+        _dump(delta, os.path.join(delta_path, name + DELTA_EXTENSION), minified=True)
+    for name in old_files.difference(new_files):
+        files[name] = "removed"
+    index = {"from": _game_version(old_path), "to": _game_version(new_path), "files": files}
+    _dump(index, os.path.join(delta_path, INDEX_NAME), minified=False)
+    changed = sum(status != "unchanged" for status in files.values())
+    print(f"Wrote deltas of {changed} of {len(files)} files to '{delta_path}'")
+    return files
+
+
+def apply_deltas(data_path: str, delta_path: str, out_path: Optional[str] = None) -> None:
+    """updates the json outputs in data_path with the deltas, writing the results to out_path or in place"""
+    out_path = out_path or data_path
+    index = _load(os.path.join(delta_path, INDEX_NAME))
+    for name, status in index["files"].items():
+        out_file = os.path.join(out_path, name)
+        if status == "removed":
+            if os.path.exists(out_file):
+                os.remove(out_file)
+            continue
+        if status == "unchanged":
+            if out_path != data_path:
+                os.makedirs(os.path.dirname(out_file), exist_ok=True)
+                shutil.copyfile(os.path.join(data_path, name), out_file)
+            continue
+        delta = _load(os.path.join(delta_path, name + DELTA_EXTENSION))
+        try:
+            if "text" in delta or status == "added":
+                new = json.loads(delta["text"]) if "text" in delta else delta["content"]
+                if canonical_hash(new) != delta["target_sha256"]:
+                    raise ValueError("The delta is corrupt")
+            else:
+                new = apply_delta(_load(os.path.join(data_path, name)), delta)
+            data = _file_data(name, delta, new)
+        except ValueError as e:
+            raise ValueError(f"Could not update '{name}': {e}") from e
+        _write(data, out_file)
+    print(f"Updated '{out_path}' from {index['from']} to {index['to']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Make or apply deltas between the json outputs of two runs")
+    commands = parser.add_subparsers(dest="command", required=True)
+    diff = commands.add_parser("diff", help="write the deltas from the outputs in OLD_DIR to the ones in NEW_DIR")
+    diff.add_argument("old_dir")
+    diff.add_argument("new_dir")
+    diff.add_argument("delta_dir")
+    apply = commands.add_parser("apply", help="update the outputs in DATA_DIR with the deltas")
+    apply.add_argument("data_dir")
+    apply.add_argument("delta_dir")
+    apply.add_argument("out_dir", nargs="?", help="where to write the updated outputs, DATA_DIR by default")
+    args = parser.parse_args()
+    if args.command == "diff":
+        write_deltas(args.old_dir, args.new_dir, args.delta_dir)
+    else:
+        apply_deltas(args.data_dir, args.delta_dir, args.out_dir)
+
+
+if __name__ == "__main__":
+    main()
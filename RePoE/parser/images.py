@@ -0,0 +1,467 @@
+import fcntl
+import functools
+import hashlib
+import json
+import os
+import shutil
+import struct
+import types
+from collections.abc import Callable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import contextmanager
+from io import BytesIO
+from multiprocessing import get_context
+from typing import Dict, List, Optional, Tuple
+
+import PIL
+from PIL import Image
+
+from RePoE.parser import manifest, profiler
+
+Compose = Callable[[Image.Image], Image.Image]
+
+# deduplicated images are stored in this directory of the data path, see _save()
+CONTENT_DIRECTORY = "images"
+ALIASES_NAME = "image_aliases.json"
+# appended to as the images are exported, image_aliases.json is written from it after the run
+ALIASES_LOG_NAME = "image_aliases.jsonl"
+# the sha256 of every deduplicated file as it was saved, appended to like the aliases
+CONTENTS_LOG_NAME = "image_contents.jsonl"
+# the saved deduplicated files of each data path, by path relative to it, loaded when the first image is saved there.
+# the image workers each have a copy, which they bring up to date with what the others saved since by reading the rest
+# of the log, from the number of its bytes read into the copy
+_contents: Dict[str, Dict[str, str]] = {}
+_contents_read: Dict[str, int] = {}
+
+# images are decoded and encoded in forked worker processes, the encoders hold the gil for most of their work
+_executor: Optional[ProcessPoolExecutor] = None
+# the encodings, with the destination, cache key and deduplication path of the image
+_pending: List[Tuple[Future, str, Optional[str], Optional[str]]] = []
+# images submitted per worker before export_image waits for the oldest, which bounds the dds files held in memory
+QUEUED_PER_JOB = 4
+
+# the cache key each destination was last exported with, loaded by open_cache() before the modules run so that forked
+# workers inherit it. the file is append-only with one json line per export, like the journal, so the processes of a
+# run can add to it at the same time
+_cache: Dict[str, str] = {}
+_cache_path: Optional[str] = None
+
+
+def open_cache(path: str) -> None:
+    """loads the image cache at path and rewrites it without the entries that were replaced since"""
+    global _cache_path
+    _cache.clear()
+    lines = 0
+    try:
+        with open(path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # a process was interrupted while appending
+                    continue
+                _cache[entry["dest"]] = entry["key"]
+                lines += 1
+    except FileNotFoundError:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    if lines > len(_cache):
+        with open(path + ".tmp", "w") as f:
+            f.writelines(json.dumps({"dest": dest, "key": key}) + "\n" for dest, key in _cache.items())
+        os.replace(path + ".tmp", path)
+    _cache_path = path
+
+
+def cache_is_open() -> bool:
+    return _cache_path is not None
+
+
+def _code_digest(function: types.FunctionType) -> str:
+    """
+    sha256 of the bytecode, constants and defaults of the function and of the functions of its module that it calls,
+    which changes when any of them is edited
+    """
+    digest = hashlib.sha256()
+    functions, seen = [function], {function}
+    while functions:
+        function = functions.pop()
+        digest.update(repr((function.__qualname__, function.__defaults__, function.__kwdefaults__)).encode())
+        codes = [function.__code__]
+        while codes:
+            code = codes.pop()
+            codes.extend(const for const in code.co_consts if isinstance(const, types.CodeType))
+            # the order of frozensets, which are the constants of `in` tests, depends on the hash seed of the run
+            consts = [
+                sorted(map(repr, const)) if isinstance(const, frozenset) else const
+                for const in code.co_consts
+                if not isinstance(const, types.CodeType)
+            ]
+            digest.update(code.co_code + repr((consts, code.co_names)).encode())
+            for name in code.co_names:
+                called = function.__globals__.get(name)
+                if isinstance(called, types.FunctionType) and called not in seen:
+                    seen.add(called)
+                    functions.append(called)
+    return digest.hexdigest()
+
+
+def _compose_id(compose: Optional[Compose]) -> Optional[str]:
+    """
+    identifies the transformation by its name and code the same way in every run, "" without one and None if it
+    can't be identified
+    """
+    if compose is None:
+        return ""
+    if isinstance(compose, functools.partial):
+        inner = _compose_id(compose.func)
+        return None if inner is None else f"{inner}{compose.args!r}{sorted(compose.keywords.items())!r}"
+    if "<" in compose.__qualname__:
+        # lambdas and closures can differ with the same name
+        return None
+    if isinstance(compose, types.FunctionType):
+        return f"{compose.__module__}.{compose.__qualname__} {_code_digest(compose)}"
+    return f"{compose.__module__}.{compose.__qualname__}"
+
+
+def cache_key(
+    dds: bytes, compose: Optional[Compose], extensions: List[str], thumbnail_sizes: List[int], dedup: bool
+) -> Optional[str]:
+    """identifies the source, the transformation and the encoders of an image, None if it can't be cached"""
+    compose_id = _compose_id(compose)
+    if _cache_path is None or compose_id is None:
+        return None
+    encoders = f"{','.join(extensions)} {thumbnail_sizes} {'dedup' if dedup else ''} pillow {PIL.__version__}"
+    return hashlib.sha256(f"{hashlib.sha256(dds).hexdigest()}\0{compose_id}\0{encoders}".encode()).hexdigest()
+
+
+def is_cached(dest: str, key: Optional[str], paths: List[str]) -> bool:
+    """whether the files of the destination were exported with the same key and still exist"""
+    return key is not None and _cache.get(os.path.abspath(dest)) == key and all(map(os.path.isfile, paths))
+
+
+def _remember(dest: str, key: str) -> None:
+    dest = os.path.abspath(dest)
+    _cache[dest] = key
+    fd = os.open(_cache_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT)
+    try:
+        os.write(fd, (json.dumps({"dest": dest, "key": key}) + "\n").encode())
+    finally:
+        os.close(fd)
+
+
+# bytes per 4x4 block of the block compressed formats, by fourcc and by dxgi format of the dx10 header
+BLOCK_SIZES = {b"DXT1": 8, b"DXT3": 16, b"DXT5": 16, b"ATI1": 8, b"BC4U": 8, b"ATI2": 16, b"BC5U": 16}
+DXGI_BLOCK_SIZES = {
+    **dict.fromkeys(range(70, 73), 8),  # bc1
+    **dict.fromkeys(range(73, 79), 16),  # bc2, bc3
+    **dict.fromkeys(range(79, 82), 8),  # bc4
+    **dict.fromkeys(range(82, 85), 16),  # bc5
+    **dict.fromkeys(range(94, 100), 16),  # bc6h, bc7
+}
+# bits per pixel of the uncompressed dxgi formats
+DXGI_PIXEL_BITS = {28: 32, 29: 32, 87: 32, 88: 32, 91: 32}
+DDSD_MIPMAPCOUNT = 0x20000
+DDSCAPS2_CUBEMAP = 0x200
+
+
+def mip_level(dds: bytes, size: int) -> Optional[bytes]:
+    """
+    a dds file of only the smallest mip level of dds whose longer side is at least size pixels, so that a thumbnail
+    is decoded at close to its size instead of from the full image. None if that is the full image or the layout of
+    dds isn't understood
+    """
+    if len(dds) < 128 or not dds.startswith(b"DDS "):
+        return None
+    height, width, _, _, mip_count = struct.unpack_from("<5I", dds, 12)
+    flags, pixel_flags, fourcc, pixel_bits = struct.unpack_from("<I", dds, 8) + struct.unpack_from("<I4sI", dds, 80)
+    (caps2,) = struct.unpack_from("<I", dds, 112)
+    if not flags & DDSD_MIPMAPCOUNT or mip_count < 2 or caps2 & DDSCAPS2_CUBEMAP:
+        return None
+    header_size = 128
+    if fourcc == b"DX10":
+        if len(dds) < 148:
+            return None
+        (dxgi_format,) = struct.unpack_from("<I", dds, 128)
+        header_size += 20
+        block_size = DXGI_BLOCK_SIZES.get(dxgi_format)
+        pixel_bits = DXGI_PIXEL_BITS.get(dxgi_format, 0)
+    else:
+        # fourcc formats are block compressed, the others have the number of bits per pixel
+        block_size = BLOCK_SIZES.get(fourcc) if pixel_flags & 0x4 else None
+        pixel_bits = 0 if pixel_flags & 0x4 else pixel_bits
+    if block_size is None and not pixel_bits:
+        return None
+
+    def level_size(level_width: int, level_height: int) -> int:
+        if block_size:
+            return max(1, (level_width + 3) // 4) * max(1, (level_height + 3) // 4) * block_size
+        return (level_width * pixel_bits + 7) // 8 * level_height
+
+    offset, level = header_size, 0
+    while level + 1 < mip_count and max(width, height) // 2 >= size:
+        offset += level_size(width, height)
+        width, height, level = max(1, width // 2), max(1, height // 2), level + 1
+    if level == 0 or offset + level_size(width, height) > len(dds):
+        return None
+    header = bytearray(dds[:header_size])
+    pitch = level_size(width, height) if block_size else (width * pixel_bits + 7) // 8
+    struct.pack_into("<4I", header, 12, height, width, pitch, 0)
+    struct.pack_into("<I", header, 28, 1)
+    return bytes(header) + dds[offset : offset + level_size(width, height)]
+
+
+def _thumbnail(image: Image.Image, size: int) -> Image.Image:
+    if max(image.size) == size:
+        return image
+    thumbnail = image.copy()
+    thumbnail.thumbnail((size, size), Image.Resampling.LANCZOS)
+    return thumbnail
+
+
+def _pixel_hash(image: Image.Image) -> str:
+    digest = hashlib.sha256(f"{image.mode} {image.size}".encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+def _file_hash(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def _saved_contents(data_path: str) -> Dict[str, str]:
+    """the deduplicated files saved in data_path, also by other processes"""
+    contents = _contents.setdefault(data_path, {})
+    try:
+        with open(os.path.join(data_path, ".repoe", CONTENTS_LOG_NAME), "rb") as f:
+            f.seek(_contents_read.get(data_path, 0))
+            lines = f.read()
+    except FileNotFoundError:
+        return contents
+    _contents_read[data_path] = _contents_read.get(data_path, 0) + len(lines)
+    for line in lines.splitlines():
+        try:
+            entry = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        contents[entry["content"]] = entry["sha256"]
+    return contents
+
+
+@contextmanager
+def _contents_lock(data_path: str) -> Iterator[None]:
+    """held while a deduplicated file is saved, so that the image workers don't replace the ones others saved"""
+    os.makedirs(os.path.join(data_path, ".repoe"), exist_ok=True)
+    with open(os.path.join(data_path, ".repoe", CONTENTS_LOG_NAME + ".lock"), "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        yield
+
+
+def _is_intact(content: str, data_path: str) -> bool:
+    """
+    whether the deduplicated file is the one that was saved. anything writing to one of the paths linked to it
+    changes it for all of them, so one that wasn't saved by RePoE or has changed since is never linked to
+    """
+    expected = _saved_contents(data_path).get(os.path.relpath(content, data_path))
+    return expected is not None and os.path.isfile(content) and _file_hash(content) == expected
+
+
+def _save_content(image: Image.Image, content: str, data_path: str) -> None:
+    """
+    saves the deduplicated file, unless another process saved it since it was found missing. replacing it would leave
+    the paths that were linked to it in the meantime behind
+    """
+    os.makedirs(os.path.dirname(content), exist_ok=True)
+    # encoded before taking the lock, which is only held to check and replace the file
+    tmp_path = content + f".{os.getpid()}.tmp"
+    image.save(tmp_path, format=Image.registered_extensions()[os.path.splitext(content)[1]])
+    name, digest = os.path.relpath(content, data_path), _file_hash(tmp_path)
+    with _contents_lock(data_path):
+        if _is_intact(content, data_path):
+            os.remove(tmp_path)
+            return
+        os.replace(tmp_path, content)
+        fd = os.open(os.path.join(data_path, ".repoe", CONTENTS_LOG_NAME), os.O_WRONLY | os.O_APPEND | os.O_CREAT)
+        try:
+            os.write(fd, (json.dumps({"content": name, "sha256": digest}) + "\n").encode())
+        finally:
+            os.close(fd)
+        _saved_contents(data_path)[name] = digest
+
+
+def _link(content: str, path: str) -> None:
+    if os.path.exists(path) and os.path.samefile(content, path):
+        return
+    tmp_path = path + f".{os.getpid()}.tmp"
+    try:
+        os.link(content, tmp_path)
+    except OSError:
+        # the file system doesn't support hard links
+        shutil.copyfile(content, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def save(image: Image.Image, path: str) -> None:
+    """saves the image to path in the format of its extension"""
+    # saved next to the file and moved over it, so that it is never seen half written, and a path that links to a
+    # deduplicated image is replaced instead of written through
+    tmp_path = path + f".{os.getpid()}.tmp"
+    image.save(tmp_path, format=Image.registered_extensions()[os.path.splitext(path)[1]])
+    os.replace(tmp_path, path)
+
+
+def _save(image: Image.Image, paths: List[str], data_path: Optional[str]) -> Dict[str, Optional[str]]:
+    """
+    saves the image to the paths. with a data path, the image is saved once per format under the hash of its pixels
+    in the images directory of the data path, unless it is there already and intact, and the paths become hard links
+    to it. returns the file in the images directory of each path, None without a data path
+    """
+    if data_path is None:
+        for path in paths:
+            save(image, path)
+        return dict.fromkeys(paths)
+    digest = _pixel_hash(image)
+    files: Dict[str, Optional[str]] = {}
+    for path in paths:
+        extension = os.path.splitext(path)[1]
+        content = os.path.join(data_path, CONTENT_DIRECTORY, digest[:2], digest + extension)
+        if not _is_intact(content, data_path):
+            _save_content(image, content, data_path)
+        _link(content, path)
+        files[path] = content
+    return files
+
+
+def encode(
+    dds: bytes,
+    paths: List[str],
+    compose: Optional[Compose] = None,
+    thumbnails: Optional[Dict[int, List[str]]] = None,
+    dedup_path: Optional[str] = None,
+) -> Dict[str, Optional[str]]:
+    """
+    decodes the dds file, composes it and saves it to each path in the format of its extension. thumbnails are
+    saved to the paths of their size, read from the nearest larger mip level if the image isn't composed.
+    with dedup_path, identical images are stored once in its images directory, see _save()
+    """
+    with Image.open(BytesIO(dds)) as image:
+        if compose:
+            image = compose(image)
+        files = _save(image, paths, dedup_path)
+        for size, thumbnail_paths in (thumbnails or {}).items():
+            level = None if compose else mip_level(dds, size)
+            with Image.open(BytesIO(level)) if level else image.copy() as source:
+                files.update(_save(_thumbnail(source, size), thumbnail_paths, dedup_path))
+    return files
+
+
+def written(files: Dict[str, Optional[str]], dest: str, key: Optional[str], dedup_path: Optional[str]) -> None:
+    """records the files of an exported image, the paths and the deduplicated files they link to"""
+    contents = {content for content in files.values() if content is not None}
+    profiler.count_written("export_image", *files, *contents)
+    manifest.record(*files, *contents)
+    if key is not None:
+        _remember(dest, key)
+    if dedup_path is not None:
+        lines = "".join(
+            json.dumps({"path": os.path.relpath(path, dedup_path), "content": os.path.relpath(content, dedup_path)})
+            + "\n"
+            for path, content in files.items()
+        )
+        os.makedirs(os.path.join(dedup_path, ".repoe"), exist_ok=True)
+        fd = os.open(os.path.join(dedup_path, ".repoe", ALIASES_LOG_NAME), os.O_WRONLY | os.O_APPEND | os.O_CREAT)
+        try:
+            os.write(fd, lines.encode())
+        finally:
+            os.close(fd)
+
+
+def write_alias_map(data_path: str, language: str = "English", game_version: Optional[str] = None) -> None:
+    """
+    writes image_aliases.json, which maps every exported image file in data_path that is a link to the deduplicated
+    file it links to, for consumers that can't follow links, and adds it to the manifest of data_path
+    """
+    log_path = os.path.join(data_path, ".repoe", ALIASES_LOG_NAME)
+    aliases = {}
+    try:
+        with open(log_path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                aliases[entry["path"].replace(os.sep, "/")] = entry["content"].replace(os.sep, "/")
+    except FileNotFoundError:
+        # no images were deduplicated in data_path
+        return
+    aliases = {
+        path: content
+        for path, content in aliases.items()
+        if os.path.isfile(os.path.join(data_path, path)) and os.path.isfile(os.path.join(data_path, content))
+    }
+    # the log keeps only the current aliases, so that it doesn't grow with every run
+    with open(log_path + ".tmp", "w") as f:
+        f.writelines(json.dumps({"path": path, "content": content}) + "\n" for path, content in aliases.items())
+    os.replace(log_path + ".tmp", log_path)
+    with open(os.path.join(data_path, ALIASES_NAME + ".tmp"), "w") as f:
+        json.dump(aliases, f, indent=2, sort_keys=True)
+    with manifest.recording() as files:
+        os.replace(os.path.join(data_path, ALIASES_NAME + ".tmp"), os.path.join(data_path, ALIASES_NAME))
+        manifest.record(os.path.join(data_path, ALIASES_NAME))
+    manifest.update(data_path, files, "image_aliases", language, game_version)
+    print(f"Wrote {len(aliases)} image aliases to '{os.path.join(data_path, ALIASES_NAME)}'")
+
+
+def encode_in_background(
+    dds: bytes,
+    paths: List[str],
+    compose: Optional[Compose],
+    thumbnails: Dict[int, List[str]],
+    dedup_path: Optional[str],
+    jobs: int,
+    dest: str,
+    key: Optional[str],
+) -> None:
+    """
+    encodes the dds file into the paths in a pool of `jobs` processes, next to the other images being encoded.
+    the image is decoded once for all of its formats, decoding takes longer than encoding. compose has to be
+    picklable. wait for them with wait()
+    """
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(jobs, mp_context=get_context("fork"))
+    while len(_pending) >= jobs * QUEUED_PER_JOB:
+        _collect(*_pending.pop(0))
+    _pending.append((_executor.submit(encode, dds, paths, compose, thumbnails, dedup_path), dest, key, dedup_path))
+
+
+def _collect(future: Future, dest: str, key: Optional[str], dedup_path: Optional[str]) -> None:
+    written(future.result(), dest, key, dedup_path)
+
+
+def wait() -> None:
+    """
+    waits for the running encodings and shuts the pool down, raises the first error if any of them failed. a worker
+    of the module pool doesn't exit while the images pool it started is running
+    """
+    global _executor
+    error = None
+    while _pending:
+        try:
+            _collect(*_pending.pop(0))
+        except Exception as e:
+            error = error or e
+    if _executor is not None:
+        _executor.shutdown()
+        _executor = None
+    if error is not None:
+        raise error
+
+
+def _forget_executor() -> None:
+    # the workers of the pool belong to the parent process
+    global _executor
+    _executor = None
+    _pending.clear()
+
+
+os.register_at_fork(after_in_child=_forget_executor)
@@ -0,0 +1,70 @@
+import json
+import os
+from typing import Any, Dict, List, Tuple
+
+from RePoE.parser import tracking
+
+
+class Journal:
+    """
+    append-only record of the units of a run that have completed, so that a run that was interrupted can be resumed
+    from the first unfinished one. each line is a json object, written with a single write and synced to disk before
+    the next unit starts, so that a crash can at most lose the last line. the first line identifies the game files the
+    run is converting (see util.game_files_id), entries of a run on other game files are discarded. each entry has the
+    key of the code and other inputs the unit ran with, units whose key changed since run again.
+    """
+
+    def __init__(self, path: str, source: str) -> None:
+        self.path = path
+        self.source = source
+        # the key and the hashes of the outputs of every completed unit
+        self.completed: Dict[Tuple[str, str, int], Dict[str, Any]] = {}
+        lines = []
+        try:
+            with open(path) as f:
+                for line in f:
+                    try:
+                        lines.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        # the unit was interrupted while being recorded
+                        break
+        except FileNotFoundError:
+            pass
+        if lines and lines[0].get("source") == source:
+            for entry in lines[1:]:
+                self.completed[entry["module"], entry["language"], entry["sequel"]] = entry
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as f:
+                f.write(json.dumps({"source": source}) + "\n")
+
+    def _append(self, entry: Dict) -> None:
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT)
+        try:
+            os.write(fd, (json.dumps(entry, sort_keys=True) + "\n").encode())
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def is_completed(self, module: str, language: str, sequel: int, key: str = "") -> bool:
+        """whether the unit completed in an earlier attempt with the same key and its outputs have not changed since"""
+        entry = self.completed.get((module, language, sequel))
+        return (
+            entry is not None
+            # entries written before the keys were recorded have none
+            and entry.get("key") == key
+            and all(tracking.data_file_hash(path) == sha for path, sha in entry["outputs"].items())
+        )
+
+    def complete(self, module: str, language: str, sequel: int, output_files: List[str], key: str = "") -> None:
+        outputs = {path: tracking.data_file_hash(path) for path in output_files if os.path.isfile(path)}
+        entry = {"module": module, "language": language, "sequel": sequel, "key": key, "outputs": outputs}
+        self.completed[module, language, sequel] = entry
+        self._append(entry)
+
+    def finish(self) -> None:
+        """removes the journal once every unit of the run has completed"""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,116 @@
+import abc
+import dataclasses
+import json
+from itertools import islice
+from typing import Any, Dict
+
+from pydantic import BaseModel
+import pydantic_core
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def minimize(value):
+    if dataclasses.is_dataclass(value):
+        value = dataclasses.asdict(value)
+    if isinstance(value, dict):
+        return {k: minimize(v) for k, v in value.items() if v is not None}
+    elif isinstance(value, list):
+        return [minimize(v) for v in value]
+    else:
+        return value
+
+
+def drop_none(value):
+    """
+    like minimize, but only copies the dicts and lists that contain a null somewhere below them,
+    everything else is passed on to the encoder as it is
+    """
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return drop_none(dataclasses.asdict(value))
+    if isinstance(value, dict):
+        result = None
+        for i, (k, v) in enumerate(value.items()):
+            dropped = None if v is None else drop_none(v)
+            if result is None and (v is None or dropped is not v):
+                # none of the entries before this one change
+                result = dict(islice(value.items(), i))
+            if result is not None and v is not None:
+                result[k] = dropped
+        return value if result is None else result
+    if isinstance(value, list):
+        result = None
+        for i, v in enumerate(value):
+            dropped = drop_none(v)
+            if result is None and dropped is not v:
+                result = value[:i]
+            if result is not None:
+                result.append(dropped)
+        return value if result is None else result
+    return value
+
+
+def _object_dict(o):
+    return o.__dict__
+
+
+class JsonBackend(abc.ABC):
+    """
+    serializes the outputs of the writers. `model` writes validated models, `plain` unvalidated objects in the order
+    they were built and `sorted` objects of write_any_json with sorted keys. minified outputs leave out nulls
+    """
+
+    def model(self, root_obj: BaseModel, minified: bool) -> bytes:
+        if minified:
+            return root_obj.__pydantic_serializer__.to_json(
+                root_obj, exclude_unset=True, exclude_none=True, by_alias=True
+            )
+        return root_obj.__pydantic_serializer__.to_json(root_obj, indent=2, by_alias=True)
+
+    def plain(self, root_obj: Any, minified: bool) -> bytes:
+        if minified:
+            return pydantic_core.to_json(minimize(root_obj))
+        return pydantic_core.to_json(root_obj, indent=2)
+
+    @abc.abstractmethod
+    def sorted(self, root_obj: Any, minified: bool) -> bytes: ...
+
+
+class CompatBackend(JsonBackend):
+    """the standard library's json module, byte for byte the output RePoE always had"""
+
+    def sorted(self, root_obj: Any, minified: bool) -> bytes:
+        if minified:
+            return json.dumps(minimize(root_obj), separators=(",", ":"), sort_keys=True).encode()
+        return json.dumps(root_obj, indent=2, sort_keys=True, default=_object_dict).encode()
+
+
+class FastBackend(JsonBackend):
+    """
+    orjson for the objects that are not models, pydantic's own serializer is as fast for those. the output is the same
+    json, but non-ascii characters are written as utf-8 instead of being escaped and floats are formatted differently
+    """
+
+    def plain(self, root_obj: Any, minified: bool) -> bytes:
+        if minified:
+            return orjson.dumps(drop_none(root_obj), default=_object_dict, option=orjson.OPT_NON_STR_KEYS)
+        return orjson.dumps(root_obj, default=_object_dict, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+
+    def sorted(self, root_obj: Any, minified: bool) -> bytes:
+        # orjson doesn't sort the fields of dataclasses, they go through __dict__ like they do for json.dumps
+        option = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATACLASS
+        if minified:
+            return orjson.dumps(drop_none(root_obj), default=_object_dict, option=option)
+        return orjson.dumps(root_obj, default=_object_dict, option=option | orjson.OPT_INDENT_2)
+
+
+BACKENDS: Dict[str, type[JsonBackend]] = {"compat": CompatBackend, "fast": FastBackend}
+
+
+def get_backend(name: str) -> JsonBackend:
+    if name == "fast" and orjson is None:
+        raise ValueError("The fast json backend requires orjson, install it with `pip install repoe[fast]`")
+    return BACKENDS[name]()
@@ -0,0 +1,80 @@
+import json
+import os
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from RePoE.parser import tracking
+
+MANIFEST_NAME = "manifest.json"
+
+# files written by the units of work currently being recorded, innermost last
+_recorders: List[Dict[str, Dict[str, Any]]] = []
+
+
+@contextmanager
+def recording() -> Iterator[Dict[str, Dict[str, Any]]]:
+    """collects the size and sha256 of the files written inside the with block, by absolute path"""
+    files: Dict[str, Dict[str, Any]] = {}
+    _recorders.append(files)
+    try:
+        yield files
+    finally:
+        _recorders.pop()
+
+
+def record(*paths: str) -> None:
+    """called by the writers with the files they completed"""
+    if _recorders:
+        record_files(
+            {
+                os.path.abspath(path): {"size": os.path.getsize(path), "sha256": tracking.data_file_hash(path)}
+                for path in paths
+            }
+        )
+
+
+def record_files(files: Dict[str, Dict[str, Any]]) -> None:
+    for recorder in _recorders:
+        recorder.update(files)
+
+
+def repoe_version() -> Optional[str]:
+    # importlib.metadata takes a while to import, and this is only needed once modules have run
+    from importlib import metadata
+
+    try:
+        return metadata.version("repoe")
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def update(
+    data_path: str, files: Dict[str, Dict[str, Any]], module: str, language: str, game_version: Optional[str]
+) -> None:
+    """
+    adds the files a module wrote to the manifest at the root of data_path. entries of files that were not written
+    again are kept, unless they were the module's and don't exist anymore
+    """
+    path = os.path.join(data_path, MANIFEST_NAME)
+    try:
+        with open(path) as f:
+            entries: Dict[str, Dict[str, Any]] = json.load(f)["files"]
+    except (FileNotFoundError, json.JSONDecodeError, KeyError):
+        entries = {}
+    for name, entry in list(entries.items()):
+        if (entry["module"], entry["language"]) == (module, language) and not os.path.exists(
+            os.path.join(data_path, name)
+        ):
+            del entries[name]
+    version = repoe_version()
+    for file, entry in files.items():
+        entries[os.path.relpath(file, data_path).replace(os.sep, "/")] = {
+            **entry,
+            "module": module,
+            "language": language,
+            "game_version": game_version,
+            "repoe_version": version,
+        }
+    with open(path + ".tmp", "w") as f:
+        json.dump({"files": entries}, f, indent=2, sort_keys=True)
+    os.replace(path + ".tmp", path)
@@ -3,6 +3,9 @@ from RePoE.parser.util import call_with_default_args, write_json
 
 
 class active_skill_types(Parser_Module):
+    localized_fields = []
+    dat_files = ["ActiveSkillType.dat64"]
+
     def write(self) -> None:
         types = [row["Id"] for row in self.relational_reader["ActiveSkillType.dat64"]]
         write_json(types, self.data_path, "active_skill_types")
@@ -119,6 +119,19 @@ def _convert_corpse_properties(corpse_row: Optional[DatRecord], properties: Dict
 
 
 class base_items(Parser_Module):
+    dat_files = [
+        "ArmourTypes.dat64",
+        "BaseItemTypes.dat64",
+        "ComponentAttributeRequirements.dat64",
+        "ComponentCharges.dat64",
+        "CurrencyItems.dat64",
+        "Flasks.dat64",
+        "ItemisedCorpse.dat64",
+        "ShieldTypes.dat64",
+        "Tinctures.dat64",
+        "WeaponTypes.dat64",
+    ]
+
     def write(self) -> None:
         relational_reader = self.relational_reader
         attribute_requirements = _create_default_dict(relational_reader["ComponentAttributeRequirements.dat64"])
@@ -19,6 +19,8 @@ BUFF_SOURCES = [
 
 
 class buff_visuals(Parser_Module):
+    dat_files = ["BuffVisuals.dat64"] + [definition["dat"] + ".dat64" for definition in BUFF_SOURCES]
+
     def write(self) -> None:
         idl = IDLFile()
         idl.read(self.file_system.get_file("Art/UIImages1.txt"))
@@ -57,6 +57,10 @@ BUFF_TEMPLATE_SOURCES = [
 
 
 class buffs(Parser_Module):
+    dat_files = ["BuffDefinitions.dat64", "BuffTemplates.dat64"] + [
+        source["dat"] + ".dat64" for source in BUFF_SOURCES + BUFF_TEMPLATE_SOURCES
+    ]
+
     def write(self) -> None:
         idl = IDLFile()
         idl.read(self.file_system.get_file("Art/UIImages1.txt"))
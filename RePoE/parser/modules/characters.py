@@ -1,8 +1,13 @@
+import json
+
 from RePoE.parser import Parser_Module
 from RePoE.parser.util import write_json, call_with_default_args
 
 
 class characters(Parser_Module):
+    localized_fields = ["name"]
+    dat_files = ["Characters.dat64"]
+
     def write(self):
         root = []
         for row in self.relational_reader["Characters.dat64"]:
@@ -28,6 +33,13 @@ class characters(Parser_Module):
             )
         write_json(root, self.data_path, "characters")
 
+    def localize(self, english_data_path: str) -> None:
+        with open(english_data_path + "characters.json") as f:
+            root = json.load(f)
+        for character, row in zip(root, self.relational_reader["Characters.dat64"]):
+            character["name"] = row["Name"]
+        write_json(root, self.data_path, "characters")
+
 
 if __name__ == "__main__":
     call_with_default_args(characters)
@@ -3,6 +3,8 @@ from RePoE.parser.util import call_with_default_args, write_json
 
 
 class cluster_jewel_notables(Parser_Module):
+    dat_files = ["PassiveTreeExpansionSpecialSkills.dat64"]
+
     def write(self) -> None:
         data = []
         for row in self.relational_reader["PassiveTreeExpansionSpecialSkills.dat64"]:
@@ -6,6 +6,8 @@ from RePoE.parser.util import call_with_default_args, write_json
 
 
 class cluster_jewels(Parser_Module):
+    dat_files = ["PassiveTreeExpansionJewels.dat64", "PassiveTreeExpansionSkills.dat64"]
+
     def write(self) -> None:
         tf = self.get_cache(TranslationFileCache)["passive_skill_stat_descriptions.txt"]
         skills: Dict[str, List[Dict[str, Any]]] = {}
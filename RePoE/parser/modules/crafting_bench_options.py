@@ -9,6 +9,8 @@ from RePoE.parser.util import write_json, call_with_default_args
 
 
 class crafting_bench_options(Parser_Module):
+    dat_files = ["CraftingBenchOptions.dat64"]
+
     @staticmethod
     def _get_actions(row: DatRecord) -> Union[Dict[str, int], Dict[str, str]]:
         actions = {}
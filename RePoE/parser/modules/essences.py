@@ -34,6 +34,8 @@ def _convert_mods(row: DatRecord) -> Dict[str, str]:
 
 
 class essences(Parser_Module):
+    dat_files = ["Essences.dat64"]
+
     def write(self) -> None:
         essences = {
             row["BaseItemTypesKey"]["Id"]: {
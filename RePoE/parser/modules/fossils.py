@@ -3,6 +3,8 @@ from RePoE.parser.util import write_json, call_with_default_args
 
 
 class fossils(Parser_Module):
+    dat_files = ["DelveCraftingModifiers.dat64"]
+
     def write(self) -> None:
         root = {}
         for row in self.relational_reader["DelveCraftingModifiers.dat64"]:
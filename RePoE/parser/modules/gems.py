@@ -486,6 +486,20 @@ class GemConverter:
 
 
 class gems(Parser_Module):
+    outputs = ["gems", "gems_minimal"]
+    dat_files = [
+        "GemTags.dat64",
+        "GrantedEffectQualityStats.dat64",
+        "GrantedEffectStatSetsPerLevel.dat64",
+        "GrantedEffects.dat64",
+        "GrantedEffectsPerLevel.dat64",
+        "ItemExperiencePerLevel.dat64",
+        "Mods.dat64",
+        "QuestRewards.dat64",
+        "SkillGems.dat64",
+        "SkillTotemVariations.dat64",
+    ]
+
     def write(self) -> None:
         gems: dict[str, dict] = {}
         skill_gems = []
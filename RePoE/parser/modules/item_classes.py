@@ -5,6 +5,8 @@ influences = ["shaper", "elder", "crusader", "eyrie", "basilisk", "adjudicator"]
 
 
 class item_classes(Parser_Module):
+    dat_files = ["InfluenceTags.dat64", "ItemClasses.dat64"]
+
     def write(self) -> None:
         influences = {}
         for row in self.relational_reader["InfluenceTags.dat64"]:
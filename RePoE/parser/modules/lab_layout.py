@@ -3,6 +3,9 @@ from RePoE.parser.util import write_json, call_with_default_args
 
 
 class lab_layout(Parser_Module):
+    localized_fields = []
+    dat_files = ["LabyrinthSection.dat64", "LabyrinthSectionLayout.dat64"]
+
     def write(self) -> None:
         layouts = self.relational_reader["LabyrinthSectionLayout.dat64"]
         layouts.build_index("LabyrinthSectionKey")
@@ -3,6 +3,9 @@ from RePoE.parser.util import write_json, call_with_default_args
 
 
 class mod_types(Parser_Module):
+    localized_fields = []
+    dat_files = ["ModType.dat64"]
+
     def write(self) -> None:
         mod_types = {
             row["Name"]: {
@@ -1,11 +1,11 @@
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
 
 from PyPoE.poe.file.dat import DatRecord
 from PyPoE.poe.file.translations import install_data_dependant_quantifiers, TranslationFileCache
 from PyPoE.poe.poe1constants import MOD_DOMAIN
 from PyPoE.poe.sim.mods import get_translation
 from RePoE.parser import Parser_Module
-from RePoE.parser.util import call_with_default_args, write_json
+from RePoE.parser.util import call_with_default_args, write_json_stream
 
 
 def _convert_stats(
@@ -65,8 +65,13 @@ def _convert_tags_keys(tags_keys: List[DatRecord]) -> List[str]:
 
 
 class mods(Parser_Module):
+    dat_files = ["Mods.dat64"]
+
     def write(self) -> None:
-        root = {}
+        write_json_stream(self._convert_mods(), self.data_path, "mods")
+
+    def _convert_mods(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        seen = set()
         translation_cache = self.get_cache(TranslationFileCache)
         install_data_dependant_quantifiers(self.relational_reader)
         for mod in self.relational_reader["Mods.dat64"]:
@@ -94,12 +99,11 @@ class mods(Parser_Module):
                 "adds_tags": _convert_tags_keys(mod["TagsKeys"]),
                 "implicit_tags": _convert_tags_keys(mod["ImplicitTagsKeys"]),
             }
-            if mod["Id"] in root:
+            if mod["Id"] in seen:
                 print("Duplicate mod id:", mod["Id"])
             else:
-                root[mod["Id"]] = obj
-
-        write_json(root, self.data_path, "mods")
+                seen.add(mod["Id"])
+                yield mod["Id"], obj
 
 
 # a few unique item mods have the wrong mod domain so they wouldn't be added to the file without this
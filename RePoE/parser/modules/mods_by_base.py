@@ -17,6 +17,9 @@ from RePoE.parser.util import call_with_default_args, write_json
 
 
 class mods_by_base(Parser_Module):
+    inputs = ["base_items", "item_classes", "mods"]
+    dat_files = ["Essences.dat64"]
+
     def write(self) -> None:
         root = ItemClasses({})
 
@@ -30,6 +30,8 @@ CLASS_PASSIVES = [f"AscendancySpecialEldritch{i}" for i in range(1, 6)] + ["Asce
 
 
 class passives(Parser_Module):
+    outputs = ["passive_skill_trees"]
+    dat_files = ["PassiveSkillTrees.dat64", "PassiveSkills.dat64"]
 
     def write(self) -> None:
         all_passives = self.relational_reader["PassiveSkills.dat64"]
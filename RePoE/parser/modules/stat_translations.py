@@ -26,6 +26,11 @@ from RePoE.parser.util import call_with_default_args, get_stat_translation_file_
 
 
 class stat_translations(Parser_Module):
+    outputs = ["stat_translations", "stat_value_handlers", "stats_by_file"]
+    dat_files = ["ClientStrings.dat64"]
+    # reads the trade stats from the trade api
+    incremental = False
+
     def _convert_tags(self, n_ids: int, tags: List[int], tags_types: List[str]) -> List[str]:
         f = ["ignore" for _ in range(n_ids)]
         for tag, tag_type in zip(tags, tags_types):
@@ -18,6 +18,9 @@ def _convert_alias_stats(
 
 
 class stats(Parser_Module):
+    localized_fields = []
+    dat_files = ["Stats.dat64"]
+
     def write(self) -> None:
         root = {}
         previous: Set[str] = set()
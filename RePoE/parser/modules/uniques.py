@@ -47,6 +47,8 @@ fields = [
 
 
 class uniques(Parser_Module):
+    dat_files = ["ClientStrings.dat64", "UniqueStashLayout.dat64"]
+
     def write(self) -> None:
         root = {}
         html = (
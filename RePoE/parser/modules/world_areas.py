@@ -54,6 +54,8 @@ def map_key(key: str):
 
 
 class world_areas(Parser_Module):
+    dat_files = ["MonsterPackEntries.dat64", "MonsterPacks.dat64", "WorldAreas.dat64"]
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.packs = self.relational_reader["MonsterPacks.dat64"]
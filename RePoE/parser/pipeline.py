@@ -0,0 +1,370 @@
+import ast
+import functools
+import glob
+import hashlib
+import importlib.util
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from multiprocessing import get_context
+from typing import Any, Callable, Dict, Hashable, List, Optional, Set, TypeVar
+
+from PyPoE.poe.file.file_system import FileSystem
+from PyPoE.poe.file.specification.data import generated, poe2
+
+import RePoE.parser
+from RePoE.parser import Parser_Module, images, manifest, profiler, tracking, util
+from RePoE.parser.journal import Journal
+from RePoE.parser.util import create_relational_reader
+
+Unit = TypeVar("Unit", bound=Hashable)
+
+# state shared with the worker processes, which are forked after it is set and therefore inherit it copy-on-write
+_state: Dict[str, Any] = {}
+
+
+def configure(
+    file_system: FileSystem,
+    modules: List[type[Parser_Module]],
+    data_paths: Dict[str, str],
+    sequel: int = 1,
+    jobs: int = 1,
+    incremental: bool = False,
+    table_cache: Optional[str] = None,
+    profile: bool = False,
+    prefetch: bool = False,
+    journal: Optional[Journal] = None,
+    game_version: Optional[str] = None,
+) -> None:
+    """
+    sets up the state for running `modules` in the languages of `data_paths`.
+    the file caches are language independent, so they are shared between all languages.
+    if incremental, modules are skipped when the game files and outputs they read are the same as in their last run.
+    if table_cache is set, decoded dat files are kept in that directory between runs.
+    if profile, run() returns measurements of every module run.
+    if prefetch, the dat files declared by the modules are decoded into the table cache by a background process.
+    if journal is set, modules it records as completed are skipped and completed ones are added to it.
+    game_version is recorded for the written files in the manifest.json of each data path.
+    """
+    if prefetch and not table_cache:
+        raise ValueError("Prefetching dat files requires a table cache")
+    if incremental:
+        tracking.enable(file_system)
+    if profile:
+        profiler.enable()
+    _state.update(
+        file_system=file_system,
+        modules=modules,
+        data_paths=data_paths,
+        caches={},
+        sequel=sequel,
+        jobs=jobs,
+        incremental=incremental,
+        table_cache=table_cache,
+        prefetch=prefetch,
+        journal=journal,
+        game_version=game_version,
+    )
+
+
+def run_language(language: str) -> Dict[str, Any]:
+    relational_reader = create_relational_reader(
+        _state["file_system"], language, _state["sequel"] == 2, _state["table_cache"]
+    )
+    _state.update(
+        language=language,
+        data_path=_state["data_paths"][language],
+        relational_reader=profiler.track_tables(tracking.track_cache(relational_reader)),
+    )
+    graph = build_graph(_state["modules"])
+    prefetcher = None
+    if _state["prefetch"]:
+        # the serial run order, which the parallel one follows as far as the dependencies allow
+        order = [
+            parser_module
+            for parser_module in run_graph(graph, lambda parser_module: None)
+            if not _reuses_english(parser_module, language)
+        ]
+        # the first module is already decoding its own files
+        prefetcher = get_context("fork").Process(target=_prefetch, args=(order[1:],), daemon=True)
+        prefetcher.start()
+    try:
+        results = run_graph(graph, run_module, _state["jobs"], _update_manifest)
+    finally:
+        if prefetcher is not None:
+            prefetcher.terminate()
+            prefetcher.join()
+    return {module.__name__: result for module, result in results.items()}
+
+
+def _update_manifest(parser_module: type[Parser_Module], result: Optional[Dict[str, Any]]) -> None:
+    # runs in the main process as the modules complete, so there is only ever one writer of the manifest
+    if result is not None:
+        manifest.update(
+            _state["data_path"], result["files"], parser_module.__name__, _state["language"], _state["game_version"]
+        )
+
+
+def _prefetch(modules: List[type[Parser_Module]]) -> None:
+    """
+    decodes the dat files of the modules in the order they run, so that they are loaded from the table cache instead
+    of being decompressed and decoded when the module gets to them. runs in its own process next to the modules.
+    """
+    relational_reader = _state["relational_reader"]
+    for parser_module in modules:
+        for file_name in parser_module.dat_files:
+            if relational_reader.is_cached(file_name):
+                continue
+            try:
+                relational_reader.get_file(file_name)
+            except Exception as e:
+                print(f"Could not prefetch {file_name}: {e}")
+
+
+def run(language_jobs: int = 1) -> Dict[str, Dict[str, Any]]:
+    """
+    runs the configured modules for every language. with more than one language job, each language runs in its own
+    forked worker process, which inherits the loaded file system index and file caches from this one.
+    languages wait for English if any of the modules derive their output from the English one.
+    returns the results of run_module by language and module name.
+    """
+    graph = {
+        language: ({"English"} if any(_reuses_english(module, language) for module in _state["modules"]) else set())
+        for language in _state["data_paths"]
+    }
+    results = run_graph(graph, run_language, language_jobs)
+    if _state["journal"] is not None:
+        _state["journal"].finish()
+    return results
+
+
+def _reuses_english(parser_module: type[Parser_Module], language: str) -> bool:
+    return parser_module.localized_fields is not None and language != "English" and "English" in _state["data_paths"]
+
+
+def _repoe_imports(path: str) -> Set[str]:
+    """files of the RePoE modules imported by the python file at path"""
+    with open(path, "rb") as f:
+        tree = ast.parse(f.read(), path)
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            # the imported names can be modules as well
+            names.update([node.module] + [f"{node.module}.{alias.name}" for alias in node.names])
+    files = set()
+    for name in names:
+        if name.split(".")[0] != "RePoE":
+            continue
+        try:
+            spec = importlib.util.find_spec(name)
+        except ImportError:
+            # a name defined in a module
+            continue
+        if spec is not None and spec.origin and spec.origin.endswith(".py"):
+            files.add(spec.origin)
+    return files
+
+
+@functools.cache
+def _code_files(path: str) -> List[str]:
+    """
+    the python file at path and the files of every RePoE module it imports, directly or through the others, with
+    the models, which the writers import by the name of the output
+    """
+    files = {path}
+    queue = [path]
+    while queue:
+        for imported in _repoe_imports(queue.pop()) - files:
+            files.add(imported)
+            queue.append(imported)
+    files.update(glob.glob(os.path.join(RePoE.__REPOE_DIR__, "model", "*.py")))
+    return sorted(files)
+
+
+def _code_hash(parser_module: type[Parser_Module]) -> str:
+    """hash of the code that determines the module's output"""
+    spec = poe2 if _state["sequel"] == 2 else generated
+    sha = hashlib.sha256()
+    for path in _code_files(sys.modules[parser_module.__module__].__file__) + [spec.__file__]:
+        with open(path, "rb") as f:
+            sha.update(f.read())
+    return sha.hexdigest()
+
+
+def _written_files(state: Dict[str, Any], data_path: str) -> List[str]:
+    """the files the module wrote in the run that saved the state"""
+    return [os.path.join(data_path, path) for path in state["written"]]
+
+
+def _writer_options_key() -> Dict[str, Any]:
+    """the writer options that change which files the modules write and their contents"""
+    options = util.writer_options
+    return {
+        "validate": options.validate,
+        "json_backend": type(options.json_backend).__name__,
+        "compress": options.compress,
+        "thumbnails": options.thumbnails,
+        "dedup_images": options.dedup_images,
+        "image_cache": images.cache_is_open(),
+    }
+
+
+def _is_up_to_date(parser_module: type[Parser_Module], data_path: str, code: str) -> bool:
+    """whether the module's last run wrote its outputs from the same code, inputs and writer options"""
+    state = tracking.load_state(data_path, parser_module.__name__)
+    return (
+        tracking.is_unchanged(state, code)
+        # states saved before the writer options and written files were recorded don't match
+        and state.get("writer_options") == _writer_options_key()
+        and "written" in state
+        and all(os.path.isfile(path) for path in _written_files(state, data_path))
+    )
+
+
+def _data_files(parser_module: type[Parser_Module], language: str) -> List[str]:
+    """the outputs of other modules the module reads, the English outputs if it is localized from them"""
+    if _reuses_english(parser_module, language):
+        return [_state["data_paths"]["English"] + output + ".json" for output in parser_module.output_names()]
+    return [_state["data_path"] + output + ".min.json" for output in parser_module.inputs]
+
+
+def _journal_key(code: str, data_files: List[str]) -> str:
+    """identifies the code and outputs of other modules a journaled unit ran with, the game files are the journal's"""
+    sha = hashlib.sha256(code.encode())
+    for path in data_files:
+        sha.update(f"{path} {tracking.data_file_hash(path)}\n".encode())
+    return sha.hexdigest()
+
+
+def run_module(parser_module: type[Parser_Module]) -> Optional[Dict[str, Any]]:
+    """
+    runs or localizes the module, returns its profile if enabled and the files it wrote,
+    or None if the module was skipped
+    """
+    language = _state["language"]
+    data_path = _state["data_path"]
+    name = parser_module.__name__
+    journal: Optional[Journal] = _state["journal"]
+    incremental = _state["incremental"] and parser_module.incremental
+    code = _code_hash(parser_module) if incremental or journal is not None else ""
+    data_files = _data_files(parser_module, language)
+    key = _journal_key(code, data_files) if journal is not None else ""
+    if journal is not None and journal.is_completed(name, language, _state["sequel"], key):
+        print(f"Skipping module '{name}' ({language}), it completed before the run was interrupted")
+        return None
+    if incremental and _is_up_to_date(parser_module, data_path, code):
+        print(f"Skipping module '{name}' ({language}), its inputs are unchanged")
+        if journal is not None:
+            written = _written_files(tracking.load_state(data_path, name), data_path)
+            journal.complete(name, language, _state["sequel"], written, key)
+        return None
+
+    module = parser_module(
+        file_system=_state["file_system"],
+        data_path=data_path,
+        relational_reader=_state["relational_reader"],
+        language=language,
+        caches=_state["caches"],
+        sequel=_state["sequel"],
+    )
+    with tracking.recording() as files, manifest.recording() as written, profiler.profile(name, language) as profile:
+        if _reuses_english(parser_module, language):
+            print(f"Localizing English output of module '{name}' ({language})")
+            english_data_path = _state["data_paths"]["English"]
+            try:
+                module.localize(english_data_path)
+            finally:
+                util.drain_writes()
+        else:
+            print(f"Running module '{name}' ({language})")
+            try:
+                module.write()
+            finally:
+                # the outputs have to be complete before they are recorded and read by other modules, and the
+                # processes writing them must not outlive a module that failed
+                util.drain_writes()
+
+    if incremental:
+        tracking.save_state(
+            data_path,
+            name,
+            {
+                "code": code,
+                "files": files,
+                "data": {path: tracking.data_file_hash(path) for path in data_files},
+                "outputs": parser_module.output_names(),
+                "writer_options": _writer_options_key(),
+                # every file the module wrote, also those that aren't outputs, like the images
+                "written": sorted(os.path.relpath(path, data_path) for path in written),
+            },
+        )
+    if journal is not None:
+        journal.complete(name, language, _state["sequel"], list(written), key)
+    return {"profile": profile, "files": written}
+
+
+def build_graph(modules: List[type[Parser_Module]]) -> Dict[type[Parser_Module], Set[type[Parser_Module]]]:
+    """maps each module to the modules in `modules` that produce one of its inputs"""
+    producers = {output: module for module in modules for output in module.output_names()}
+    return {
+        module: {producers[name] for name in module.inputs if name in producers and producers[name] is not module}
+        for module in modules
+    }
+
+
+def _pop_ready(pending: Dict[Unit, Set[Unit]], done: Dict[Unit, Any]) -> List[Unit]:
+    ready = [unit for unit, dependencies in pending.items() if dependencies <= done.keys()]
+    for unit in ready:
+        del pending[unit]
+    return ready
+
+
+def run_graph(
+    graph: Dict[Unit, Set[Unit]],
+    run: Callable[[Unit], Any],
+    jobs: int = 1,
+    on_done: Optional[Callable[[Unit, Any], None]] = None,
+) -> Dict[Unit, Any]:
+    """
+    runs every unit of the graph after the units it depends on, in the graph's order where there is a choice.
+    with more than one job, independent units run at the same time in a pool of forked worker processes,
+    so `run`, the units and the results have to be picklable, and the state they need must be set up before that.
+    on_done is called in this process with each unit and its result as soon as the unit has completed.
+    returns the result of `run` for every unit.
+    """
+    pending = dict(graph)
+    done: Dict[Unit, Any] = {}
+
+    if jobs <= 1:
+        while pending:
+            unit = next((unit for unit, dependencies in pending.items() if dependencies <= done.keys()), None)
+            if unit is None:
+                raise ValueError(f"Dependency cycle between {', '.join(map(str, pending))}")
+            del pending[unit]
+            done[unit] = run(unit)
+            if on_done is not None:
+                on_done(unit, done[unit])
+        return done
+
+    with ProcessPoolExecutor(jobs, mp_context=get_context("fork")) as executor:
+        running: Dict[Future, Unit] = {}
+        while pending or running:
+            for unit in _pop_ready(pending, done):
+                running[executor.submit(run, unit)] = unit
+            if not running:
+                raise ValueError(f"Dependency cycle between {', '.join(map(str, pending))}")
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                unit = running.pop(future)
+                try:
+                    done[unit] = future.result()
+                except Exception:
+                    print(f"Failed running {unit}, waiting for running units to finish")
+                    for other in running:
+                        other.cancel()
+                    raise
+                if on_done is not None:
+                    on_done(unit, done[unit])
+    return done
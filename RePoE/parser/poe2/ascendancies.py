@@ -21,6 +21,7 @@ COLS = {
 
 
 class ascendancies(Parser_Module):
+    dat_files = ["Ascendancy.dat64", "AscendancyPassiveSkillOverrides.dat64"]
 
     def write(self) -> None:
         self.relational_reader["AscendancyPassiveSkillOverrides.dat64"].build_index("AscendancyToOverrideFor")
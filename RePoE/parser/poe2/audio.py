@@ -3,6 +3,8 @@ from RePoE.parser.util import call_with_default_args, write_json
 
 
 class audio(Parser_Module):
+    dat_files = ["CharacterEventTextAudio.dat64", "NPCTextAudio.dat64"]
+
     def write(self) -> None:
         root = {}
         for audio in self.relational_reader["NPCTextAudio.dat64"]:
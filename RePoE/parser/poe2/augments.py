@@ -5,6 +5,8 @@ from RePoE.parser.util import call_with_default_args, write_any_json
 
 
 class augments(Parser_Module):
+    dat_files = ["SoulCoreStats.dat64", "SoulCores.dat64"]
+
     def write(self) -> None:
         root = {}
         relational_reader = self.relational_reader
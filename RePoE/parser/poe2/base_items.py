@@ -134,6 +134,18 @@ def _convert_inherent_skills(item_id: str, skills_dict: Dict[str, List[str]], it
 
 
 class base_items(Parser_Module):
+    dat_files = [
+        "ArmourTypes.dat64",
+        "AttributeRequirements.dat64",
+        "BaseItemTypes.dat64",
+        "ComponentCharges.dat64",
+        "CurrencyItems.dat64",
+        "Flasks.dat64",
+        "ItemInherentSkills.dat64",
+        "ShieldTypes.dat64",
+        "WeaponTypes.dat64",
+    ]
+
     def write(self) -> None:
         relational_reader = self.relational_reader
         attribute_requirements = _create_default_dict(
@@ -11,6 +11,8 @@ from RePoE.parser.util import call_with_default_args, export_image, write_json,
 
 
 class buff_visuals(Parser_Module):
+    dat_files = ["BuffVisuals.dat64"] + [definition["dat"] + ".dat64" for definition in BUFF_SOURCES]
+
     def write(self) -> None:
         idl = IDLFile()
         idl.read(self.file_system.get_file("Art/UIImages1.txt"))
@@ -3,6 +3,8 @@ from RePoE.parser.util import write_json, call_with_default_args
 
 
 class cost_types(Parser_Module):
+    dat_files = ["CostTypes.dat64"]
+
     def write(self) -> None:
         root = {}
         for row in self.relational_reader["CostTypes.dat64"]:
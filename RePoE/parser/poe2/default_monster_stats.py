@@ -3,6 +3,9 @@ from RePoE.parser.util import write_json, call_with_default_args
 
 
 class default_monster_stats(Parser_Module):
+    localized_fields = []
+    dat_files = ["DefaultMonsterStats.dat64"]
+
     def write(self) -> None:
         root = {}
         for row in self.relational_reader["DefaultMonsterStats.dat64"]:
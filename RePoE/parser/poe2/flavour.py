@@ -3,6 +3,8 @@ from RePoE.parser.util import write_json, call_with_default_args
 
 
 class flavour(Parser_Module):
+    dat_files = ["FlavourText.dat64"]
+
     def write(self) -> None:
         root = {}
         for flavour in self.relational_reader["FlavourText.dat64"]:
@@ -3,6 +3,8 @@ from RePoE.parser.util import write_json, call_with_default_args
 
 
 class gem_tags(Parser_Module):
+    dat_files = ["GemTags.dat64"]
+
     def write(self) -> None:
         root = {}
         for tag in self.relational_reader["GemTags.dat64"]:
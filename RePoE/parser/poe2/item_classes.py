@@ -5,6 +5,8 @@ influences = ["shaper", "elder", "crusader", "eyrie", "basilisk", "adjudicator"]
 
 
 class item_classes(Parser_Module):
+    dat_files = ["ItemClasses.dat64"]
+
     def write(self) -> None:
         item_classes = {
             row["Id"]: {
@@ -3,6 +3,8 @@ from RePoE.parser.util import call_with_default_args, write_any_json
 
 
 class keywords(Parser_Module):
+    dat_files = ["KeywordPopups.dat64"]
+
     def write(self) -> None:
         keywords = {
             row["Id"]: {"term": row["Term"], "definition": row["Definition"]}
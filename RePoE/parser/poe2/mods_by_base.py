@@ -13,6 +13,8 @@ from RePoE.parser.util import call_with_default_args, write_json
 
 
 class mods_by_base(Parser_Module):
+    inputs = ["base_items", "item_classes", "mods"]
+
     def write(self) -> None:
         root = ItemClasses({})
 
@@ -91,6 +91,7 @@ def frame_art(row):
 
 
 class passives(Parser_Module):
+    dat_files = ["PassiveSkillTrees.dat64", "PassiveSkills.dat64"]
 
     def write(self) -> None:
         all_passives = self.relational_reader["PassiveSkills.dat64"]
@@ -73,6 +73,8 @@ def convert_gem(skill_gem: DatRecord, gem_effect: DatRecord, support_gem: Option
 
 
 class skill_gems(Parser_Module):
+    dat_files = ["SkillGemSupports.dat64", "SkillGems.dat64", "SupportGems.dat64"]
+
     def export_image(self, ddsfile) -> bool:
         if not self.file_exists(ddsfile):
             return False
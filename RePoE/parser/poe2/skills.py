@@ -454,6 +454,16 @@ class GemConverter:
 
 
 class skills(Parser_Module):
+    dat_files = [
+        "GemTags.dat64",
+        "GrantedEffectQualityStats.dat64",
+        "GrantedEffectStatSetsPerLevel.dat64",
+        "GrantedEffects.dat64",
+        "GrantedEffectsPerLevel.dat64",
+        "ItemExperiencePerLevel.dat64",
+        "SkillTotemVariations.dat64",
+    ]
+
     def write(self) -> None:
         skills: dict[str, dict] = {}
         relational_reader = self.relational_reader
@@ -3,13 +3,24 @@ from RePoE.parser.util import call_with_default_args, write_json, write_any_json
 
 
 class tags(Parser_Module):
+    localized_fields = ["name"]
+    outputs = ["tags", "tag_details"]
+    dat_files = ["Tags.dat64"]
+
     def write(self) -> None:
         tags = [row["Id"] for row in self.relational_reader["Tags.dat64"]]
+        write_json(tags, self.data_path, "tags")
+        self.write_tag_details()
+
+    def localize(self, english_data_path: str) -> None:
+        self.copy_output(english_data_path, "tags")
+        self.write_tag_details()
+
+    def write_tag_details(self) -> None:
         tag_details = {
             row["Id"]: {"name": row["DisplayString"], "used_in_crafting": bool(row["DisplayString"])}
             for row in self.relational_reader["Tags.dat64"]
         }
-        write_json(tags, self.data_path, "tags")
         write_any_json(tag_details, self.data_path, "tag_details")
 
 
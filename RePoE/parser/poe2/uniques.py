@@ -7,6 +7,8 @@ from RePoE.parser.util import call_with_default_args, export_image, write_json,
 
 
 class uniques(Parser_Module):
+    dat_files = ["ClientStrings.dat64", "ItemVisualIdentity.dat64", "UniqueStashLayout.dat64", "Words.dat64"]
+
     def write(self) -> None:
         root = {}
 
@@ -44,6 +44,7 @@ def pascal_case(key: str):
 
 
 class world_areas(Parser_Module):
+    dat_files = ["MonsterPackEntries.dat64", "MonsterPacks.dat64", "WorldAreas.dat64"]
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import json
+import os
+import resource
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional
+
+if TYPE_CHECKING:
+    from PyPoE.poe.file.dat import RelationalReader
+
+# measurements of the unit of work running in this process, None if it is not being profiled
+_current: Optional[Dict[str, Any]] = None
+_enabled = False
+
+
+def enable() -> None:
+    """starts counting translation lookups, must be called before the worker processes are forked"""
+    from PyPoE.poe.file.translations import TranslationFile
+
+    global _enabled
+    if _enabled:
+        return
+    _enabled = True
+    get_translation = TranslationFile.get_translation
+
+    def counted_get_translation(self, *args, **kwargs):
+        if _current is not None:
+            _current["translation_lookups"] += 1
+        return get_translation(self, *args, **kwargs)
+
+    TranslationFile.get_translation = counted_get_translation
+
+
+def track_tables(relational_reader: RelationalReader) -> RelationalReader:
+    """records the dat files the profiled unit uses and their row counts"""
+    if not _enabled:
+        return relational_reader
+    get_file = relational_reader.get_file
+
+    def tracked_get_file(file_name: str, *args, **kwargs) -> Any:
+        result = get_file(file_name, *args, **kwargs)
+        if _current is not None:
+            # get_file returns the DatFile, its reader holds the rows
+            _current["tables"][file_name] = getattr(getattr(result, "reader", None), "table_rows", None)
+        return result
+
+    relational_reader.get_file = tracked_get_file
+    return relational_reader
+
+
+def count_written(writer: str, *paths: str, seconds: float = 0.0) -> None:
+    """adds the size of the files to the bytes written by writer, and the time it took to serialize and write them"""
+    if _current is not None:
+        _current["bytes_written"][writer] += sum(os.path.getsize(path) for path in paths)
+        _current["write_seconds"][writer] += seconds
+
+
+@contextmanager
+def profile(module: str, language: str) -> Iterator[Optional[Dict[str, Any]]]:
+    """measures the with block as a run of `module` in `language` if profiling is enabled"""
+    global _current
+    if not _enabled:
+        yield None
+        return
+    _current = {
+        "module": module,
+        "language": language,
+        "pid": os.getpid(),
+        "start": time.time(),
+        "tables": {},
+        "translation_lookups": 0,
+        "bytes_written": defaultdict(int),
+        "write_seconds": defaultdict(float),
+    }
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    try:
+        yield _current
+    finally:
+        _current["wall_seconds"] = time.perf_counter() - wall
+        _current["cpu_seconds"] = time.process_time() - cpu
+        _current["peak_rss_delta_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss
+        _current["bytes_written"] = dict(_current["bytes_written"])
+        _current["write_seconds"] = dict(_current["write_seconds"])
+        _current["write_mb_per_second"] = {
+            writer: _current["bytes_written"][writer] / seconds / 1e6
+            for writer, seconds in _current["write_seconds"].items()
+            if seconds
+        }
+        _current = None
+
+
+def write_report(records: List[Dict[str, Any]], path: str) -> None:
+    """writes the records as a json report to path and as a chrome trace (chrome://tracing, perfetto) next to it"""
+    records = sorted(records, key=lambda record: record["wall_seconds"], reverse=True)
+    with open(path, "w") as f:
+        json.dump({"units": records}, f, indent=2)
+    trace_events = [
+        {
+            "name": record["module"],
+            "cat": record["language"],
+            "ph": "X",
+            "ts": int(record["start"] * 1e6),
+            "dur": int(record["wall_seconds"] * 1e6),
+            "pid": record["pid"],
+            "tid": record["pid"],
+            "args": {k: v for k, v in record.items() if k not in ["module", "start", "pid"]},
+        }
+        for record in records
+    ]
+    with open(os.path.splitext(path)[0] + ".trace.json", "w") as f:
+        json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, f)
+    print(f"Wrote profile to '{path}'")
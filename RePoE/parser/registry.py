@@ -0,0 +1,76 @@
+import glob
+import importlib
+import json
+from os.path import basename, dirname, join
+from typing import Dict, List, Optional
+
+from RePoE.parser import Parser_Module
+
+# generated by `python -m RePoE.parser.registry`, maps the parser module names of each sequel to the python module
+# defining them, so that only the modules that run have to be imported
+MANIFEST_PATH = join(dirname(__file__), "registry.json")
+PACKAGES = {1: "RePoE.parser.modules", 2: "RePoE.parser.poe2"}
+
+
+def _package_files(sequel: int) -> List[str]:
+    package_dir = join(dirname(__file__), PACKAGES[sequel].rsplit(".", 1)[1])
+    return sorted(basename(f)[:-3] for f in glob.glob(join(package_dir, "*.py")) if not f.endswith("__init__.py"))
+
+
+def _import_all(sequel: int) -> List[type[Parser_Module]]:
+    if sequel == 2:
+        from RePoE.parser.poe2 import get_poe2_modules
+
+        return get_poe2_modules()
+    from RePoE.parser.modules import get_parser_modules
+
+    return get_parser_modules()
+
+
+def build_manifest() -> Dict[str, Dict[str, str]]:
+    return {
+        str(sequel): {
+            parser_module.__name__: parser_module.__module__
+            for parser_module in sorted(_import_all(sequel), key=lambda m: m.__name__)
+        }
+        for sequel in PACKAGES
+    }
+
+
+def write_manifest() -> None:
+    with open(MANIFEST_PATH, "w") as f:
+        json.dump(build_manifest(), f, indent=2)
+        f.write("\n")
+    print(f"Wrote '{MANIFEST_PATH}'")
+
+
+def get_registry(sequel: int) -> Dict[str, str]:
+    """
+    parser module names of the sequel and the python module defining each. read from the manifest if it lists
+    exactly the files of the package, otherwise every module is imported to find them.
+    """
+    try:
+        with open(MANIFEST_PATH) as f:
+            registry: Dict[str, str] = json.load(f)[str(sequel)]
+    except (FileNotFoundError, json.JSONDecodeError, KeyError):
+        registry = {}
+    if sorted(set(module.rsplit(".", 1)[1] for module in registry.values())) == _package_files(sequel):
+        return registry
+    print(f"Warning: {MANIFEST_PATH} is out of date, run `python -m RePoE.parser.registry` to update it")
+    return {parser_module.__name__: parser_module.__module__ for parser_module in _import_all(sequel)}
+
+
+def load_modules(sequel: int, names: Optional[List[str]] = None) -> List[type[Parser_Module]]:
+    """imports the parser modules with the given names, or all of them sorted by name"""
+    registry = get_registry(sequel)
+    for name in names or []:
+        if name not in registry:
+            raise ValueError(f"There is no module '{name}' for Path of Exile {sequel}")
+    return [
+        getattr(importlib.import_module(registry[name]), name)
+        for name in (names if names is not None else sorted(registry))
+    ]
+
+
+if __name__ == "__main__":
+    write_manifest()
@@ -0,0 +1,338 @@
+"""
+exports the outputs that tools query the most into one sqlite database, so that a query doesn't have to load whole
+json files. every record gets a row with its scalar fields as columns and the whole record as json in `data`, which
+can be queried with sqlite's json functions. the lists that are looked up by, like stats, weights and tags, are
+normalized into child tables with indexes on the keys they are joined and filtered on.
+
+usage: python -m RePoE.parser.sqlite_export DATA_DIR [DATABASE, default DATA_DIR/repoe.sqlite]
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from RePoE.parser import manifest
+
+DATABASE_NAME = "repoe.sqlite"
+
+SCHEMA = """
+CREATE TABLE mods (
+    id TEXT PRIMARY KEY, name TEXT, domain TEXT, generation_type TEXT, type TEXT, required_level INTEGER,
+    is_essence_only INTEGER, text TEXT, gold_value REAL, data TEXT
+);
+CREATE TABLE mod_stats (mod_id TEXT, position INTEGER, stat_id TEXT, min INTEGER, max INTEGER);
+CREATE TABLE mod_spawn_weights (mod_id TEXT, position INTEGER, tag TEXT, weight INTEGER);
+CREATE TABLE mod_generation_weights (mod_id TEXT, position INTEGER, tag TEXT, weight INTEGER);
+CREATE TABLE mod_tags (mod_id TEXT, kind TEXT, tag TEXT);
+CREATE TABLE mod_groups (mod_id TEXT, group_id TEXT);
+
+CREATE TABLE base_items (
+    id TEXT PRIMARY KEY, name TEXT, item_class TEXT, domain TEXT, drop_level INTEGER, release_state TEXT,
+    inventory_width INTEGER, inventory_height INTEGER, inherits_from TEXT, data TEXT
+);
+CREATE TABLE base_item_tags (base_item_id TEXT, tag TEXT);
+CREATE TABLE base_item_implicits (base_item_id TEXT, position INTEGER, mod_id TEXT);
+
+CREATE TABLE gems (
+    id TEXT PRIMARY KEY, display_name TEXT, color TEXT, is_support INTEGER, base_item_id TEXT, release_state TEXT,
+    max_level INTEGER, data TEXT
+);
+CREATE TABLE gem_tags (gem_id TEXT, tag TEXT);
+CREATE TABLE gem_levels (gem_id TEXT, level INTEGER, required_level INTEGER, experience INTEGER, data TEXT);
+CREATE TABLE gem_level_stats (gem_id TEXT, level INTEGER, position INTEGER, stat_id TEXT, value INTEGER, type TEXT);
+
+CREATE TABLE stats (
+    id TEXT PRIMARY KEY, is_local INTEGER, is_aliased INTEGER, alias_main_hand TEXT, alias_off_hand TEXT
+);
+
+CREATE TABLE stat_translations (id INTEGER PRIMARY KEY, hidden INTEGER, data TEXT);
+CREATE TABLE stat_translation_stats (translation_id INTEGER, position INTEGER, stat_id TEXT);
+
+CREATE TABLE world_areas (
+    id TEXT PRIMARY KEY, name TEXT, act INTEGER, area_level INTEGER, is_town INTEGER, has_waypoint INTEGER,
+    parent_town TEXT, environment TEXT, data TEXT
+);
+CREATE TABLE world_area_tags (world_area_id TEXT, tag TEXT);
+CREATE TABLE world_area_connections (world_area_id TEXT, connected_id TEXT);
+
+CREATE TABLE uniques (
+    id TEXT PRIMARY KEY, name TEXT, item_class TEXT, is_alternate_art INTEGER, inventory_width INTEGER,
+    inventory_height INTEGER, visual_identity_id TEXT, data TEXT
+);
+"""
+
+# created after the rows are inserted, which is faster than keeping them up to date while inserting
+INDEXES = """
+CREATE INDEX mods_domain ON mods (domain, generation_type);
+CREATE INDEX mod_stats_mod ON mod_stats (mod_id);
+CREATE INDEX mod_stats_stat ON mod_stats (stat_id);
+CREATE INDEX mod_spawn_weights_mod ON mod_spawn_weights (mod_id);
+CREATE INDEX mod_spawn_weights_tag ON mod_spawn_weights (tag);
+CREATE INDEX mod_generation_weights_mod ON mod_generation_weights (mod_id);
+CREATE INDEX mod_generation_weights_tag ON mod_generation_weights (tag);
+CREATE INDEX mod_tags_mod ON mod_tags (mod_id);
+CREATE INDEX mod_tags_tag ON mod_tags (tag, kind);
+CREATE INDEX mod_groups_mod ON mod_groups (mod_id);
+CREATE INDEX mod_groups_group ON mod_groups (group_id);
+CREATE INDEX base_items_item_class ON base_items (item_class);
+CREATE INDEX base_item_tags_base_item ON base_item_tags (base_item_id);
+CREATE INDEX base_item_tags_tag ON base_item_tags (tag);
+CREATE INDEX base_item_implicits_base_item ON base_item_implicits (base_item_id);
+CREATE INDEX base_item_implicits_mod ON base_item_implicits (mod_id);
+CREATE INDEX gems_base_item ON gems (base_item_id);
+CREATE INDEX gem_tags_gem ON gem_tags (gem_id);
+CREATE INDEX gem_tags_tag ON gem_tags (tag);
+CREATE INDEX gem_levels_gem ON gem_levels (gem_id, level);
+CREATE INDEX gem_level_stats_gem ON gem_level_stats (gem_id, level);
+CREATE INDEX gem_level_stats_stat ON gem_level_stats (stat_id);
+CREATE INDEX stat_translation_stats_translation ON stat_translation_stats (translation_id);
+CREATE INDEX stat_translation_stats_stat ON stat_translation_stats (stat_id);
+CREATE INDEX world_area_tags_world_area ON world_area_tags (world_area_id);
+CREATE INDEX world_area_tags_tag ON world_area_tags (tag);
+CREATE INDEX world_area_connections_world_area ON world_area_connections (world_area_id);
+CREATE INDEX world_area_connections_connected ON world_area_connections (connected_id);
+CREATE INDEX uniques_item_class ON uniques (item_class);
+CREATE INDEX uniques_visual_identity ON uniques (visual_identity_id);
+"""
+
+Rows = Iterable[Tuple[Any, ...]]
+
+
+def _json(value: Any) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+def _mods(mods: Dict[str, Any]) -> Dict[str, Rows]:
+    return {
+        "mods": (
+            (
+                id,
+                mod["name"],
+                mod["domain"],
+                mod["generation_type"],
+                mod["type"],
+                mod["required_level"],
+                mod["is_essence_only"],
+                mod.get("text"),
+                mod.get("gold_value"),
+                _json(mod),
+            )
+            for id, mod in mods.items()
+        ),
+        "mod_stats": (
+            (id, i, stat["id"], stat["min"], stat["max"])
+            for id, mod in mods.items()
+            for i, stat in enumerate(mod["stats"])
+        ),
+        "mod_spawn_weights": (
+            (id, i, weight["tag"], weight["weight"])
+            for id, mod in mods.items()
+            for i, weight in enumerate(mod["spawn_weights"])
+        ),
+        "mod_generation_weights": (
+            (id, i, weight["tag"], weight["weight"])
+            for id, mod in mods.items()
+            for i, weight in enumerate(mod["generation_weights"])
+        ),
+        "mod_tags": (
+            (id, kind, tag) for id, mod in mods.items() for kind in ["adds_tags", "implicit_tags"] for tag in mod[kind]
+        ),
+        "mod_groups": ((id, group) for id, mod in mods.items() for group in mod["groups"]),
+    }
+
+
+def _base_items(base_items: Dict[str, Any]) -> Dict[str, Rows]:
+    return {
+        "base_items": (
+            (
+                id,
+                item["name"],
+                item["item_class"],
+                item["domain"],
+                item["drop_level"],
+                item["release_state"],
+                item["inventory_width"],
+                item["inventory_height"],
+                item.get("inherits_from"),
+                _json(item),
+            )
+            for id, item in base_items.items()
+        ),
+        "base_item_tags": ((id, tag) for id, item in base_items.items() for tag in item["tags"]),
+        "base_item_implicits": (
+            (id, i, mod_id) for id, item in base_items.items() for i, mod_id in enumerate(item["implicits"])
+        ),
+    }
+
+
+def _gems(gems: Dict[str, Any]) -> Dict[str, Rows]:
+    return {
+        "gems": (
+            (
+                id,
+                gem.get("display_name"),
+                gem["color"],
+                gem["is_support"],
+                gem.get("base_item", {}).get("id"),
+                gem.get("base_item", {}).get("release_state"),
+                gem.get("base_item", {}).get("max_level"),
+                _json(gem),
+            )
+            for id, gem in gems.items()
+        ),
+        "gem_tags": ((id, tag) for id, gem in gems.items() for tag in gem.get("tags", [])),
+        "gem_levels": (
+            (id, int(level), per_level.get("required_level"), per_level.get("experience"), _json(per_level))
+            for id, gem in gems.items()
+            for level, per_level in gem["per_level"].items()
+        ),
+        "gem_level_stats": (
+            (id, int(level), i, stat.get("id"), stat.get("value"), stat.get("type"))
+            for id, gem in gems.items()
+            for level, per_level in gem["per_level"].items()
+            for i, stat in enumerate(per_level.get("stats", []))
+            if stat
+        ),
+    }
+
+
+def _stats(stats: Dict[str, Any]) -> Dict[str, Rows]:
+    return {
+        "stats": (
+            (
+                id,
+                stat["is_local"],
+                stat["is_aliased"],
+                stat["alias"].get("when_in_main_hand"),
+                stat["alias"].get("when_in_off_hand"),
+            )
+            for id, stat in stats.items()
+        )
+    }
+
+
+def _stat_translations(translations: List[Any]) -> Dict[str, Rows]:
+    return {
+        "stat_translations": (
+            (i, translation.get("hidden", False), _json(translation)) for i, translation in enumerate(translations)
+        ),
+        "stat_translation_stats": (
+            (i, position, stat_id)
+            for i, translation in enumerate(translations)
+            for position, stat_id in enumerate(translation["ids"])
+        ),
+    }
+
+
+def _world_areas(world_areas: Dict[str, Any]) -> Dict[str, Rows]:
+    return {
+        "world_areas": (
+            (
+                id,
+                area["name"],
+                area["act"],
+                area["area_level"],
+                area["is_town"],
+                area["has_waypoint"],
+                area.get("parent_town"),
+                area.get("environment"),
+                _json(area),
+            )
+            for id, area in world_areas.items()
+        ),
+        "world_area_tags": ((id, tag) for id, area in world_areas.items() for tag in area["tags"]),
+        "world_area_connections": (
+            (id, connected) for id, area in world_areas.items() for connected in area["connections"]
+        ),
+    }
+
+
+def _uniques(uniques: Dict[str, Any]) -> Dict[str, Rows]:
+    return {
+        "uniques": (
+            (
+                id,
+                unique["name"],
+                unique["item_class"],
+                unique["is_alternate_art"],
+                unique["inventory_width"],
+                unique["inventory_height"],
+                unique["visual_identity"]["id"],
+                _json(unique),
+            )
+            for id, unique in uniques.items()
+        )
+    }
+
+
+# the rows of each table, by the output they are read from
+EXPORTS: Dict[str, Callable[[Any], Dict[str, Rows]]] = {
+    "mods": _mods,
+    "base_items": _base_items,
+    "gems": _gems,
+    "stats": _stats,
+    "stat_translations": _stat_translations,
+    "world_areas": _world_areas,
+    "uniques": _uniques,
+}
+
+
+def export(data_path: str, database: str = "", language: str = "English", game_version: Optional[str] = None) -> str:
+    """
+    writes the outputs in data_path into a new database, replacing the one at database once it is complete.
+    outputs that don't exist leave their tables empty. a database in data_path is added to its manifest.
+    returns the path of the database
+    """
+    database = database or os.path.join(data_path, DATABASE_NAME)
+    tmp_path = database + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    connection = sqlite3.connect(tmp_path)
+    try:
+        # a half written database is thrown away, so it doesn't have to survive a crash
+        connection.execute("PRAGMA journal_mode = OFF")
+        connection.execute("PRAGMA synchronous = OFF")
+        connection.executescript(SCHEMA)
+        for output, rows_of in EXPORTS.items():
+            path = os.path.join(data_path, output + ".min.json")
+            if not os.path.exists(path):
+                print(f"Skipping '{output}', it has not been written to '{data_path}'")
+                continue
+            print(f"Exporting '{output}' ...", end="", flush=True)
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            for table, rows in rows_of(data).items():
+                rows = iter(rows)
+                first = next(rows, None)
+                if first is None:
+                    continue
+                placeholders = ", ".join("?" * len(first))
+                connection.execute(f"INSERT INTO {table} VALUES ({placeholders})", first)
+                connection.executemany(f"INSERT INTO {table} VALUES ({placeholders})", rows)
+            print(" Done!")
+        connection.executescript(INDEXES)
+        connection.execute("ANALYZE")
+        connection.commit()
+    finally:
+        connection.close()
+    os.replace(tmp_path, database)
+    if not os.path.relpath(database, data_path).startswith(os.pardir):
+        with manifest.recording() as files:
+            manifest.record(database)
+        manifest.update(data_path, files, "sqlite", language, game_version)
+    print(f"Wrote '{database}'")
+    return database
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export RePoE outputs into a sqlite database")
+    parser.add_argument("data_dir")
+    parser.add_argument("database", nargs="?", default="")
+    args = parser.parse_args()
+    export(args.data_dir, args.database)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import hashlib
+import json
+import os
+import pickle
+from typing import Any, Dict, Optional
+
+from PyPoE.poe.file.dat import RelationalReader
+
+from RePoE.parser import tracking
+
+
+class CachedRelationalReader(RelationalReader):
+    """
+    RelationalReader that keeps the decoded dat files on disk, so that they only have to be decoded again when their
+    contents, the specification or the dat reader change. the files are stored before the relations between them are
+    resolved, which still happens on every run, and they are only loaded once they are requested.
+    """
+
+    def __init__(self, *args, cache_dir: str, cache_version: str, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.cache_dir = cache_dir
+        self.cache_version = cache_version
+        self.entries_dir = os.path.join(cache_dir, "tables", kwargs.get("language") or "English")
+
+    def _object_path(self, inputs: Dict[str, str]) -> str:
+        key = hashlib.sha256(json.dumps([self.cache_version, inputs], sort_keys=True).encode()).hexdigest()
+        return os.path.join(self.cache_dir, "objects", key[:2], key + ".pickle")
+
+    def _cached_path(self, file_name: str) -> Optional[str]:
+        try:
+            with open(os.path.join(self.entries_dir, file_name + ".json")) as f:
+                inputs: Dict[str, str] = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if not all(tracking.file_hash(path) == sha for path, sha in inputs.items()):
+            return None
+        return self._object_path(inputs)
+
+    def is_cached(self, file_name: str) -> bool:
+        """whether the decoded file is in the cache and up to date"""
+        object_path = self._cached_path(file_name)
+        return object_path is not None and os.path.exists(object_path)
+
+    def _load_cached(self, file_name: str) -> Optional[Any]:
+        object_path = self._cached_path(file_name)
+        if object_path is None:
+            return None
+        try:
+            with open(object_path, "rb") as f:
+                return pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def _store(self, file_name: str, inputs: Dict[str, str], instance: Any) -> None:
+        object_path = self._object_path(inputs)
+        entry_path = os.path.join(self.entries_dir, file_name + ".json")
+        tmp_paths = [object_path + f".{os.getpid()}.tmp", entry_path + f".{os.getpid()}.tmp"]
+        try:
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            with open(tmp_paths[0], "wb") as f:
+                pickle.dump(instance, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_paths[0], object_path)
+            os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+            with open(tmp_paths[1], "w") as f:
+                json.dump(inputs, f, indent=2, sort_keys=True)
+            os.replace(tmp_paths[1], entry_path)
+        except Exception as e:
+            # the cache only saves time, the run goes on with the decoded file
+            print(f"Could not cache {file_name}: {e}")
+            for tmp_path in tmp_paths:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+    def _create_instance(self, file_name: str, *args, **kwargs) -> Any:
+        instance = self._load_cached(file_name)
+        if instance is not None:
+            return instance
+        with tracking.recording() as inputs:
+            instance = super()._create_instance(file_name, *args, **kwargs)
+        if inputs:
+            self._store(file_name, inputs, instance)
+        return instance
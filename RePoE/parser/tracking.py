@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional
+
+if TYPE_CHECKING:
+    from PyPoE.poe.file.file_system import FileSystem
+    from PyPoE.poe.file.shared.cache import AbstractFileCache
+
+# sha256 of every game file read by this process, by path
+_hashes: Dict[str, str] = {}
+# inputs of the units of work currently being recorded, innermost last
+_recorders: List[Dict[str, str]] = []
+_file_system: Optional[FileSystem] = None
+
+
+def _record(inputs: Dict[str, str]) -> None:
+    for recorder in _recorders:
+        recorder.update(inputs)
+
+
+@contextmanager
+def recording() -> Iterator[Dict[str, str]]:
+    """collects the path and content hash of the game files read inside the with block"""
+    inputs: Dict[str, str] = {}
+    _recorders.append(inputs)
+    try:
+        yield inputs
+    finally:
+        _recorders.pop()
+
+
+def enable(file_system: FileSystem) -> None:
+    """starts recording the files read through file_system, must be called before any caches are created"""
+    global _file_system
+    if _file_system is file_system:
+        return
+    _file_system = file_system
+    get_file = file_system.get_file
+
+    def tracked_get_file(path: str, *args, **kwargs) -> bytes:
+        data = get_file(path, *args, **kwargs)
+        if path not in _hashes:
+            _hashes[path] = hashlib.sha256(data).hexdigest()
+        _record({path: _hashes[path]})
+        return data
+
+    file_system.get_file = tracked_get_file
+
+
+def track_cache(cache: AbstractFileCache) -> AbstractFileCache:
+    """
+    remembers which game files were read to create each file of the cache, so that they are still recorded as inputs
+    when the file is served from the cache later on (e.g. a dat table loaded by an earlier module)
+    """
+    if _file_system is None:
+        return cache
+    get_file = cache.get_file
+    created: Dict[str, Dict[str, str]] = {}
+
+    def tracked_get_file(file_name: str, *args, **kwargs) -> Any:
+        if file_name in created:
+            _record(created[file_name])
+            return get_file(file_name, *args, **kwargs)
+        with recording() as inputs:
+            result = get_file(file_name, *args, **kwargs)
+        created[file_name] = inputs
+        _record(inputs)
+        return result
+
+    cache.get_file = tracked_get_file
+    return cache
+
+
+def file_hash(path: str) -> Optional[str]:
+    """content hash of a game file, None if it does not exist anymore. recorded as an input like a read"""
+    if path not in _hashes:
+        try:
+            _file_system.get_file(path)
+        except Exception:
+            return None
+    else:
+        _record({path: _hashes[path]})
+    return _hashes[path]
+
+
+def data_file_hash(path: str) -> Optional[str]:
+    """content hash of a file on disk, e.g. the output of another module, None if it does not exist"""
+    try:
+        with open(path, "rb") as f:
+            return hashlib.file_digest(f, "sha256").hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+def state_path(data_path: str, module_name: str) -> str:
+    return os.path.join(data_path, ".repoe", "inputs", module_name + ".json")
+
+
+def load_state(data_path: str, module_name: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(state_path(data_path, module_name)) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def save_state(data_path: str, module_name: str, state: Dict[str, Any]) -> None:
+    path = state_path(data_path, module_name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "w") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def is_unchanged(state: Optional[Dict[str, Any]], code: str) -> bool:
+    """whether the code and every game and data file recorded in the state are still the same"""
+    return (
+        state is not None
+        and state["code"] == code
+        and all(file_hash(path) == sha for path, sha in state["files"].items())
+        and all(data_file_hash(path) == sha for path, sha in state["data"].items())
+    )
@@ -1,13 +1,20 @@
 import dataclasses
+import functools
+import hashlib
 import io
-import json
 import os
+import random
 import sys
+import time
 import traceback
+import typing
 from collections.abc import Callable
 from importlib import import_module
-from io import BytesIO
-from typing import Any, Optional
+from multiprocessing import get_context
+from multiprocessing.connection import Connection
+from multiprocessing.process import BaseProcess
+from types import ModuleType
+from typing import Any, Dict, Iterable, List, Optional
 
 from PIL import Image
 from pydantic import BaseModel
@@ -17,7 +24,7 @@ from PyPoE.poe.file.file_system import FileSystem
 from PyPoE.poe.file.specification.data import generated, poe2
 
 from RePoE import __DATA_PATH__, __POE2_DATA_PATH__
-from RePoE.parser import Parser_Module
+from RePoE.parser import Parser_Module, compression, images, manifest, profiler, tracking
 from RePoE.parser.constants import (
     LEGACY_ITEMS,
     STAT_DESCRIPTION_NAMING_EXCEPTIONS,
@@ -25,24 +32,271 @@ from RePoE.parser.constants import (
     UNRELEASED_ITEMS,
     ReleaseState,
 )
+from RePoE.parser.bundle_store import BundleStore, MirroredFileSystem
+from RePoE.parser.json_backend import CompatBackend, JsonBackend
+from RePoE.parser.table_cache import CachedRelationalReader
 
 
 def get_id_or_none(relational_file_cell):
     return None if relational_file_cell is None else relational_file_cell["Id"]
 
 
+@dataclasses.dataclass
+class WriterOptions:
+    # how write_json checks files against their schema: "full" validates everything and writes the validated model,
+    # "sampled" validates sample_size random entries and "off" nothing, both write the plain objects as they are
+    validate: str = "full"
+    sample_size: int = 100
+    # serializes the json files
+    json_backend: JsonBackend = dataclasses.field(default_factory=CompatBackend)
+    # number of json files that may be written in the background at the same time, 0 writes them right away
+    write_behind: int = 0
+    # compressed copies written next to every json and text file, level by format ("gz", "br" or "zst")
+    compress: Dict[str, int] = dataclasses.field(default_factory=dict)
+    # number of processes decoding and encoding exported images, 0 encodes them right away
+    image_jobs: int = 0
+    # sizes of the thumbnails saved to thumbnails/<size>/ in the data path next to every exported image
+    thumbnails: List[int] = dataclasses.field(default_factory=list)
+    # store images with the same pixels once in the images directory of the data path and link their paths to it
+    dedup_images: bool = False
+
+
+# set before the modules run, forked workers inherit it
+writer_options = WriterOptions()
+
+
+def sample(root_obj: Any, size: int) -> Any:
+    """random subset of the entries of a dict or list"""
+    if isinstance(root_obj, dict) and len(root_obj) > size:
+        return {key: root_obj[key] for key in random.sample(list(root_obj), size)}
+    if isinstance(root_obj, list) and len(root_obj) > size:
+        return random.sample(root_obj, size)
+    return root_obj
+
+
+def _print_schema(file_name: str, mod: ModuleType, model_name: str) -> None:
+    print("File:", file_name, "Model:", mod.__file__, "Schema:", os.path.abspath(f"./schema/{model_name}.schema.json"))
+
+
+def _is_collection_model(model: type[BaseModel]) -> bool:
+    """whether the model's root is a plain dict or list, so that it can be validated one entry at a time"""
+    annotation = model.model_fields["root"].annotation if "root" in model.model_fields else None
+    if typing.get_origin(annotation) is typing.Union:
+        annotation = next((arg for arg in typing.get_args(annotation) if arg is not type(None)), None)
+    return typing.get_origin(annotation) in (dict, list)
+
+
+def _tmp_path(path: str) -> str:
+    return path + f".{os.getpid()}.tmp"
+
+
+# background writes that have not been waited for yet, with the connection they send the files they wrote over
+_pending_writes: list[tuple[BaseProcess, str, Connection]] = []
+
+
+def write_behind(write: Callable[[], None], description: str) -> None:
+    """
+    runs write in a forked process if writer_options.write_behind allows it, which gets its own copy of everything
+    write uses, so the caller can go on and even change the objects being written. wait with drain_writes()
+    """
+    if not writer_options.write_behind:
+        write()
+        return
+    while len(_pending_writes) >= writer_options.write_behind:
+        if not _join_write(*_pending_writes[0]):
+            drain_writes()
+        _pending_writes.pop(0)
+    receiver, sender = get_context("fork").Pipe(duplex=False)
+    process = get_context("fork").Process(target=_write_and_wait, args=(write, sender), name=description)
+    process.start()
+    sender.close()
+    _pending_writes.append((process, description, receiver))
+
+
+def _write_and_wait(write: Callable[[], None], sender: Connection) -> None:
+    with manifest.recording() as files:
+        write()
+        compression.wait()
+    sender.send(files)
+
+
+def _join_write(process: BaseProcess, description: str, receiver: Connection) -> bool:
+    """waits for the background write, passes on the files it wrote and returns whether it succeeded"""
+    try:
+        manifest.record_files(receiver.recv())
+    except EOFError:
+        # the write failed before it could send anything
+        pass
+    process.join()
+    return process.exitcode == 0
+
+
+def drain_writes() -> None:
+    """waits for the background writes, compressions and image encodings, raises if one of them failed"""
+    images.wait()
+    compression.wait()
+    failed = []
+    while _pending_writes:
+        process, description, receiver = _pending_writes.pop(0)
+        if not _join_write(process, description, receiver):
+            failed.append(description)
+    if failed:
+        raise RuntimeError(f"Writing {', '.join(failed)} failed")
+
+
 def write_json(root_obj: Any, data_path: str, file_name: str, model_name="") -> None:
+    write_behind(lambda: _write_json(root_obj, data_path, file_name, model_name), file_name)
+
+
+def _write_json(root_obj: Any, data_path: str, file_name: str, model_name="") -> None:
     model_name = model_name or file_name.split("/")[0]
     mod = import_module("RePoE.model." + model_name)
+    if isinstance(root_obj, (dict, list)) and _is_collection_model(mod.Model):
+        # without a validated copy of the whole object, which doubles the memory needed for the big files
+        entries = root_obj.items() if isinstance(root_obj, dict) else root_obj
+        write_json_stream(entries, data_path, file_name, model_name, array=isinstance(root_obj, list))
+        return
     try:
-        write_model(mod.Model(root_obj), data_path, file_name)
+        if writer_options.validate == "full":
+            write_model(mod.Model(root_obj), data_path, file_name)
+        else:
+            if writer_options.validate == "sampled":
+                mod.Model(sample(root_obj, writer_options.sample_size))
+            write_plain(root_obj, data_path, file_name)
     except Exception:
-        print(
-            "File:", file_name, "Model:", mod.__file__, "Schema:", os.path.abspath(f"./schema/{model_name}.schema.json")
-        )
+        _print_schema(file_name, mod, model_name)
         raise
 
 
+class JsonStreamWriter:
+    """
+    writes a json object or array one entry at a time, to the same files write_json writes for the whole object.
+    each entry is validated and serialized on its own as the only entry of the file's model, only the entry
+    being added has to be kept in memory. use add() for the entries of an object, append() for those of an array
+    """
+
+    def __init__(self, data_path: str, file_name: str, model_name="", array=False) -> None:
+        self.file_name = file_name
+        self.model_name = model_name or file_name.split("/")[0]
+        self.mod = import_module("RePoE.model." + self.model_name)
+        self.path = os.path.abspath(data_path + file_name)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.array = array
+        self.written = 0
+        self.written_minified = 0
+        self.seen = 0
+        # reservoir of the entries validated at the end with --validate sampled
+        self.sample: list = []
+        self.seconds = 0.0
+
+    def __enter__(self) -> "JsonStreamWriter":
+        print("Writing '" + self.path + ".json' and '.min.json' ...", end="", flush=True)
+        self.out = io.open(_tmp_path(self.path + ".json"), mode="wb")
+        self.out_minified = io.open(_tmp_path(self.path + ".min.json"), mode="wb")
+        return self
+
+    def add(self, key: str, value: Any) -> None:
+        if self.array:
+            raise TypeError("append() adds the entries of an array")
+        self._write({key: value})
+
+    def append(self, value: Any) -> None:
+        if not self.array:
+            raise TypeError("add() adds the entries of an object")
+        self._write([value])
+
+    def _write(self, entry: Any) -> None:
+        start = time.perf_counter()
+        backend = writer_options.json_backend
+        try:
+            if writer_options.validate == "full":
+                model = self.mod.Model(entry)
+                formatted, minified = backend.model(model, minified=False), backend.model(model, minified=True)
+            else:
+                if writer_options.validate == "sampled":
+                    self._sample(entry)
+                formatted, minified = backend.plain(entry, minified=False), backend.plain(entry, minified=True)
+        except Exception:
+            _print_schema(self.file_name, self.mod, self.model_name)
+            raise
+        opening = b"[" if self.array else b"{"
+        # strip the brackets of the single entry object or array, the formatted one has them on their own lines
+        self.out.write((b",\n" if self.written else opening + b"\n") + formatted[2:-2])
+        self.written += 1
+        # the entry is left out entirely if it is null in the minified file
+        if minified[1:-1]:
+            self.out_minified.write((b"," if self.written_minified else opening) + minified[1:-1])
+            self.written_minified += 1
+        self.seconds += time.perf_counter() - start
+
+    def _sample(self, entry: Any) -> None:
+        self.seen += 1
+        if len(self.sample) < writer_options.sample_size:
+            self.sample.append(entry)
+        elif (i := random.randrange(self.seen)) < writer_options.sample_size:
+            self.sample[i] = entry
+
+    def __exit__(self, exc_type, exc_value, exc_traceback) -> None:
+        opening, closing = (b"[", b"]") if self.array else (b"{", b"}")
+        self.out.write(b"\n" + closing if self.written else opening + closing)
+        self.out_minified.write(closing if self.written_minified else opening + closing)
+        self.out.close()
+        self.out_minified.close()
+        if exc_type is not None:
+            self._remove()
+            return
+        try:
+            for entry in self.sample:
+                self.mod.Model(entry)
+        except Exception:
+            _print_schema(self.file_name, self.mod, self.model_name)
+            self._remove()
+            raise
+        for extension in [".json", ".min.json"]:
+            os.replace(_tmp_path(self.path + extension), self.path + extension)
+        _written("write_json_stream", self.path + ".json", self.path + ".min.json", seconds=self.seconds)
+        print(" Done!")
+
+    def _remove(self) -> None:
+        for extension in [".json", ".min.json"]:
+            if os.path.exists(_tmp_path(self.path + extension)):
+                os.remove(_tmp_path(self.path + extension))
+
+
+def write_json_stream(entries: Iterable, data_path: str, file_name: str, model_name="", array=False) -> None:
+    """
+    writes the (key, value) pairs of a json object, or the entries of an array if array is set, as they are produced,
+    e.g. by a generator of the module, without holding the whole object in memory
+    """
+    with JsonStreamWriter(data_path, file_name, model_name, array) as writer:
+        for entry in entries:
+            if array:
+                writer.append(entry)
+            else:
+                writer.add(*entry)
+
+
+def _written(writer: str, *paths: str, seconds: float = 0.0) -> None:
+    """called with the files a writer has completed"""
+    profiler.count_written(writer, *paths, seconds=seconds)
+    manifest.record(*paths)
+    if writer_options.compress:
+        for path in paths:
+            compression.compress_in_background(path, writer_options.compress)
+
+
+def _write_bytes(writer: str, path: str, serialize: Callable[[], bytes], label: Optional[str] = None) -> None:
+    print("Writing '" + (label or path) + "' ...", end="", flush=True)
+    start = time.perf_counter()
+    data = serialize()
+    # written next to the file and moved over it, so that the file is never seen half written
+    with io.open(_tmp_path(path), mode="wb") as out:
+        out.write(data)
+    os.replace(_tmp_path(path), path)
+    _written(writer, path, seconds=time.perf_counter() - start)
+    print(" Done!")
+
+
 def write_model(
     root_obj: BaseModel,
     data_path: str,
@@ -50,50 +304,46 @@ def write_model(
 ) -> None:
     os.makedirs(os.path.join(data_path, *file_name.split("/")[:-1]), exist_ok=True)
     path = os.path.abspath(data_path + file_name)
-    print("Writing '" + path + ".json' ...", end="", flush=True)
-    with io.open(path + ".json", mode="w") as out:
-        out.write(root_obj.model_dump_json(indent=2, by_alias=True))
-    print(" Done!")
-    print("Writing '" + path + ".min.json' ...", end="", flush=True)
-    with io.open(path + ".min.json", mode="w") as out:
-        out.write(root_obj.model_dump_json(exclude_unset=True, exclude_none=True, by_alias=True))
-    print(" Done!")
+    backend = writer_options.json_backend
+    _write_bytes("write_model", path + ".json", lambda: backend.model(root_obj, minified=False))
+    _write_bytes("write_model", path + ".min.json", lambda: backend.model(root_obj, minified=True))
 
 
-def write_any_json(
+def write_plain(
     root_obj: Any,
     data_path: str,
     file_name: str,
 ) -> None:
+    """writes the objects without a model, the keys stay in their order and only the minified file leaves out nulls"""
     os.makedirs(os.path.join(data_path, *file_name.split("/")[:-1]), exist_ok=True)
-    print("Writing '" + str(file_name) + ".json' ...", end="", flush=True)
-    json.dump(
-        root_obj,
-        io.open(os.path.join(data_path, file_name + ".json"), mode="w"),
-        indent=2,
-        sort_keys=True,
-        default=lambda o: o.__dict__,
-    )
-    print(" Done!")
-    print("Writing '" + str(file_name) + ".min.json' ...", end="", flush=True)
-    json.dump(
-        minimize(root_obj),
-        io.open(os.path.join(data_path, file_name + ".min.json"), mode="w"),
-        separators=(",", ":"),
-        sort_keys=True,
-    )
-    print(" Done!")
+    path = os.path.abspath(data_path + file_name)
+    backend = writer_options.json_backend
+    _write_bytes("write_plain", path + ".json", lambda: backend.plain(root_obj, minified=False))
+    _write_bytes("write_plain", path + ".min.json", lambda: backend.plain(root_obj, minified=True))
 
 
-def minimize(value):
-    if dataclasses.is_dataclass(value):
-        value = dataclasses.asdict(value)
-    if isinstance(value, dict):
-        return {k: minimize(v) for k, v in value.items() if v is not None}
-    elif isinstance(value, list):
-        return [minimize(v) for v in value]
-    else:
-        return value
+def write_any_json(
+    root_obj: Any,
+    data_path: str,
+    file_name: str,
+) -> None:
+    write_behind(lambda: _write_any_json(root_obj, data_path, file_name), file_name)
+
+
+def _write_any_json(
+    root_obj: Any,
+    data_path: str,
+    file_name: str,
+) -> None:
+    os.makedirs(os.path.join(data_path, *file_name.split("/")[:-1]), exist_ok=True)
+    backend = writer_options.json_backend
+    for extension, minified in [(".json", False), (".min.json", True)]:
+        _write_bytes(
+            "write_any_json",
+            os.path.join(data_path, file_name + extension),
+            lambda: backend.sorted(root_obj, minified),
+            label=str(file_name) + extension,
+        )
 
 
 def write_text(
@@ -102,49 +352,114 @@ def write_text(
     file_name: str,
 ) -> None:
     print("Writing '" + str(file_name) + "' ...", end="", flush=True)
-    with io.open(data_path + file_name, mode="w") as out:
+    with io.open(_tmp_path(data_path + file_name), mode="w") as out:
         out.write(text)
+    os.replace(_tmp_path(data_path + file_name), data_path + file_name)
     print(" Done!")
+    _written("write_text", data_path + file_name)
 
 
-def get_cdn_url(n: int):
+def get_cdn_url(n: int, store: Optional[BundleStore] = None, offline=False):
+    if offline:
+        url = store.get_latest(n) if store else None
+        if not url:
+            raise ValueError(f"No cdn url for poe {n} has been synced yet, run once without --offline first")
+        print("Using synced cdn url", url)
+        return url
     url = requests.get(f"https://ggpk.exposed/version?poe={n}").text.strip()
     print("Got cdn url", url)
+    if store:
+        store.set_latest(n, url)
     return url
 
 
-def load_file_system(ggpk_path: str) -> FileSystem:
+def game_version(source: str) -> Optional[str]:
+    """the patch version in a cdn url like https://patch.poecdn.com/3.25.3.4/, None for local game files"""
+    if not source.startswith("http"):
+        return None
+    return source.rstrip("/").rsplit("/", 1)[-1] or None
+
+
+def game_files_id(source: str) -> str:
+    """
+    identifies the game files of a source. cdn urls name the patch, local game files are identified by the size and
+    modification time of their index, which patching rewrites
+    """
+    if source.startswith("http"):
+        return source
+    if os.path.isfile(source):
+        paths = [source]
+    else:
+        paths = [os.path.join(source, "Content.ggpk"), os.path.join(source, "Bundles2", "_.index.bin")]
+    stats = [(path, os.stat(path)) for path in paths if os.path.isfile(path)]
+    return " ".join(f"{path}:{stat.st_size}:{stat.st_mtime_ns}" for path, stat in stats) or source
+
+
+def load_file_system(ggpk_path: str, store: Optional[BundleStore] = None, offline=False) -> FileSystem:
     print("Reading game data from", ggpk_path)
+    if store and ggpk_path.startswith("http"):
+        return MirroredFileSystem(ggpk_path, store, offline)
     return FileSystem(ggpk_path)
 
 
-def create_relational_reader(file_system: FileSystem, language: str, poe2spec: bool) -> RelationalReader:
+def create_relational_reader(
+    file_system: FileSystem, language: str, poe2spec: bool, cache_dir: Optional[str] = None
+) -> RelationalReader:
     opt = {
         "use_dat_value": False,
         "auto_build_index": True,
         "x64": True,
     }
+    spec = poe2 if poe2spec else generated
+    if cache_dir:
+        tracking.enable(file_system)
+        return CachedRelationalReader(
+            path_or_file_system=file_system,
+            specification=spec.specification,
+            read_options=opt,
+            language=language,
+            cache_dir=cache_dir,
+            cache_version=source_hash(sys.modules[RelationalReader.__module__], spec),
+        )
     return RelationalReader(
         path_or_file_system=file_system,
-        specification=poe2.specification if poe2spec else generated.specification,
+        specification=spec.specification,
         read_options=opt,
         language=language,
     )
 
 
+def source_hash(*modules: ModuleType) -> str:
+    sha = hashlib.sha256()
+    for module in modules:
+        with open(module.__file__, "rb") as f:
+            sha.update(f.read())
+    return sha.hexdigest()
+
+
 DEFAULT_GGPK_PATH = "/mnt/c/Program Files (x86)/Grinding Gear Games/Path of Exile"
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "repoe")
 
 
 def call_with_default_args(
     module: type[Parser_Module],
     poe2spec="poe2" in sys.argv[0],
     language="English",
+    cache_dir=DEFAULT_CACHE_PATH,
+    offline=False,
+    table_cache=False,
+    mirror=False,
 ):
-    file_system = load_file_system(get_cdn_url(2 if poe2spec else 1))
+    """
+    runs the module on the latest game files. like the --table-cache and --mirror options of repoe, table_cache keeps
+    decoded dat files and mirror the files downloaded from the cdn in cache_dir. offline only reads mirrored files
+    """
+    store = BundleStore(os.path.join(cache_dir, "bundles")) if mirror or offline else None
+    file_system = load_file_system(get_cdn_url(2 if poe2spec else 1, store, offline), store, offline)
     return module(
         file_system=file_system,
         data_path=__POE2_DATA_PATH__ if poe2spec else __DATA_PATH__,
-        relational_reader=create_relational_reader(file_system, language, poe2spec),
+        relational_reader=create_relational_reader(file_system, language, poe2spec, cache_dir if table_cache else None),
         language=language,
         caches={},
         sequel=2 if poe2spec else 1,
@@ -181,8 +496,13 @@ def get_stat_translation_file_name(game_file: str) -> Optional[str]:
 exported_images = set()
 
 
+def _crop(image: Image, box: tuple[int, int, int, int]) -> Image:
+    return image.crop(box)
+
+
 def crop(x1, y1, x2, y2):
-    return lambda image: image.crop((x1, y1, x2, y2))
+    # a partial of a module function instead of a lambda, so that it can be sent to the image workers
+    return functools.partial(_crop, box=(x1, y1, x2, y2))
 
 
 def compose_flask(img: Image):
@@ -202,7 +522,8 @@ def export_image(
     extensions=[".png", ".webp"],
     compose: Callable[[Image], Image] | None = None,
 ) -> bool:
-    dest = os.path.join(data_path, os.path.splitext(outfile or ddsfile)[0])
+    name = os.path.splitext(outfile or ddsfile)[0]
+    dest = os.path.join(data_path, name)
     if dest in exported_images:
         return True
     exported_images.add(dest)
@@ -221,9 +542,21 @@ def export_image(
         print(f"{ddsfile} was not a dds file")
         return False
 
-    with Image.open(BytesIO(bytes)) as image:
-        if compose:
-            image = compose(image)
-        for ext in extensions:
-            image.save(dest + ext)
+    paths = [dest + ext for ext in extensions]
+    thumbnails = {
+        size: [os.path.join(data_path, "thumbnails", str(size), name) + ext for ext in extensions]
+        for size in writer_options.thumbnails
+    }
+    for thumbnail_paths in thumbnails.values():
+        os.makedirs(os.path.dirname(thumbnail_paths[0]), exist_ok=True)
+    all_paths = paths + [path for thumbnail_paths in thumbnails.values() for path in thumbnail_paths]
+    key = images.cache_key(bytes, compose, extensions, writer_options.thumbnails, writer_options.dedup_images)
+    if images.is_cached(dest, key, all_paths):
+        manifest.record(*all_paths)
+        return True
+    dedup_path = data_path if writer_options.dedup_images else None
+    if writer_options.image_jobs:
+        images.encode_in_background(bytes, paths, compose, thumbnails, dedup_path, writer_options.image_jobs, dest, key)
+    else:
+        images.written(images.encode(bytes, paths, compose, thumbnails, dedup_path), dest, key, dedup_path)
     return True
@@ -4,9 +4,8 @@ from importlib import reload
 
 import RePoE
 from RePoE import __DATA_PATH__, __POE2_DATA_PATH__
-from RePoE.parser.modules import get_parser_modules
-from RePoE.parser.poe2 import get_poe2_modules
-from RePoE.parser.util import create_relational_reader, get_cdn_url, load_file_system
+from RePoE.parser import sqlite_export
+from RePoE.parser.registry import get_registry
 
 # Codes taken from the 'preferred language' setting at https://www.pathofexile.com/my-account/preferences
 LANGS = {
@@ -26,10 +25,7 @@ LANGS = {
 
 def main():
     print("Initializing RePoE")
-    modules1 = get_parser_modules()
-    modules2 = get_poe2_modules()
-
-    module_names = list(set(module.__name__ for module in modules1 + modules2))
+    module_names = list(set(get_registry(1)) | set(get_registry(2)))
     module_names.sort()
     module_names.append("all")
     parser = argparse.ArgumentParser(description="Convert GGPK files to Json using PyPoE")
@@ -44,42 +40,237 @@ def main():
     parser.add_argument("-f", "--file", help="path to your Content.ggpk file")
     parser.add_argument("-o", "--outdir", help="output directory")
     parser.add_argument("-l", "--language", default="English", choices=list(LANGS.keys()) + ["all"])
-    parser.add_argument("-rf", "--resume-from", default=None, choices=module_names)
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="number of worker processes running independent modules at the same time",
+    )
+    parser.add_argument(
+        "-lj",
+        "--language-jobs",
+        type=int,
+        default=1,
+        help="number of languages to run at the same time with '--language all', each in its own worker process",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="skip modules whose code, game files and inputs are unchanged since they last ran in the output directory",
+    )
+    parser.add_argument(
+        "--table-cache",
+        action="store_true",
+        help="keep decoded dat files in the cache directory, so unchanged ones are not decoded again on the next run",
+    )
+    parser.add_argument(
+        "--thumbnails",
+        type=lambda sizes: [int(size) for size in sizes.split(",")],
+        default=[],
+        metavar="SIZES",
+        help="also save exported images scaled to fit each of the comma separated sizes, e.g. 32,64,128, into"
+        + " thumbnails/<size>/, read from the nearest mip level of the dds file",
+    )
+    parser.add_argument(
+        "--dedup-images",
+        action="store_true",
+        help="store exported images with the same pixels once in the images directory of the output directory,"
+        + " make their paths hard links to it and map them in image_aliases.json",
+    )
+    parser.add_argument(
+        "--image-cache",
+        action="store_true",
+        help="remember the dds file, transformation and encoders of every exported image in the cache directory and"
+        + " skip images whose files were exported from the same ones before",
+    )
+    parser.add_argument("--cache-dir", help="directory for data kept between runs, ~/.cache/repoe by default")
+    parser.add_argument(
+        "--mirror",
+        action="store_true",
+        help="keep the files downloaded from the cdn in the cache directory and read them from there on later runs",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="only use the cdn files kept by earlier --mirror runs, without accessing the network",
+    )
+    parser.add_argument(
+        "--prefetch",
+        action="store_true",
+        help="decode the dat files of the upcoming modules in a background process while the current ones run,"
+        + " implies --table-cache",
+    )
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="run every module again, instead of resuming an interrupted run from the first unfinished module",
+    )
+    parser.add_argument(
+        "--validate",
+        choices=["full", "sampled", "off"],
+        default="full",
+        help="check the whole output against its schema, a random sample of its entries, or not at all",
+    )
+    parser.add_argument(
+        "--json",
+        # the names of json_backend.BACKENDS, which imports the serializers
+        choices=["compat", "fast"],
+        default="compat",
+        help="json serializer: 'compat' writes the exact same files as always, 'fast' uses orjson for the files that"
+        + " are not validated models, which writes the same json faster but not byte for byte the same",
+    )
+    parser.add_argument(
+        "--write-behind",
+        type=int,
+        default=0,
+        metavar="N",
+        help="write up to N json files of a module in background processes while the module goes on",
+    )
+    parser.add_argument(
+        "--image-jobs",
+        type=int,
+        default=0,
+        metavar="N",
+        help="decode and encode exported images in N worker processes while the modules go on",
+    )
+    parser.add_argument(
+        "--compress",
+        action="append",
+        default=[],
+        metavar="FORMAT[:LEVEL]",
+        help="also write a compressed copy of every json and text file, FORMAT is gz, br (needs brotli)"
+        + " or zst (needs zstandard). can be given more than once",
+    )
+    parser.add_argument(
+        "--delta-from",
+        metavar="OLD_DIR",
+        help="after the run, write deltas from the outputs of an earlier run in OLD_DIR to the new ones into the"
+        + " deltas directory of the output directory, see RePoE.parser.delta",
+    )
+    parser.add_argument(
+        "--sqlite",
+        action="store_true",
+        help="after the run, export mods, base items, gems, stats, stat translations, world areas and uniques into"
+        + f" {sqlite_export.DATABASE_NAME} in the output directory of each language, see RePoE.parser.sqlite_export",
+    )
+    parser.add_argument(
+        "--columnar",
+        action="store_true",
+        help="after the run, export mod stats and weights, gem levels, default monster stats and base item properties"
+        + " as numpy tables into the columnar directory of each language, see RePoE.parser.columnar",
+    )
+    parser.add_argument(
+        "--atlas",
+        action="store_true",
+        help="after the run, pack the exported buff, ui, gem and currency icons into sprite sheets with a json map"
+        + " of their positions, see RePoE.parser.atlas",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="REPORT",
+        help="write time, memory, dat tables, translation lookups and bytes written of each module run to REPORT"
+        + " as json, and as a chrome trace next to it",
+    )
     args = parser.parse_args()
 
-    print("Loading GGPK ...", end="", flush=True)
-    file_system = load_file_system(args.file or get_cdn_url(2 if args.poe2 else 1))
-    print(" Done!")
+    # imported after the arguments are parsed, so that --help and mistyped arguments don't wait for PyPoE, PIL,
+    # pydantic and the other dependencies of the modules
+    from RePoE.parser import atlas, columnar, delta, images, pipeline, profiler
+    from RePoE.parser.bundle_store import BundleStore
+    from RePoE.parser.compression import parse_formats
+    from RePoE.parser.journal import Journal
+    from RePoE.parser.json_backend import get_backend
+    from RePoE.parser.registry import load_modules
+    from RePoE.parser.util import (
+        DEFAULT_CACHE_PATH,
+        game_files_id,
+        game_version,
+        get_cdn_url,
+        load_file_system,
+        writer_options,
+    )
 
-    modules = modules2 if args.poe2 else modules1
-    if not args.module_names or "all" in args.module_names:
-        modules.sort(key=lambda m: m.__name__)
-    else:
-        modules = [next(m for m in modules if m.__name__ == name) for name in args.module_names]
+    args.cache_dir = args.cache_dir or DEFAULT_CACHE_PATH
+    try:
+        modules = load_modules(
+            2 if args.poe2 else 1, None if not args.module_names or "all" in args.module_names else args.module_names
+        )
+        writer_options.json_backend = get_backend(args.json)
+        writer_options.compress = parse_formats(args.compress)
+    except ValueError as e:
+        parser.error(str(e))
+    writer_options.validate = args.validate
+    writer_options.write_behind = args.write_behind
+    writer_options.image_jobs = args.image_jobs
+    writer_options.thumbnails = args.thumbnails
+    writer_options.dedup_images = args.dedup_images
+    if args.image_cache:
+        images.open_cache(os.path.join(args.cache_dir, "images.jsonl"))
 
-    if args.resume_from:
-        modules = modules[modules.index(next(m for m in modules if m.__name__ == args.resume_from)) :]
+    store = BundleStore(os.path.join(args.cache_dir, "bundles")) if args.mirror or args.offline else None
+    print("Loading GGPK ...", end="", flush=True)
+    source = args.file or get_cdn_url(2 if args.poe2 else 1, store, args.offline)
+    file_system = load_file_system(source, store, args.offline)
+    print(" Done!")
 
+    data_path = args.outdir or (__POE2_DATA_PATH__ if args.poe2 else __DATA_PATH__)
+    data_paths = {}
     for language in LANGS.keys() if args.language == "all" else [args.language]:
-
-        data_path = args.outdir or (__POE2_DATA_PATH__ if args.poe2 else __DATA_PATH__)
         if language == "English" or (args.outdir and args.language != "all"):
-            data_path = os.path.join(data_path, "")
+            data_paths[language] = os.path.join(data_path, "")
         else:
-            data_path = os.path.join(data_path, language, "")
-        rr = create_relational_reader(file_system, language, args.poe2)
-        caches = {}
+            data_paths[language] = os.path.join(data_path, language, "")
+
+    journal_path = os.path.join(data_path, ".repoe", "journal.jsonl")
+    if args.restart and os.path.exists(journal_path):
+        os.remove(journal_path)
 
-        for parser_module in modules:
-            print(f"Running module '{parser_module.__name__}' ({language})")
-            parser_module(
-                file_system=file_system,
-                data_path=data_path,
-                relational_reader=rr,
-                language=language,
-                caches=caches,
-                sequel=2 if args.poe2 else 1,
-            ).write()
+    pipeline.configure(
+        file_system=file_system,
+        modules=modules,
+        data_paths=data_paths,
+        sequel=2 if args.poe2 else 1,
+        jobs=args.jobs,
+        incremental=args.incremental,
+        table_cache=args.cache_dir if args.table_cache or args.prefetch else None,
+        profile=bool(args.profile),
+        prefetch=args.prefetch,
+        journal=Journal(journal_path, game_files_id(source)),
+        game_version=game_version(source),
+    )
+    results = pipeline.run(args.language_jobs)
+    if args.dedup_images:
+        for language, language_path in data_paths.items():
+            images.write_alias_map(language_path, language, game_version(source))
+    # before the deltas, which include the atlases
+    if args.atlas:
+        for language, language_path in data_paths.items():
+            atlas.write_atlases(language_path, language, game_version(source))
+    if args.delta_from:
+        for language, language_path in data_paths.items():
+            relative_path = os.path.relpath(language_path, data_path)
+            delta.write_deltas(
+                os.path.join(args.delta_from, relative_path),
+                language_path,
+                os.path.normpath(os.path.join(data_path, "deltas", relative_path)),
+            )
+    if args.sqlite:
+        for language, language_path in data_paths.items():
+            sqlite_export.export(language_path, language=language, game_version=game_version(source))
+    if args.columnar:
+        for language, language_path in data_paths.items():
+            columnar.export(language_path, language, game_version(source))
+    if args.profile:
+        profiler.write_report(
+            [
+                result["profile"]
+                for by_module in results.values()
+                for result in by_module.values()
+                if result and result["profile"]
+            ],
+            args.profile,
+        )
 
 
 def run_parser():
@@ -0,0 +1,51 @@
+"""
+time to get mod stat ranges as arrays from mods.min.json compared to loading the columnar mod_stats table that
+RePoE.parser.columnar exports. needs numpy.
+
+usage: python benchmarks/columnar.py [data dir, default RePoE/data] [--runs N]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import time
+
+import numpy
+
+from RePoE import __DATA_PATH__
+from RePoE.parser import columnar
+
+
+def from_json(data_path: str):
+    with open(os.path.join(data_path, "mods.min.json"), encoding="utf-8") as f:
+        mods = json.load(f)
+    stats = [(id, stat["id"], stat["min"], stat["max"]) for id, mod in mods.items() for stat in mod["stats"]]
+    return numpy.array([stat[2] for stat in stats]), numpy.array([stat[3] for stat in stats])
+
+
+def from_columnar(data_path: str):
+    table = columnar.load(os.path.join(data_path, columnar.DIRECTORY_NAME, "mod_stats.npz"))
+    return table["min"], table["max"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark loading mod stat ranges from json and columnar tables")
+    parser.add_argument("data_dir", nargs="?", default=__DATA_PATH__)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    if not os.path.exists(os.path.join(args.data_dir, columnar.DIRECTORY_NAME, "mod_stats.npz")):
+        columnar.export(args.data_dir)
+    for load in [from_json, from_columnar]:
+        times = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            minimums, maximums = load(args.data_dir)
+            # touches every value, so that the mapped pages are read
+            total = int(minimums.sum() + maximums.sum())
+            times.append(time.perf_counter() - start)
+        print(f"{load.__name__:>13}: {statistics.median(times) * 1000:8.2f} ms median of {args.runs}, sum {total}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+size and time of compressing exported files with each format and level that RePoE.parser.compression supports,
+to pick the levels for --compress. formats whose package is not installed are skipped.
+
+usage: python benchmarks/compression.py [files, default mods.min.json and gems.min.json in RePoE/data]
+
+on 30000 generated mods with random names, tags, weights and stats (19.4 MB minified, 32.6 MB formatted), one
+thread each:
+
+    mods.min.json        size           time          mods.json            size           time
+    gz  1          5.84 MB (30.1%)    0.64 s          gz  1          7.10 MB (21.8%)    0.33 s
+    gz  6          4.95 MB (25.5%)    1.65 s          gz  6          5.57 MB (17.1%)    0.71 s
+    gz  9          4.82 MB (24.8%)    2.10 s          gz  9          5.30 MB (16.3%)    3.27 s
+    br  5          3.65 MB (18.8%)    0.85 s          br  5          3.96 MB (12.1%)    0.72 s
+    br  9          3.34 MB (17.2%)    3.89 s          br  9          3.62 MB (11.1%)    4.93 s
+    br 11          3.03 MB (15.6%)   59.82 s          br 11          3.21 MB ( 9.8%)  126.30 s
+    zst 3          4.15 MB (21.4%)    0.19 s          zst 3          5.07 MB (15.5%)    0.16 s
+    zst 10         3.54 MB (18.2%)    1.24 s          zst 10         3.83 MB (11.7%)    1.26 s
+    zst 19         2.99 MB (15.4%)   22.49 s          zst 19         3.19 MB ( 9.8%)   39.67 s
+    zst 22         2.98 MB (15.4%)   25.51 s          zst 22         3.15 MB ( 9.7%)   53.95 s
+
+the defaults are gz 9, zst 10, past which zstd gets 20 to 30 times slower for 15% smaller files, and br 11, the only
+level that gets brotli about as small as zst 19, at a minute or two per big file.
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from RePoE import __DATA_PATH__
+from RePoE.parser import compression
+
+LEVELS = {"gz": [1, 6, 9], "br": [5, 9, 11], "zst": [3, 10, 19, 22]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the compression formats and levels")
+    parser.add_argument(
+        "files", nargs="*", default=[os.path.join(__DATA_PATH__, name) for name in ["mods.min.json", "gems.min.json"]]
+    )
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        for file in args.files:
+            path = shutil.copy(file, tmp)
+            size = os.path.getsize(path)
+            print(f"{os.path.basename(file)}: {size / 1e6:.1f} MB")
+            for format, levels in LEVELS.items():
+                try:
+                    compression.parse_formats([format])
+                except ValueError as e:
+                    print(f"  {e}")
+                    continue
+                for level in levels:
+                    start = time.perf_counter()
+                    compressed = compression.compress_file(path, format, level)
+                    seconds = time.perf_counter() - start
+                    compressed_size = os.path.getsize(compressed)
+                    print(
+                        f"  {format:>3} {level:>2}: {compressed_size / 1e6:7.2f} MB ({compressed_size / size:6.1%})"
+                        f" in {seconds:6.2f} s, {size / seconds / 1e6:6.1f} MB/s"
+                    )
+
+
+if __name__ == "__main__":
+    main()
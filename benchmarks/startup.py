@@ -0,0 +1,55 @@
+"""
+measures how long `repoe` takes to start: printing --help, which imports nothing but the registry, and getting to
+the point where a single module run starts reading game files, once through the registry manifest and once by
+importing every parser module like before it existed.
+
+usage: python benchmarks/startup.py [module] [--runs N]
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+# the imports of run_parser.main() after parsing the arguments, and the parser modules it runs
+RUN = "from RePoE.parser import atlas, columnar, delta, images, pipeline, profiler, util\n"
+COMMANDS = {
+    "--help": ["-m", "RePoE.run_parser", "--help"],
+    "registry": [
+        "-c",
+        RUN + "from RePoE.parser.registry import get_registry, load_modules\n"
+        "get_registry(1); get_registry(2); load_modules(1, [{module!r}])",
+    ],
+    "import all": [
+        "-c",
+        RUN + "from RePoE.parser.modules import get_parser_modules\n"
+        "from RePoE.parser.poe2 import get_poe2_modules\n"
+        "get_parser_modules(); get_poe2_modules()",
+    ],
+}
+
+
+def measure(arguments: list[str], runs: int) -> list[float]:
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *arguments], check=True, stdout=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the startup of single module runs")
+    parser.add_argument("module", nargs="?", default="stats")
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+    # also measures the interpreter itself, to tell how much of the startup is spent on importing
+    print(f"{'python':>12}: {statistics.median(measure(['-c', 'pass'], args.runs)) * 1000:8.1f} ms")
+    for name, arguments in COMMANDS.items():
+        times = measure([argument.format(module=args.module) for argument in arguments], args.runs)
+        print(f"{name:>12}: {statistics.median(times) * 1000:8.1f} ms (median of {args.runs})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+compares writing a model with RePoE.parser.util.write_model to serializing it to str with model_dump_json,
+which write_model did before, and to dumping the model once and serializing the dump into both files, and checks
+which of them produce the same files as write_model.
+
+write_model serializes the model twice. the single traversal is about three times as slow, because converting the
+model to python objects costs more than serializing it, and it can't produce the same minified files anyway: those
+drop null fields of models, but keep null values of dicts like the ones of gem_tags, which the dump doesn't tell
+apart. on 40000 generated mods (38 MB formatted, 19 MB minified), medians of 5 runs:
+
+     model_dump_json: 1.165 s
+         write_model: 0.898 s
+    single traversal: 3.799 s
+
+usage: python benchmarks/write_model.py [path to an exported json file, e.g. RePoE/data/gems.json] [--runs N]
+"""
+
+import argparse
+import filecmp
+import io
+import json
+import os
+import statistics
+import tempfile
+import time
+from importlib import import_module
+
+import pydantic_core
+
+from RePoE import __DATA_PATH__
+from RePoE.parser.json_backend import drop_none
+from RePoE.parser.util import write_model
+
+
+def write_model_str(root_obj, data_path: str, file_name: str) -> None:
+    path = os.path.join(data_path, file_name)
+    with io.open(path + ".json", mode="w") as out:
+        out.write(root_obj.model_dump_json(indent=2, by_alias=True))
+    with io.open(path + ".min.json", mode="w") as out:
+        out.write(root_obj.model_dump_json(exclude_unset=True, exclude_none=True, by_alias=True))
+
+
+def write_model_dump(root_obj, data_path: str, file_name: str) -> None:
+    path = os.path.join(data_path, file_name)
+    dump = root_obj.__pydantic_serializer__.to_python(root_obj, mode="json", by_alias=True)
+    with io.open(path + ".json", mode="wb") as out:
+        out.write(pydantic_core.to_json(dump, indent=2))
+    with io.open(path + ".min.json", mode="wb") as out:
+        out.write(pydantic_core.to_json(drop_none(dump)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark write_model")
+    parser.add_argument("file", nargs="?", default=os.path.join(__DATA_PATH__, "gems.json"))
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    file_name = os.path.basename(args.file)[: -len(".json")]
+    with open(args.file) as f:
+        root_obj = import_module("RePoE.model." + file_name).Model(json.load(f))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        variants = [
+            ("model_dump_json", write_model_str, "str"),
+            ("write_model", write_model, "bytes"),
+            ("single traversal", write_model_dump, "dump"),
+        ]
+        for name, write, directory in variants:
+            data_path = os.path.join(tmp, directory, "")
+            os.makedirs(data_path)
+            times = []
+            for _ in range(args.runs):
+                start = time.perf_counter()
+                write(root_obj, data_path, file_name)
+                times.append(time.perf_counter() - start)
+            print(f"{name:>16}: {statistics.median(times):.3f} s (median of {args.runs})")
+        for name, _, directory in variants:
+            for extension in [".json", ".min.json"]:
+                same = filecmp.cmp(
+                    *[os.path.join(tmp, d, file_name + extension) for d in ["bytes", directory]], shallow=False
+                )
+                print(f"{name:>16} {file_name + extension}: {'identical' if same else 'DIFFERENT'}")
+
+
+if __name__ == "__main__":
+    main()
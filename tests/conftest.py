@@ -0,0 +1,51 @@
+"""
+the tests don't read game files, so they run without PyPoE. if it isn't installed, its modules are replaced by
+stand-ins: lowercase attributes are submodules and the others empty classes, which is enough to import RePoE
+"""
+
+import importlib
+import importlib.abc
+import importlib.machinery
+import importlib.util
+import sys
+import types
+
+
+class _StandInModule(types.ModuleType):
+    def __getattr__(self, name: str):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        value = importlib.import_module(f"{self.__name__}.{name}") if name[0].islower() else type(name, (), {})
+        setattr(self, name, value)
+        return value
+
+
+class _StandInFinder(importlib.abc.MetaPathFinder, importlib.abc.Loader):
+    def find_spec(self, fullname, path, target=None):
+        if fullname.split(".")[0] != "PyPoE":
+            return None
+        return importlib.machinery.ModuleSpec(fullname, self, is_package=True)
+
+    def create_module(self, spec):
+        module = _StandInModule(spec.name)
+        module.__path__ = []
+        # hashed like the real modules, e.g. the dat specification by the incremental runs
+        module.__file__ = __file__
+        return module
+
+    def exec_module(self, module):
+        pass
+
+
+if importlib.util.find_spec("PyPoE") is None:
+    sys.meta_path.append(_StandInFinder())
+
+
+class FileSystem:
+    """game files by path, for the tests of what reads them"""
+
+    def __init__(self, files: dict) -> None:
+        self.files = files
+
+    def get_file(self, path: str) -> bytes:
+        return self.files[path]
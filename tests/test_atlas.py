@@ -0,0 +1,67 @@
+import functools
+import json
+import os
+
+import pytest
+from PIL import Image
+
+from RePoE.parser import atlas, delta, manifest, util
+
+
+def _icons(data_path: str, count: int) -> dict:
+    colors = {}
+    for i in range(count):
+        name = f"Art/2DItems/Gems/Gem{i}"
+        os.makedirs(os.path.dirname(os.path.join(data_path, name)), exist_ok=True)
+        colors[name] = (i, 2 * i, 255 - i, 255)
+        Image.new("RGBA", (10 + i, 12), colors[name]).save(os.path.join(data_path, name + ".png"))
+    return colors
+
+
+def test_pack_places_rectangles_without_overlap():
+    sizes = {f"icon{i}": (30 + i % 7, 20 + i % 5) for i in range(100)}
+    placements = atlas.pack(sizes, sheet_size=128)
+    rectangles = {}
+    for name, (sheet, x, y) in placements.items():
+        width, height = sizes[name]
+        assert x + width <= 128 and y + height <= 128
+        rectangles.setdefault(sheet, []).append((x, y, x + width, y + height))
+    for placed in rectangles.values():
+        for i, (x1, y1, x2, y2) in enumerate(placed):
+            for a1, b1, a2, b2 in placed[i + 1 :]:
+                assert x2 + atlas.PADDING <= a1 or a2 + atlas.PADDING <= x1 or y2 <= b1 or b2 <= y1
+    with pytest.raises(ValueError):
+        atlas.pack({"huge": (129, 1)}, sheet_size=128)
+
+
+def test_atlases_are_written_like_outputs(tmp_path, monkeypatch):
+    monkeypatch.setattr(util.writer_options, "compress", {"gz": 1})
+    monkeypatch.setattr(atlas, "pack", functools.partial(atlas.pack, sheet_size=32))
+    data_path = str(tmp_path) + os.sep
+    colors = _icons(data_path, 6)
+    # a sheet of an earlier run with more icons
+    os.makedirs(data_path + "atlases")
+    Image.new("RGBA", (1, 1)).save(data_path + "atlases/gems-9.png")
+    atlas.write_atlases(data_path, "English", "3.25.3.4")
+
+    with open(data_path + "atlases/gems.json") as f:
+        gems = json.load(f)
+    assert len(gems["sheets"]) > 1
+    for name, sprite in gems["sprites"].items():
+        with Image.open(data_path + "atlases/" + gems["sheets"][sprite["sheet"]] + ".png") as sheet:
+            assert sheet.getpixel((sprite["x"], sprite["y"])) == colors[name]
+            assert sheet.getpixel((sprite["x"] + sprite["w"] - 1, sprite["y"] + sprite["h"] - 1)) == colors[name]
+    assert not os.path.exists(data_path + "atlases/gems-9.png")
+
+    with open(data_path + manifest.MANIFEST_NAME) as f:
+        entries = json.load(f)["files"]
+    written = {name for name, entry in entries.items() if entry["module"] == "atlas"}
+    assert written == {
+        "atlases/gems.json",
+        "atlases/gems.min.json",
+        "atlases/gems.json.gz",
+        "atlases/gems.min.json.gz",
+        *(f"atlases/{sheet}{ext}" for sheet in gems["sheets"] for ext in atlas.EXTENSIONS),
+    }
+    files = delta.write_deltas(str(tmp_path / "old"), data_path, str(tmp_path / "deltas"))
+    assert files["atlases/gems.json"] == "added"
@@ -0,0 +1,77 @@
+import hashlib
+import os
+
+import pytest
+
+from RePoE.parser import bundle_store, util
+from RePoE.parser.bundle_store import BundleStore, MirroredFileSystem
+
+CDN_URL = "https://patch.poecdn.com/3.25.3.4/"
+
+
+@pytest.fixture
+def cdn(monkeypatch):
+    """the files of the cdn, with the paths downloaded from it"""
+    files = {"Bundles2/_.index.bin": b"index", "Bundles2/Data.bundle.bin": b"data"}
+    downloads = []
+
+    def get_file(self, path: str) -> bytes:
+        downloads.append(path)
+        return files[path]
+
+    monkeypatch.setattr(bundle_store.FileSystem, "__init__", lambda self, root_path: None)
+    monkeypatch.setattr(bundle_store.FileSystem, "_get_file", get_file, raising=False)
+    return downloads
+
+
+def _objects(store: BundleStore) -> list:
+    return [name for _, _, names in os.walk(os.path.join(store.directory, "objects")) for name in names]
+
+
+def test_files_are_stored_once_by_their_content(tmp_path):
+    store = BundleStore(str(tmp_path))
+    store.put(CDN_URL, "Bundles2/a.bundle.bin", b"same")
+    store.put("https://patch.poecdn.com/3.25.3.5/", "Bundles2/a.bundle.bin", b"same")
+    store.put(CDN_URL, "Bundles2/b.bundle.bin", b"other")
+    assert len(_objects(store)) == 2
+    assert store.get(CDN_URL, "Bundles2/a.bundle.bin") == b"same"
+    assert store.get(CDN_URL, "Bundles2/missing.bundle.bin") is None
+    assert store.get("https://patch.poecdn.com/3.26.0.1/", "Bundles2/a.bundle.bin") is None
+    # an object that was changed on disk is not served
+    with open(store._object_path(hashlib.sha256(b"other").hexdigest()), "wb") as f:
+        f.write(b"corrupted")
+    assert store.get(CDN_URL, "Bundles2/b.bundle.bin") is None
+
+
+def test_mirrored_files_are_downloaded_once(tmp_path, cdn):
+    store = BundleStore(str(tmp_path))
+    file_system = MirroredFileSystem(CDN_URL, store)
+    assert file_system._get_file("Bundles2/_.index.bin") == b"index"
+    assert MirroredFileSystem(CDN_URL, store)._get_file("Bundles2/_.index.bin") == b"index"
+    assert cdn == ["Bundles2/_.index.bin"]
+
+
+def test_offline_runs_only_read_synced_files(tmp_path, cdn):
+    store = BundleStore(str(tmp_path))
+    MirroredFileSystem(CDN_URL, store)._get_file("Bundles2/_.index.bin")
+    offline = MirroredFileSystem(CDN_URL, store, offline=True)
+    assert offline._get_file("Bundles2/_.index.bin") == b"index"
+    with pytest.raises(FileNotFoundError, match="has not been synced"):
+        offline._get_file("Bundles2/Data.bundle.bin")
+    assert cdn == ["Bundles2/_.index.bin"]
+
+
+def test_offline_runs_use_the_last_synced_cdn_url(tmp_path, monkeypatch):
+    store = BundleStore(str(tmp_path))
+    with pytest.raises(ValueError, match="run once without --offline"):
+        util.get_cdn_url(1, store, offline=True)
+
+    class Response:
+        text = CDN_URL + "\n"
+
+    monkeypatch.setattr(util.requests, "get", lambda url: Response())
+    assert util.get_cdn_url(1, store) == CDN_URL
+    monkeypatch.setattr(util.requests, "get", None)
+    assert util.get_cdn_url(1, store, offline=True) == CDN_URL
+    with pytest.raises(ValueError):
+        util.get_cdn_url(2, store, offline=True)
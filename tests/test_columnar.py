@@ -0,0 +1,69 @@
+import json
+import math
+import os
+
+import pytest
+
+from RePoE.parser import columnar, manifest
+
+numpy = pytest.importorskip("numpy")
+
+MODS = {
+    "Strength1": {
+        "stats": [{"id": "additional_strength", "min": 8, "max": 12}],
+        "spawn_weights": [{"tag": "ring", "weight": 1000}, {"tag": "default", "weight": 0}],
+        "generation_weights": [],
+    },
+    "Dexterité1": {
+        "stats": [{"id": "additional_dexterity", "min": -(2**40), "max": 2**40}],
+        "spawn_weights": [{"tag": "default", "weight": 500}],
+        "generation_weights": [{"tag": "ring", "weight": 50}],
+    },
+}
+
+
+def test_tables_load_like_numpy_reads_them(tmp_path):
+    data_path = str(tmp_path) + os.sep
+    with open(data_path + "mods.min.json", "w", encoding="utf-8") as f:
+        json.dump(MODS, f)
+    paths = columnar.export(data_path)
+    assert [os.path.basename(path) for path in paths] == [
+        "mod_stats.npz",
+        "mod_spawn_weights.npz",
+        "mod_generation_weights.npz",
+    ]
+    with open(data_path + manifest.MANIFEST_NAME) as f:
+        entries = json.load(f)["files"]
+    assert {name: entry["module"] for name, entry in entries.items()} == {
+        "columnar/" + os.path.basename(path): "columnar" for path in paths
+    }
+    table = columnar.load(paths[0])
+    with numpy.load(paths[0]) as expected:
+        assert sorted(table) == sorted(expected.files)
+        for name in expected.files:
+            assert table[name].dtype == expected[name].dtype
+            assert numpy.array_equal(table[name], expected[name])
+    assert list(table["mod.strings"][table["mod"]]) == ["Strength1", "Dexterité1"]
+    assert list(table["max"]) == [12, 2**40]
+    # mapped, not copied, and aligned
+    for column in table.values():
+        assert not column.flags.writeable
+        assert column.__array_interface__["data"][0] % columnar.ALIGNMENT == 0
+
+
+def test_missing_numbers_are_nan(tmp_path):
+    path = str(tmp_path / "levels.npz")
+    rows = [(1, 1.5), (2, columnar._number(None))]
+    assert columnar.write_table(path, [("level", "i4"), ("value", "f8")], rows) == 2
+    table = columnar.load(path)
+    assert table["level"].tolist() == [1, 2]
+    assert table["value"][0] == 1.5 and math.isnan(table["value"][1])
+
+
+def test_empty_tables(tmp_path):
+    path = str(tmp_path / "empty.npz")
+    assert columnar.write_table(path, [("mod", "str"), ("weight", "i4")], []) == 0
+    table = columnar.load(path)
+    assert len(table["mod"]) == 0 and len(table["mod.strings"]) == 0
+    with numpy.load(path) as expected:
+        assert expected["weight"].shape == (0,)
@@ -0,0 +1,52 @@
+import gzip
+import os
+
+import pytest
+
+from RePoE.parser import compression, util
+
+
+def _decompressor(format: str):
+    if format == "gz":
+        return gzip.decompress
+    if format == "br":
+        return pytest.importorskip("brotli").decompress
+    zstandard = pytest.importorskip("zstandard")
+    # streamed files don't have their size in the header, which ZstdDecompressor.decompress needs
+    return lambda data: zstandard.ZstdDecompressor().decompressobj().decompress(data)
+
+
+def _read(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("format", ["gz", "br", "zst"])
+def test_compressed_copies_decompress_to_the_written_files(tmp_path, monkeypatch, format):
+    decompress = _decompressor(format)
+    monkeypatch.setattr(util.writer_options, "compress", {format: 1})
+    data_path = str(tmp_path) + os.sep
+    # larger than a chunk, so that the compressors see more than one
+    util.write_plain({str(i): "Araignée" * (i % 7) for i in range(50000)}, data_path, "sorted")
+    util.drain_writes()
+    for extension in [".json", ".min.json"]:
+        path = data_path + "sorted" + extension
+        assert os.path.getsize(path) > compression.CHUNK_SIZE
+        assert decompress(_read(path + "." + format)) == _read(path)
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def test_gzip_copies_are_the_same_every_time(tmp_path):
+    path = str(tmp_path / "tags.json")
+    with open(path, "w") as f:
+        f.write('["attribute", "default"]')
+    first = _read(compression.compress_file(path, "gz", 9))
+    os.utime(path, (0, 0))
+    assert _read(compression.compress_file(path, "gz", 9)) == first
+
+
+def test_unknown_formats_are_rejected():
+    with pytest.raises(ValueError, match="Unknown compression format 'xz'"):
+        compression.parse_formats(["xz"])
+    assert compression.parse_formats(["gz:6", "gz"]) == {"gz": 9}
+    assert compression.parse_formats(["gz:6"]) == {"gz": 6}
@@ -0,0 +1,139 @@
+import json
+import os
+import shutil
+import sys
+
+import pytest
+
+from RePoE.model import gem_tags, mods
+from RePoE.parser import delta, manifest, util
+from RePoE.parser.json_backend import get_backend
+
+MOD = {
+    "adds_tags": [],
+    "domain": "item",
+    "generation_type": "suffix",
+    "generation_weights": [],
+    "grants_effects": [],
+    "groups": ["Strength"],
+    "implicit_tags": ["attribute"],
+    "is_essence_only": False,
+    "name": "de la Brute",
+    "required_level": 1,
+    "spawn_weights": [{"tag": "default", "weight": 1000}],
+    "stats": [{"id": "additional_strength", "max": 12, "min": 8}],
+    "text": None,
+    "type": "Strength",
+}
+
+
+def _run(data_path: str, version: int) -> None:
+    """writes the outputs of a run with every writer, version 2 adds, changes, reorders and removes entries"""
+    os.makedirs(data_path, exist_ok=True)
+    with manifest.recording() as files:
+        _write_outputs(data_path, version)
+    manifest.update(data_path, files, "test", "English", str(version))
+
+
+def _write_outputs(data_path: str, version: int) -> None:
+    old = version == 1
+    mod_list = {"Strength1": MOD, "Strength2": {**MOD, "required_level": 11}}
+    if not old:
+        mod_list = {"Dexterity1": {**MOD, "name": "de l'Araignée"}, **mod_list, "Strength2": {**MOD, "text": "1.5"}}
+    util.write_model(mods.Model(mod_list), data_path, "mods")
+    util.write_model(
+        gem_tags.Model({"fire": "Fire", "hidden": None, **({} if old else {"cold": "Froid"})}), data_path, "gem_tags"
+    )
+    sorted_data = {"b": {"x": 1e-7, "y": None, "z": "Araignée"}, "a": [1, 2] if old else [1, 2, 3.25e20]}
+    util._write_any_json(sorted_data, data_path, "sorted")
+    util.write_plain(["attribute", "default"] if old else ["default", "attribute", "life"], data_path, "tags")
+    util.write_plain({"kept": 1}, data_path, "unchanged")
+    util.write_plain({"only": "old" if old else "new"}, data_path, "removed" if old else "added")
+    with open(os.path.join(data_path, "hand_written.json"), "w") as f:
+        f.write('{ "written": "by hand", "version": %d }\n' % version)
+    # formatted like some versions of orjson format floats, which the json module and pydantic don't reproduce
+    with open(os.path.join(data_path, "floats.min.json"), "w") as f:
+        f.write("[1.5e20]" if old else "[3.25e20]")
+    manifest.record(os.path.join(data_path, "hand_written.json"), os.path.join(data_path, "floats.min.json"))
+
+
+def _files(path: str) -> dict:
+    """contents of the files below path, other than the manifest that deltas don't update"""
+    files = {}
+    for root, _, names in os.walk(path):
+        for name in names:
+            if name == manifest.MANIFEST_NAME:
+                continue
+            with open(os.path.join(root, name), "rb") as f:
+                files[os.path.relpath(os.path.join(root, name), path)] = f.read()
+    return files
+
+
+@pytest.mark.parametrize("backend", ["compat", "fast"])
+def test_applied_deltas_write_the_same_bytes(tmp_path, monkeypatch, backend):
+    if backend == "fast":
+        pytest.importorskip("orjson")
+    monkeypatch.setattr(util.writer_options, "json_backend", get_backend(backend))
+    old, new, deltas = str(tmp_path / "old") + os.sep, str(tmp_path / "new") + os.sep, str(tmp_path / "deltas")
+    _run(old, 1)
+    _run(new, 2)
+    files = delta.write_deltas(old, new, deltas)
+    assert files["unchanged.json"] == "unchanged"
+    assert files["removed.json"] == "removed"
+    assert files["added.min.json"] == "added"
+    assert files["mods.json"] == "changed"
+    with open(os.path.join(deltas, "hand_written.json" + delta.DELTA_EXTENSION)) as f:
+        assert "text" in json.load(f)
+
+    delta.apply_deltas(old, deltas, str(tmp_path / "out"))
+    assert _files(str(tmp_path / "out")) == _files(new)
+    delta.apply_deltas(old, deltas)
+    assert _files(old) == _files(new)
+
+
+def test_deltas_of_the_fast_backend_apply_without_orjson(tmp_path, monkeypatch):
+    pytest.importorskip("orjson")
+    monkeypatch.setattr(util.writer_options, "json_backend", get_backend("fast"))
+    old, new, deltas = str(tmp_path / "old") + os.sep, str(tmp_path / "new") + os.sep, str(tmp_path / "deltas")
+    _run(old, 1)
+    _run(new, 2)
+    delta.write_deltas(old, new, deltas)
+    with open(os.path.join(deltas, "floats.min.json" + delta.DELTA_EXTENSION)) as f:
+        assert json.load(f)["text"] == "[3.25e20]"
+    # without orjson
+    monkeypatch.setitem(sys.modules, "orjson", None)
+    delta.apply_deltas(old, deltas, str(tmp_path / "out"))
+    assert _files(str(tmp_path / "out")) == _files(new)
+
+
+def test_deltas_keep_the_order_of_keys():
+    old = {"a": 1, "b": {"c": 1, "d": 2}}
+    new = {"b": {"d": 2, "c": 1}, "x": 0, "a": 1}
+    assert list(delta.apply_delta(old, delta.make_delta(old, new, keep_order=True))) == ["b", "x", "a"]
+    applied = delta.apply_delta([old], delta.make_delta([old], [new], keep_order=True))
+    assert json.dumps(applied) == json.dumps([new])
+    assert delta.make_delta(old, old, keep_order=True)["set"] == {}
+
+
+def test_only_earlier_deltas_are_replaced(tmp_path):
+    old, new, deltas = str(tmp_path / "old") + os.sep, str(tmp_path / "new") + os.sep, str(tmp_path / "deltas")
+    _run(old, 1)
+    _run(new, 2)
+    os.makedirs(deltas)
+    with open(os.path.join(deltas, "notes.txt"), "w") as f:
+        f.write("not a delta")
+    with pytest.raises(ValueError, match="not empty"):
+        delta.write_deltas(old, new, deltas)
+    assert os.listdir(deltas) == ["notes.txt"]
+
+    os.remove(os.path.join(deltas, "notes.txt"))
+    delta.write_deltas(old, new, deltas)
+    # the deltas of another language in a directory below, and a file that was added there since
+    delta.write_deltas(old, new, os.path.join(deltas, "French"))
+    with open(os.path.join(deltas, "notes.txt"), "w") as f:
+        f.write("not a delta")
+    shutil.rmtree(new)
+    _run(new, 1)
+    delta.write_deltas(old, new, deltas)
+    assert sorted(os.listdir(deltas)) == ["French", delta.INDEX_NAME, "notes.txt"]
+    assert len(os.listdir(os.path.join(deltas, "French"))) > 1
@@ -0,0 +1,252 @@
+import io
+import json
+import os
+import struct
+import subprocess
+import sys
+import types
+
+import pytest
+from PIL import Image
+
+from RePoE.parser import images, manifest, util
+
+POOLS = """
+import functools
+import io
+import os
+import sys
+
+from PIL import Image
+
+import tests.conftest  # noqa: F401, PyPoE's stand-ins
+from RePoE.parser import images, pipeline
+
+out = sys.argv[1]
+buffer = io.BytesIO()
+Image.new("RGBA", (8, 8), (1, 2, 3, 255)).save(buffer, "DDS")
+
+
+def unit(name):
+    for i in range(8):
+        dest = os.path.join(out, f"{name}_{i}")
+        images.encode_in_background(buffer.getvalue(), [dest + ".png"], None, {}, None, 2, dest, None)
+    images.wait()
+    return name
+
+
+print(len(pipeline.run_graph(dict.fromkeys("abcd", set()), unit, jobs=2)))
+"""
+
+
+def _dds(color: tuple, size=(8, 8)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGBA", size, color).save(buffer, "DDS")
+    return buffer.getvalue()
+
+
+def test_module_workers_exit_with_image_jobs(tmp_path):
+    # -j 2 --image-jobs 2: every module worker starts an images pool of its own
+    result = subprocess.run(
+        [sys.executable, "-c", POOLS, str(tmp_path)],
+        cwd=os.path.dirname(os.path.dirname(__file__)),
+        capture_output=True,
+        text=True,
+        timeout=60,
+        check=True,
+    )
+    assert result.stdout.strip() == "4"
+    assert len(os.listdir(tmp_path)) == 32
+
+
+def _module(source: str) -> types.ModuleType:
+    module = types.ModuleType("compose_test")
+    exec(source, module.__dict__)
+    return module
+
+
+def test_transformations_are_identified_by_their_code():
+    assert images._compose_id(None) == ""
+    assert images._compose_id(lambda image: image) is None
+    crop = images._compose_id(util.crop(0, 0, 2, 2))
+    assert crop.startswith("RePoE.parser.util._crop ") and crop.endswith("[('box', (0, 0, 2, 2))]")
+    assert crop != images._compose_id(util.crop(0, 0, 2, 3))
+
+    calls = "def compose(image):\n    return helper(image)\n"
+    original = _module(calls + "def helper(image):\n    return image.rotate(90)\n")
+    same = _module(calls + "def helper(image):\n    return image.rotate(90)\n")
+    edited = _module(calls + "def helper(image):\n    return image.rotate(180)\n")
+    assert images._compose_id(original.compose) == images._compose_id(same.compose)
+    # the function called by the transformation changed
+    assert images._compose_id(original.compose) != images._compose_id(edited.compose)
+
+
+def test_transformations_are_identified_the_same_in_every_run():
+    script = "from RePoE.parser import images, util; print(images._compose_id(util.compose_flask))"
+    ids = {
+        subprocess.run(
+            [sys.executable, "-c", "import tests.conftest\n" + script],
+            cwd=os.path.dirname(os.path.dirname(__file__)),
+            env={**os.environ, "PYTHONHASHSEED": seed},
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        for seed in ["1", "2"]
+    }
+    assert ids == {images._compose_id(util.compose_flask) + "\n"}
+
+
+def test_exported_images_are_cached_by_their_key(tmp_path, monkeypatch):
+    monkeypatch.setattr(images, "_cache", {})
+    monkeypatch.setattr(images, "_cache_path", None)
+    cache_path = str(tmp_path / "cache" / "images.jsonl")
+    images.open_cache(cache_path)
+    dest = str(tmp_path / "icon")
+    dds = _dds((1, 2, 3, 255))
+    key = images.cache_key(dds, util.crop(0, 0, 2, 2), [".png"], [], False)
+    assert key is not None and not images.is_cached(dest, key, [dest + ".png"])
+    images.written(images.encode(dds, [dest + ".png"], util.crop(0, 0, 2, 2)), dest, key, None)
+    assert images.is_cached(dest, key, [dest + ".png"])
+    assert images.cache_key(dds, util.crop(0, 0, 2, 3), [".png"], [], False) != key
+    assert images.cache_key(dds, lambda image: image, [".png"], [], False) is None
+
+    # replaced entries are dropped when the cache is opened again
+    images.written(images.encode(dds, [dest + ".png"]), dest, "other", None)
+    images.open_cache(cache_path)
+    assert not images.is_cached(dest, key, [dest + ".png"])
+    assert images.is_cached(dest, "other", [dest + ".png"])
+    with open(cache_path) as f:
+        assert len(f.readlines()) == 1
+    os.remove(dest + ".png")
+    assert not images.is_cached(dest, "other", [dest + ".png"])
+
+
+def _mipmapped_dds(width: int, height: int, levels: list, fourcc=b"DXT1", caps2=0) -> bytes:
+    """a dds file with the mip levels, each filled with its own 16-bit rgb565 color, or bgra for fourcc None"""
+    header = bytearray(128)
+    pixel_flags, pixel_bits = (0x4, 0) if fourcc else (0x41, 32)
+    struct.pack_into("<4s6I", header, 0, b"DDS ", 124, 0x1 | 0x2 | 0x4 | 0x1000 | 0x20000, height, width, 0, 0)
+    struct.pack_into("<I", header, 28, len(levels))
+    struct.pack_into("<2I4s4I", header, 76, 32, pixel_flags, fourcc or b"\0" * 4, pixel_bits, 0xFF0000, 0xFF00, 0xFF)
+    struct.pack_into("<I", header, 104, 0xFF000000)
+    struct.pack_into("<2I", header, 108, 0x1000 | 0x400008, caps2)
+    data = b""
+    for color in levels:
+        if fourcc:
+            blocks = max(1, (width + 3) // 4) * max(1, (height + 3) // 4)
+            data += struct.pack("<2HI", color, 0, 0) * blocks
+        else:
+            data += struct.pack("<I", color) * width * height
+        width, height = max(1, width // 2), max(1, height // 2)
+    return bytes(header) + data
+
+
+@pytest.mark.parametrize("fourcc", [b"DXT1", None])
+def test_mip_level_is_the_smallest_level_large_enough(fourcc):
+    colors = [0xF800, 0x07E0, 0x001F] if fourcc else [0xFFFF0000, 0xFF00FF00, 0xFF0000FF]
+    dds = _mipmapped_dds(16, 8, colors, fourcc)
+    assert images.mip_level(dds, 16) is None
+    for size, expected_size, color in [(8, (8, 4), colors[1]), (5, (8, 4), colors[1]), (4, (4, 2), colors[2])]:
+        with Image.open(io.BytesIO(images.mip_level(dds, size))) as level:
+            assert level.size == expected_size
+            assert len(level.convert("RGB").getcolors()) == 1
+            red, green, blue = level.convert("RGB").getpixel((0, 0))
+            assert (red > 128, green > 128, blue > 128) == (
+                (color == colors[0], color == colors[1], color == colors[2])
+            )
+    # the smallest level is used for any smaller size
+    with Image.open(io.BytesIO(images.mip_level(dds, 1))) as level:
+        assert level.size == (4, 2)
+
+
+def test_mip_level_leaves_layouts_it_does_not_know():
+    assert images.mip_level(_mipmapped_dds(16, 8, [0xF800]), 4) is None
+    assert images.mip_level(_mipmapped_dds(16, 8, [0xF800, 0x07E0], caps2=0x200), 4) is None
+    assert images.mip_level(_mipmapped_dds(16, 8, [0xF800, 0x07E0], fourcc=b"XXXX"), 4) is None
+    # truncated
+    assert images.mip_level(_mipmapped_dds(16, 8, [0xF800, 0x07E0])[:-4], 4) is None
+    assert images.mip_level(_mipmapped_dds(16, 8, [0xF800, 0x07E0])[:100], 4) is None
+    assert images.mip_level(b"", 4) is None
+    assert images.mip_level(_mipmapped_dds(16, 8, [0xF800, 0x07E0], fourcc=b"DX10")[:140], 4) is None
+    # not a dds file
+    assert images.mip_level(b"\x89PNG" + _mipmapped_dds(16, 8, [0xF800, 0x07E0])[4:], 4) is None
+
+
+def _read(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_saving_without_dedup_replaces_links_instead_of_writing_through(tmp_path, monkeypatch):
+    monkeypatch.setattr(images, "_contents", {})
+    monkeypatch.setattr(images, "_contents_read", {})
+    data_path = str(tmp_path) + os.sep
+    red = Image.new("RGBA", (4, 4), (255, 0, 0, 255))
+    files = images._save(red, [data_path + "a.png", data_path + "b.png"], data_path)
+    assert os.path.samefile(data_path + "a.png", data_path + "b.png")
+    images._save(Image.new("RGBA", (4, 4), (0, 0, 255, 255)), [data_path + "a.png"], None)
+    with Image.open(data_path + "b.png") as b, Image.open(files[data_path + "b.png"]) as content:
+        assert b.getpixel((0, 0)) == content.getpixel((0, 0)) == (255, 0, 0, 255)
+    with Image.open(data_path + "a.png") as a:
+        assert a.getpixel((0, 0)) == (0, 0, 255, 255)
+
+
+def test_deduplicated_files_are_verified_before_they_are_linked_to(tmp_path, monkeypatch):
+    monkeypatch.setattr(images, "_contents", {})
+    monkeypatch.setattr(images, "_contents_read", {})
+    data_path = str(tmp_path) + os.sep
+    red = Image.new("RGBA", (4, 4), (255, 0, 0, 255))
+    content = images._save(red, [data_path + "a.png"], data_path)[data_path + "a.png"]
+    saved = _read(content)
+    # written through a link by something else
+    with open(data_path + "a.png", "r+b") as f:
+        f.write(b"garbage")
+    images._save(red, [data_path + "b.png"], data_path)
+    assert _read(content) == _read(data_path + "b.png") == saved
+    assert not os.path.samefile(data_path + "a.png", content)
+
+    # intact files are linked to as they are, also by the next run
+    monkeypatch.setattr(images, "_contents", {})
+    monkeypatch.setattr(images, "_contents_read", {})
+    inode = os.stat(content).st_ino
+    images._save(red, [data_path + "a.png"], data_path)
+    assert os.stat(content).st_ino == inode and os.path.samefile(data_path + "a.png", content)
+
+    # a file that RePoE didn't save isn't trusted either
+    blue = Image.new("RGBA", (4, 4), (0, 0, 255, 255))
+    foreign = os.path.join(os.path.dirname(content), images._pixel_hash(blue) + ".png")
+    with open(foreign, "wb") as f:
+        f.write(saved)
+    images._save(blue, [data_path + "c.png"], data_path)
+    with Image.open(data_path + "c.png") as c:
+        assert c.getpixel((0, 0)) == (0, 0, 255, 255)
+
+
+def test_workers_link_to_the_files_other_workers_saved(tmp_path, monkeypatch):
+    data_path = str(tmp_path) + os.sep
+    # the copies of two workers forked before either saved an image
+    monkeypatch.setattr(images, "_contents", {data_path: {}})
+    monkeypatch.setattr(images, "_contents_read", {data_path: 0})
+    red = Image.new("RGBA", (4, 4), (255, 0, 0, 255))
+    content = images._save(red, [data_path + "a.png"], data_path)[data_path + "a.png"]
+    inode = os.stat(content).st_ino
+    monkeypatch.setattr(images, "_contents", {data_path: {}})
+    monkeypatch.setattr(images, "_contents_read", {data_path: 0})
+    images._save(red, [data_path + "b.png"], data_path)
+    assert os.stat(content).st_ino == inode
+    assert os.path.samefile(data_path + "a.png", content) and os.path.samefile(data_path + "b.png", content)
+
+
+def test_the_alias_map_is_in_the_manifest(tmp_path, monkeypatch):
+    monkeypatch.setattr(images, "_contents", {})
+    monkeypatch.setattr(images, "_contents_read", {})
+    data_path = str(tmp_path) + os.sep
+    red = Image.new("RGBA", (4, 4), (255, 0, 0, 255))
+    files = images._save(red, [data_path + "a.png"], data_path)
+    images.written(files, data_path + "a.png", None, data_path)
+    images.write_alias_map(data_path, "English", "3.25")
+    with open(data_path + images.ALIASES_NAME) as f:
+        assert json.load(f) == {"a.png": os.path.relpath(files[data_path + "a.png"], data_path)}
+    with open(data_path + manifest.MANIFEST_NAME) as f:
+        assert json.load(f)["files"][images.ALIASES_NAME]["module"] == "image_aliases"
@@ -0,0 +1,124 @@
+import json
+import os
+import time
+
+from RePoE.parser import Parser_Module, pipeline, util
+from RePoE.parser.journal import Journal
+from RePoE.parser.util import game_files_id
+
+
+def _journal(tmp_path, source: str) -> Journal:
+    return Journal(str(tmp_path / ".repoe" / "journal.jsonl"), source)
+
+
+def test_completed_units_are_resumed(tmp_path):
+    output = tmp_path / "mods.json"
+    output.write_text("{}")
+    _journal(tmp_path, "source").complete("mods", "English", 1, [str(output), str(tmp_path / "missing.json")])
+    journal = _journal(tmp_path, "source")
+    assert journal.is_completed("mods", "English", 1)
+    assert not journal.is_completed("mods", "French", 1)
+    output.write_text('{"changed": true}')
+    assert not journal.is_completed("mods", "English", 1)
+
+
+def test_units_with_another_key_run_again(tmp_path):
+    _journal(tmp_path, "source").complete("mods", "English", 1, [], "code and inputs")
+    journal = _journal(tmp_path, "source")
+    assert journal.is_completed("mods", "English", 1, "code and inputs")
+    assert not journal.is_completed("mods", "English", 1, "changed code")
+
+
+def test_entries_of_other_game_files_are_discarded(tmp_path):
+    _journal(tmp_path, "source").complete("mods", "English", 1, [])
+    assert _journal(tmp_path, "source").is_completed("mods", "English", 1)
+    assert not _journal(tmp_path, "other source").is_completed("mods", "English", 1)
+    assert not _journal(tmp_path, "source").is_completed("mods", "English", 1)
+
+
+def test_interrupted_entries_are_ignored(tmp_path):
+    journal = _journal(tmp_path, "source")
+    journal.complete("mods", "English", 1, [])
+    with open(journal.path, "a") as f:
+        f.write('{"module": "stats", "lang')
+    journal = _journal(tmp_path, "source")
+    assert journal.is_completed("mods", "English", 1)
+    assert not journal.is_completed("stats", "English", 1)
+    journal.finish()
+    assert not os.path.exists(journal.path)
+
+
+def test_local_game_files_are_identified_by_their_index(tmp_path):
+    ggpk = tmp_path / "Content.ggpk"
+    ggpk.write_bytes(b"ggpk")
+    before = game_files_id(str(tmp_path))
+    assert before == game_files_id(str(ggpk))
+    # patched in place
+    time.sleep(0.01)
+    ggpk.write_bytes(b"ggpk patched")
+    assert game_files_id(str(tmp_path)) != before
+    assert game_files_id("https://patch.poecdn.com/3.25.3.4/") == "https://patch.poecdn.com/3.25.3.4/"
+
+
+class Graphs(Parser_Module):
+    """writes files named after the game data, like world_areas"""
+
+    def write(self) -> None:
+        util.write_plain({"name": "graphs"}, self.data_path, "graphs")
+        util.write_plain({"connections": []}, self.data_path, "1_1_1")
+
+
+class GraphNames(Parser_Module):
+    inputs = ["graphs"]
+
+    def write(self) -> None:
+        with open(self.data_path + "graphs.min.json") as f:
+            util.write_plain(json.load(f)["name"], self.data_path, "graph_names")
+
+
+def _configure(monkeypatch, data_path: str, journal: Journal, incremental: bool) -> None:
+    monkeypatch.setattr(
+        pipeline,
+        "_state",
+        {
+            "journal": journal,
+            "incremental": incremental,
+            "language": "English",
+            "data_path": data_path,
+            "data_paths": {"English": data_path},
+            "sequel": 1,
+            "file_system": None,
+            "relational_reader": None,
+            "caches": {},
+        },
+    )
+
+
+def test_files_that_are_not_declared_outputs_are_journaled_and_checked(tmp_path, monkeypatch):
+    data_path = str(tmp_path) + os.sep
+    journal = _journal(tmp_path, "source")
+    _configure(monkeypatch, data_path, journal, incremental=True)
+    assert pipeline.run_module(Graphs) is not None
+    assert set(journal.completed["Graphs", "English", 1]["outputs"]) >= {
+        data_path + "1_1_1.json",
+        data_path + "1_1_1.min.json",
+    }
+    pipeline._state["journal"] = None
+    assert pipeline.run_module(Graphs) is None
+    os.remove(data_path + "1_1_1.min.json")
+    assert pipeline.run_module(Graphs) is not None
+    assert os.path.exists(data_path + "1_1_1.min.json")
+
+
+def test_journaled_units_run_again_when_their_inputs_changed(tmp_path, monkeypatch):
+    data_path = str(tmp_path) + os.sep
+    _configure(monkeypatch, data_path, _journal(tmp_path, "source"), incremental=False)
+    pipeline.run_module(Graphs)
+    assert pipeline.run_module(GraphNames) is not None
+    # resumed
+    _configure(monkeypatch, data_path, _journal(tmp_path, "source"), incremental=False)
+    assert pipeline.run_module(GraphNames) is None
+    util.write_plain({"name": "renamed"}, data_path, "graphs")
+    assert pipeline.run_module(GraphNames) is not None
+    with open(data_path + "graph_names.json") as f:
+        assert json.load(f) == "renamed"
@@ -0,0 +1,52 @@
+import dataclasses
+import json
+
+import pytest
+
+from RePoE.parser.json_backend import JsonBackend, drop_none, get_backend, minimize
+
+
+@dataclasses.dataclass
+class Stat:
+    id: str
+    min: int
+    max: int | None = None
+
+
+DATA = {
+    "Strength1": {"name": "of the Brute", "text": None, "stats": [Stat("additional_strength", 8, 12), Stat("x", 1)]},
+    "Life1": {"name": "Hale", "tags": ["life", None], "weights": {"default": 1000, "ring": None}},
+}
+
+
+def test_compat_backend_writes_what_the_json_module_does():
+    backend = get_backend("compat")
+    data = {"b": [1, {"d": None, "c": "é"}], "a": None}
+    assert backend.sorted(data, False) == json.dumps(data, indent=2, sort_keys=True).encode()
+    assert backend.sorted(data, True) == b'{"b":[1,{"c":"\\u00e9"}]}'
+
+
+@pytest.mark.parametrize("minified", [False, True])
+@pytest.mark.parametrize("writer", ["plain", "sorted"])
+def test_fast_backend_writes_the_same_bytes_for_ascii_data(writer, minified):
+    pytest.importorskip("orjson")
+    data = json.loads(json.dumps(DATA, default=lambda o: o.__dict__))
+    compat = getattr(get_backend("compat"), writer)(data, minified)
+    assert getattr(get_backend("fast"), writer)(data, minified) == compat
+    assert getattr(get_backend("fast"), writer)(DATA, minified) == compat
+
+
+def test_drop_none_only_copies_what_contains_nulls():
+    assert drop_none(DATA) == minimize(DATA)
+    untouched = {"a": [1, 2], "b": {"c": "d"}}
+    value = {"untouched": untouched, "dropped": {"e": None}}
+    assert drop_none(value)["untouched"] is untouched
+    assert drop_none(untouched) is untouched
+
+
+def test_backends_have_to_sort():
+    class Unsorted(JsonBackend):
+        pass
+
+    with pytest.raises(TypeError):
+        Unsorted()
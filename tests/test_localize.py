@@ -0,0 +1,102 @@
+import json
+import os
+
+import pytest
+
+from RePoE.parser import Parser_Module, manifest, pipeline, util
+from RePoE.parser.modules.characters import characters
+from RePoE.parser.modules.stats import stats
+from RePoE.parser.modules.tags import tags
+
+CHARACTER = {
+    "base_stats": {
+        "dexterity": 14,
+        "intelligence": 14,
+        "life": 38,
+        "mana": 34,
+        "strength": 32,
+        "unarmed": {"attack_time": 666, "max_physical_damage": 6, "min_physical_damage": 2, "range": 4},
+    },
+    "integer_id": 1,
+    "metadata_id": "Metadata/Characters/Str/Str",
+    "name": "Marauder",
+}
+
+
+def _module(parser_module: type[Parser_Module], data_path: str, rows: dict) -> Parser_Module:
+    return parser_module(file_system=None, data_path=data_path, relational_reader=rows, language="French", caches={})
+
+
+def _read(path: str):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def data_paths(tmp_path):
+    english, french = str(tmp_path / "English") + os.sep, str(tmp_path / "French") + os.sep
+    os.makedirs(english)
+    os.makedirs(french)
+    return english, french
+
+
+def test_outputs_without_localized_fields_are_copied(data_paths):
+    english, french = data_paths
+    util.write_plain({"base_life": {"is_local": False}}, english, "stats")
+    with manifest.recording() as files:
+        _module(stats, french, {}).localize(english)
+    for extension in [".json", ".min.json"]:
+        with open(english + "stats" + extension, "rb") as f, open(french + "stats" + extension, "rb") as g:
+            assert f.read() == g.read()
+    assert sorted(files) == [os.path.abspath(french + "stats.json"), os.path.abspath(french + "stats.min.json")]
+
+
+def test_tags_copy_the_ids_and_translate_the_names(data_paths):
+    english, french = data_paths
+    util.write_json(["fire", "cold"], english, "tags")
+    rows = {"Tags.dat64": [{"Id": "fire", "DisplayString": "Feu"}, {"Id": "cold", "DisplayString": "Froid"}]}
+    _module(tags, french, rows).localize(english)
+    assert _read(french + "tags.json") == ["fire", "cold"]
+    assert _read(french + "tag_details.json") == {"cold": {"name": "Froid"}, "fire": {"name": "Feu"}}
+
+
+def test_characters_only_translate_their_names(data_paths):
+    english, french = data_paths
+    util.write_json([CHARACTER], english, "characters")
+    _module(characters, french, {"Characters.dat64": [{"Name": "Maraudeur"}]}).localize(english)
+    assert _read(french + "characters.min.json") == [{**CHARACTER, "name": "Maraudeur"}]
+
+
+def test_modules_with_localized_fields_have_to_localize_them(data_paths):
+    english, french = data_paths
+
+    class Translated(Parser_Module):
+        localized_fields = ["name"]
+
+    with pytest.raises(NotImplementedError):
+        _module(Translated, french, {}).localize(english)
+
+
+def test_other_languages_are_localized_from_the_english_outputs(data_paths, monkeypatch):
+    english, french = data_paths
+    util.write_plain({"base_life": {"is_local": False}}, english, "stats")
+    monkeypatch.setattr(
+        pipeline,
+        "_state",
+        {
+            "journal": None,
+            "incremental": False,
+            "language": "French",
+            "data_path": french,
+            "data_paths": {"English": english, "French": french},
+            "sequel": 1,
+            "file_system": None,
+            "relational_reader": {},
+            "caches": {},
+        },
+    )
+    assert pipeline._reuses_english(stats, "French") and not pipeline._reuses_english(stats, "English")
+    assert not pipeline._reuses_english(Parser_Module, "French")
+    result = pipeline.run_module(stats)
+    assert set(result["files"]) == {os.path.abspath(french + "stats.json"), os.path.abspath(french + "stats.min.json")}
+    assert _read(french + "stats.json") == {"base_life": {"is_local": False}}
@@ -0,0 +1,47 @@
+import hashlib
+import json
+import os
+
+from RePoE.parser import manifest, util
+
+
+def _entries(data_path: str) -> dict:
+    with open(os.path.join(data_path, manifest.MANIFEST_NAME)) as f:
+        return json.load(f)["files"]
+
+
+def _sha256(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def test_compressed_copies_are_in_the_manifest(tmp_path, monkeypatch):
+    monkeypatch.setattr(util.writer_options, "compress", {"gz": 9})
+    data_path = str(tmp_path) + os.sep
+    with manifest.recording() as files:
+        util.write_plain(["attribute", "default"], data_path, "tags")
+        util.drain_writes()
+    manifest.update(data_path, files, "tags", "English", "3.25")
+    entries = _entries(data_path)
+    assert sorted(entries) == ["tags.json", "tags.json.gz", "tags.min.json", "tags.min.json.gz"]
+    for name, entry in entries.items():
+        assert entry["sha256"] == _sha256(data_path + name)
+        assert entry["size"] == os.path.getsize(data_path + name)
+        assert (entry["module"], entry["language"], entry["game_version"]) == ("tags", "English", "3.25")
+
+
+def test_entries_of_removed_files_are_dropped_with_their_module(tmp_path):
+    data_path = str(tmp_path) + os.sep
+    with manifest.recording() as files:
+        util.write_plain({"a": 1}, data_path, "kept")
+        util.write_plain({"b": 2}, data_path, "removed")
+    manifest.update(data_path, files, "module", "English", None)
+    os.remove(data_path + "removed.json")
+    os.remove(data_path + "removed.min.json")
+    with manifest.recording() as files:
+        util.write_plain({"c": 3}, data_path, "other")
+    manifest.update(data_path, files, "other", "English", None)
+    # until the module that wrote them runs again
+    assert "removed.json" in _entries(data_path)
+    manifest.update(data_path, {}, "module", "English", None)
+    assert sorted(_entries(data_path)) == ["kept.json", "kept.min.json", "other.json", "other.min.json"]
@@ -0,0 +1,205 @@
+import functools
+import json
+import os
+import time
+import types
+
+import pytest
+
+from RePoE.parser import Parser_Module, manifest, pipeline, tracking, util
+
+
+def _record(log: str, unit: str) -> str:
+    with open(log, "a") as f:
+        f.write(f"{unit} {os.getpid()}\n")
+    return unit.upper()
+
+
+def _sleep_and_record(log: str, unit: str) -> str:
+    time.sleep(0.2)
+    return _record(log, unit)
+
+
+def _fail(unit: str) -> None:
+    if unit == "broken":
+        raise RuntimeError("broken")
+
+
+def _read_log(log: str) -> list:
+    with open(log) as f:
+        return [line.split() for line in f]
+
+
+def test_run_graph_runs_dependencies_first(tmp_path):
+    log = str(tmp_path / "log")
+    graph = {"c": {"a", "b"}, "a": set(), "b": {"a"}, "d": set()}
+    results = pipeline.run_graph(graph, lambda unit: _record(log, unit))
+    assert [unit for unit, _ in _read_log(log)] == ["a", "b", "c", "d"]
+    assert results == {"a": "A", "b": "B", "c": "C", "d": "D"}
+
+
+def test_run_graph_runs_independent_units_in_parallel(tmp_path):
+    log = str(tmp_path / "log")
+    graph = {"a": set(), "b": set(), "c": {"a", "b"}}
+    done = []
+    results = pipeline.run_graph(
+        graph,
+        functools.partial(_sleep_and_record, log),
+        jobs=2,
+        on_done=lambda unit, result: done.append((unit, os.getpid())),
+    )
+    entries = _read_log(log)
+    assert results == {"a": "A", "b": "B", "c": "C"}
+    assert entries[-1][0] == "c"
+    # in worker processes, with the callbacks in this one
+    assert {pid for _, pid in entries}.isdisjoint({str(os.getpid())})
+    assert {pid for _, pid in done} == {os.getpid()}
+    assert [unit for unit, _ in done][-1] == "c"
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_run_graph_rejects_cycles(jobs):
+    with pytest.raises(ValueError, match="cycle"):
+        pipeline.run_graph({"a": {"b"}, "b": {"a"}}, _fail, jobs)
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_run_graph_raises_failures(jobs):
+    with pytest.raises(RuntimeError, match="broken"):
+        pipeline.run_graph({"broken": set(), "after": {"broken"}}, _fail, jobs)
+
+
+class Producer(Parser_Module):
+    outputs = ["produced", "other"]
+
+
+class Consumer(Parser_Module):
+    inputs = ["produced", "not_produced"]
+
+
+class Reader(Parser_Module):
+    inputs = ["Consumer", "other"]
+
+
+def test_build_graph_links_inputs_to_their_producers():
+    assert pipeline.build_graph([Reader, Consumer, Producer]) == {
+        Reader: {Consumer, Producer},
+        Consumer: {Producer},
+        Producer: set(),
+    }
+
+
+def test_changed_writer_options_rerun_modules(tmp_path, monkeypatch):
+    data_path = str(tmp_path) + os.sep
+    for output in Producer.outputs:
+        (tmp_path / (output + ".json")).write_text("{}")
+    state = {"code": "1", "files": {}, "data": {}, "written": [output + ".json" for output in Producer.outputs]}
+    tracking.save_state(data_path, "Producer", state)
+    # states of earlier runs didn't record the writer options
+    assert not pipeline._is_up_to_date(Producer, data_path, "1")
+
+    tracking.save_state(data_path, "Producer", {**state, "writer_options": pipeline._writer_options_key()})
+    assert pipeline._is_up_to_date(Producer, data_path, "1")
+    assert not pipeline._is_up_to_date(Producer, data_path, "2")
+    monkeypatch.setattr(util.writer_options, "compress", {"gz": 9})
+    assert not pipeline._is_up_to_date(Producer, data_path, "1")
+    monkeypatch.setattr(util.writer_options, "compress", {})
+    monkeypatch.setattr(util.writer_options, "thumbnails", [64])
+    assert not pipeline._is_up_to_date(Producer, data_path, "1")
+
+
+class Languages(Parser_Module):
+    def write(self) -> None:
+        util.write_plain({"language": self.language, "pid": os.getpid()}, self.data_path, "Languages")
+
+
+class Copied(Parser_Module):
+    localized_fields = []
+
+    def write(self) -> None:
+        util.write_plain({"pid": os.getpid()}, self.data_path, "Copied")
+
+
+def _read_json(path: str):
+    with open(path) as f:
+        return json.load(f)
+
+
+def test_languages_run_in_their_own_workers(tmp_path, monkeypatch):
+    data_paths = {language: str(tmp_path / language) + os.sep for language in ["English", "French", "German"]}
+    for data_path in data_paths.values():
+        os.makedirs(data_path)
+    reader = types.SimpleNamespace(get_file=None)
+    monkeypatch.setattr(pipeline, "create_relational_reader", lambda *args: reader)
+    monkeypatch.setattr(pipeline, "_state", {})
+    pipeline.configure(None, [Copied, Languages], data_paths)
+    results = pipeline.run(language_jobs=2)
+
+    assert set(results) == set(data_paths)
+    pids = {language: _read_json(data_paths[language] + "Languages.json")["pid"] for language in data_paths}
+    assert os.getpid() not in pids.values()
+    for language, data_path in data_paths.items():
+        assert _read_json(data_path + "Languages.json")["language"] == language
+        # derived from the English output, which the other languages waited for
+        assert _read_json(data_path + "Copied.json") == {"pid": pids["English"]}
+        entries = _read_json(data_path + manifest.MANIFEST_NAME)["files"]
+        assert {name: entry["module"] for name, entry in entries.items()} == {
+            "Copied.json": "Copied",
+            "Copied.min.json": "Copied",
+            "Languages.json": "Languages",
+            "Languages.min.json": "Languages",
+        }
+        assert set(results[language]) == {"Copied", "Languages"}
+
+
+def _decoded(log: str) -> list:
+    return [file_name for file_name, _ in _read_log(log)]
+
+
+class PrefetchReader:
+    """decodes dat files by writing them to a log, which is shared with the prefetching process"""
+
+    def __init__(self, log: str) -> None:
+        self.log = log
+
+    def is_cached(self, file_name: str) -> bool:
+        return file_name == "Cached.dat64"
+
+    def get_file(self, file_name: str) -> None:
+        _record(self.log, file_name)
+
+
+class First(Parser_Module):
+    outputs = ["first"]
+    dat_files = ["First.dat64"]
+
+    def write(self) -> None:
+        # until the files of the next module have been decoded in the background
+        log = self.relational_reader.log
+        deadline = time.time() + 10
+        while time.time() < deadline and not (os.path.exists(log) and "Next.dat64" in _decoded(log)):
+            time.sleep(0.01)
+        util.write_plain([], self.data_path, "first")
+
+
+class Next(Parser_Module):
+    inputs = ["first"]
+    dat_files = ["Cached.dat64", "Next.dat64"]
+
+    def write(self) -> None:
+        util.write_plain([], self.data_path, "Next")
+
+
+def test_prefetching_decodes_the_files_of_later_modules_in_the_background(tmp_path, monkeypatch):
+    log = str(tmp_path / "log")
+    data_path = str(tmp_path / "English") + os.sep
+    os.makedirs(data_path)
+    monkeypatch.setattr(pipeline, "create_relational_reader", lambda *args: PrefetchReader(log))
+    monkeypatch.setattr(pipeline, "_state", {})
+    with pytest.raises(ValueError, match="table cache"):
+        pipeline.configure(None, [Next, First], {"English": data_path}, prefetch=True)
+    pipeline.configure(None, [Next, First], {"English": data_path}, table_cache=str(tmp_path), prefetch=True)
+    pipeline.run_language("English")
+    # the first module decodes its own files, cached ones are left alone
+    assert [(file_name, pid != str(os.getpid())) for file_name, pid in _read_log(log)] == [("Next.dat64", True)]
+    assert os.path.exists(data_path + "Next.json")
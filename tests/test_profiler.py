@@ -0,0 +1,62 @@
+import json
+import os
+import types
+
+from PyPoE.poe.file.translations import TranslationFile
+
+from RePoE.parser import profiler, util
+
+
+def _reader(rows: dict):
+    # get_file of a RelationalReader returns the DatFile, whose reader has the rows
+    return types.SimpleNamespace(
+        get_file=lambda file_name: types.SimpleNamespace(reader=types.SimpleNamespace(table_rows=rows[file_name]))
+    )
+
+
+def test_profiles_measure_the_work_of_their_unit(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiler, "_enabled", False)
+    monkeypatch.setattr(TranslationFile, "get_translation", lambda self, tags, values: "text", raising=False)
+    profiler.enable()
+    reader = profiler.track_tables(_reader({"Mods.dat64": 3, "Stats.dat64": 5}))
+    data_path = str(tmp_path) + os.sep
+    with profiler.profile("mods", "English") as record:
+        reader.get_file("Mods.dat64")
+        TranslationFile().get_translation(["stat"], [1])
+        TranslationFile().get_translation(["stat"], [2])
+        util.write_plain({"Strength1": {"name": "of the Brute"}}, data_path, "mods")
+    # outside of the profiled unit
+    reader.get_file("Stats.dat64")
+    util.write_plain({}, data_path, "stats")
+
+    assert (record["module"], record["language"], record["pid"]) == ("mods", "English", os.getpid())
+    assert record["tables"] == {"Mods.dat64": 3}
+    assert record["translation_lookups"] == 2
+    size = os.path.getsize(data_path + "mods.json") + os.path.getsize(data_path + "mods.min.json")
+    assert record["bytes_written"] == {"write_plain": size}
+    assert record["wall_seconds"] >= record["write_seconds"]["write_plain"] > 0
+    assert record["cpu_seconds"] >= 0
+
+
+def test_units_are_not_measured_without_profiling(monkeypatch):
+    monkeypatch.setattr(profiler, "_enabled", False)
+    reader = _reader({"Mods.dat64": 3})
+    assert profiler.track_tables(reader) is reader
+    with profiler.profile("mods", "English") as record:
+        assert record is None
+
+
+def test_reports_list_the_slowest_units_first(tmp_path):
+    records = [
+        {"module": "mods", "language": "English", "pid": 1, "start": 10.0, "wall_seconds": 1.0},
+        {"module": "gems", "language": "English", "pid": 2, "start": 10.5, "wall_seconds": 2.0},
+    ]
+    profiler.write_report(records, str(tmp_path / "profile.json"))
+    with open(tmp_path / "profile.json") as f:
+        assert [unit["module"] for unit in json.load(f)["units"]] == ["gems", "mods"]
+    with open(tmp_path / "profile.trace.json") as f:
+        events = json.load(f)["traceEvents"]
+    assert [(event["name"], event["ts"], event["dur"], event["pid"]) for event in events] == [
+        ("gems", 10500000, 2000000, 2),
+        ("mods", 10000000, 1000000, 1),
+    ]
@@ -0,0 +1,20 @@
+import subprocess
+import sys
+
+HELP = """
+import sys
+from RePoE import run_parser
+
+sys.argv = ["repoe", "--help"]
+try:
+    run_parser.main()
+except SystemExit:
+    pass
+print(",".join(sorted({name.split(".")[0] for name in sys.modules} & {"PIL", "PyPoE", "pydantic", "requests"})))
+"""
+
+
+def test_help_does_not_import_the_dependencies_of_the_modules():
+    result = subprocess.run([sys.executable, "-c", HELP], capture_output=True, text=True, check=True)
+    assert "usage: repoe" in result.stdout
+    assert result.stdout.splitlines()[-1] == ""
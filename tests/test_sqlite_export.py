@@ -0,0 +1,65 @@
+import json
+import os
+import sqlite3
+
+from RePoE.parser import manifest, sqlite_export
+
+MODS = {
+    "Strength1": {
+        "adds_tags": [],
+        "domain": "item",
+        "generation_type": "suffix",
+        "generation_weights": [{"tag": "ring", "weight": 0}],
+        "grants_effects": [],
+        "groups": ["Strength"],
+        "implicit_tags": ["attribute"],
+        "is_essence_only": False,
+        "name": "of the Brute",
+        "required_level": 1,
+        "spawn_weights": [{"tag": "default", "weight": 1000}],
+        "stats": [{"id": "additional_strength", "max": 12, "min": 8}],
+        "type": "Strength",
+    },
+}
+STAT_TRANSLATIONS = [
+    {"English": [], "ids": ["additional_strength"]},
+    {"English": [], "hidden": True, "ids": ["base_life", "base_mana"]},
+]
+
+
+def _write(data_path, name: str, data) -> None:
+    with open(os.path.join(data_path, name + ".min.json"), "w") as f:
+        json.dump(data, f)
+
+
+def test_export_writes_the_rows_of_the_outputs(tmp_path):
+    _write(tmp_path, "mods", MODS)
+    _write(tmp_path, "stat_translations", STAT_TRANSLATIONS)
+    database = sqlite_export.export(str(tmp_path), language="English", game_version="3.25")
+    assert database == os.path.join(str(tmp_path), sqlite_export.DATABASE_NAME)
+
+    connection = sqlite3.connect(database)
+    try:
+        assert connection.execute("SELECT id, name, domain, required_level, is_essence_only FROM mods").fetchall() == [
+            ("Strength1", "of the Brute", "item", 1, 0)
+        ]
+        assert json.loads(connection.execute("SELECT data FROM mods").fetchone()[0]) == MODS["Strength1"]
+        assert connection.execute("SELECT * FROM mod_stats").fetchall() == [
+            ("Strength1", 0, "additional_strength", 8, 12)
+        ]
+        assert connection.execute("SELECT tag, weight FROM mod_spawn_weights").fetchall() == [("default", 1000)]
+        assert connection.execute("SELECT tag, weight FROM mod_generation_weights").fetchall() == [("ring", 0)]
+        assert connection.execute("SELECT kind, tag FROM mod_tags").fetchall() == [("implicit_tags", "attribute")]
+        assert connection.execute(
+            "SELECT t.hidden, s.stat_id FROM stat_translations t JOIN stat_translation_stats s"
+            " ON s.translation_id = t.id ORDER BY s.translation_id, s.position"
+        ).fetchall() == [(0, "additional_strength"), (1, "base_life"), (1, "base_mana")]
+        # outputs that weren't written leave their tables empty
+        assert connection.execute("SELECT COUNT(*) FROM base_items").fetchone() == (0,)
+    finally:
+        connection.close()
+
+    with open(os.path.join(tmp_path, manifest.MANIFEST_NAME)) as f:
+        entry = json.load(f)["files"][sqlite_export.DATABASE_NAME]
+    assert (entry["module"], entry["language"], entry["game_version"]) == ("sqlite", "English", "3.25")
+    assert entry["size"] == os.path.getsize(database)
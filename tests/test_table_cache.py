@@ -0,0 +1,45 @@
+import os
+
+from RePoE.parser import tracking
+from RePoE.parser.table_cache import CachedRelationalReader
+from tests.conftest import FileSystem
+
+
+def _reader(cache_dir: str) -> CachedRelationalReader:
+    # without the RelationalReader, which needs game files
+    reader = CachedRelationalReader.__new__(CachedRelationalReader)
+    reader.cache_dir = cache_dir
+    reader.cache_version = "1"
+    reader.entries_dir = os.path.join(cache_dir, "tables", "English")
+    return reader
+
+
+def _files(directory) -> list:
+    return sorted(
+        os.path.relpath(os.path.join(root, name), directory) for root, _, names in os.walk(directory) for name in names
+    )
+
+
+def test_stored_tables_are_loaded_while_their_inputs_are_unchanged(tmp_path):
+    file_system = FileSystem({"Data/Mods.dat64": b"mods"})
+    tracking.enable(file_system)
+    reader = _reader(str(tmp_path))
+    with tracking.recording() as inputs:
+        file_system.get_file("Data/Mods.dat64")
+    reader._store("Mods.dat64", inputs, {"rows": [1, 2]})
+    assert reader.is_cached("Mods.dat64")
+    assert reader._load_cached("Mods.dat64") == {"rows": [1, 2]}
+    assert reader._load_cached("Stats.dat64") is None
+
+
+class Unpicklable:
+    def __reduce__(self):
+        raise RuntimeError("can't be pickled")
+
+
+def test_failing_to_store_a_table_leaves_nothing_behind(tmp_path, capsys):
+    reader = _reader(str(tmp_path))
+    reader._store("Mods.dat64", {"Data/Mods.dat64": "sha"}, [1, Unpicklable()])
+    assert "Could not cache Mods.dat64" in capsys.readouterr().out
+    assert not reader.is_cached("Mods.dat64")
+    assert not [name for name in _files(tmp_path) if name.endswith(".tmp")]
@@ -0,0 +1,60 @@
+import os
+
+from RePoE.parser import pipeline, tracking
+from tests.conftest import FileSystem
+
+
+def test_recording_collects_the_files_read():
+    file_system = FileSystem({"Data/Mods.dat64": b"mods", "Data/Stats.dat64": b"stats"})
+    tracking.enable(file_system)
+    with tracking.recording() as outer:
+        file_system.get_file("Data/Mods.dat64")
+        with tracking.recording() as inner:
+            file_system.get_file("Data/Stats.dat64")
+    assert set(outer) == {"Data/Mods.dat64", "Data/Stats.dat64"}
+    assert set(inner) == {"Data/Stats.dat64"}
+
+
+def test_tracked_caches_record_their_inputs_when_served_again():
+    file_system = FileSystem({"Metadata/a.txt": b"a"})
+    tracking.enable(file_system)
+
+    class Cache:
+        def get_file(self, file_name):
+            return file_system.get_file(file_name)
+
+    cache = tracking.track_cache(Cache())
+    cache.get_file("Metadata/a.txt")
+    with tracking.recording() as inputs:
+        cache.get_file("Metadata/a.txt")
+    assert set(inputs) == {"Metadata/a.txt"}
+
+
+def test_is_unchanged(tmp_path):
+    data_file = tmp_path / "mods.min.json"
+    data_file.write_text("{}")
+    file_system = FileSystem({"Data/Mods.dat64": b"mods"})
+    tracking.enable(file_system)
+    with tracking.recording() as files:
+        file_system.get_file("Data/Mods.dat64")
+    data = {str(data_file): tracking.data_file_hash(str(data_file))}
+    tracking.save_state(str(tmp_path), "mods", {"code": "1", "files": files, "data": data})
+    state = tracking.load_state(str(tmp_path), "mods")
+    assert tracking.is_unchanged(state, "1")
+    assert not tracking.is_unchanged(state, "2")
+    data_file.write_text('{"a": 1}')
+    assert not tracking.is_unchanged(state, "1")
+    assert not tracking.is_unchanged(None, "1")
+
+
+def test_code_files_follow_the_repoe_imports():
+    from RePoE.parser.modules import buff_visuals
+
+    parser_dir = os.path.dirname(pipeline.__file__)
+    files = pipeline._code_files(buff_visuals.__file__)
+    for name in ["modules/buff_visuals.py", "modules/buffs.py", "__init__.py", "util.py", "constants.py"]:
+        assert os.path.join(parser_dir, name) in files
+    assert os.path.join(parser_dir, "json_backend.py") in files
+    assert os.path.join(os.path.dirname(parser_dir), "model", "buff_visuals.py") in files
+    # other parser modules don't change its output
+    assert os.path.join(parser_dir, "modules", "mods.py") not in files
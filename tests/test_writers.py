@@ -0,0 +1,145 @@
+import os
+from importlib import import_module
+
+import pytest
+
+from RePoE.model import gem_tags, mods
+from RePoE.parser import manifest, util
+from RePoE.parser.json_backend import get_backend
+from RePoE.parser.util import write_model
+
+MODS = {
+    "Strength1": {
+        "adds_tags": [],
+        "domain": "item",
+        "generation_type": "suffix",
+        "generation_weights": [],
+        "grants_effects": [],
+        "groups": ["Strength"],
+        "implicit_tags": ["attribute"],
+        "is_essence_only": False,
+        "name": "of the Brute",
+        "required_level": 1,
+        "spawn_weights": [{"tag": "default", "weight": 1000}],
+        "stats": [{"id": "additional_strength", "max": 12, "min": 8}],
+        "text": None,
+        "type": "Strength",
+    },
+}
+
+
+def _read(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_write_model_writes_what_model_dump_json_does(tmp_path):
+    data_path = str(tmp_path) + os.sep
+    for module, data in [(mods, MODS), (gem_tags, {"fire": "Fire", "hidden": None})]:
+        model = module.Model(data)
+        write_model(model, data_path, module.__name__.rsplit(".", 1)[1])
+        path = data_path + module.__name__.rsplit(".", 1)[1]
+        assert _read(path + ".json") == model.model_dump_json(indent=2, by_alias=True).encode()
+        assert (
+            _read(path + ".min.json")
+            == model.model_dump_json(exclude_unset=True, exclude_none=True, by_alias=True).encode()
+        )
+    # null fields of models are left out of the minified file, null values of dicts are not
+    assert b'"text"' not in _read(data_path + "mods.min.json")
+    assert _read(data_path + "gem_tags.min.json") == b'{"fire":"Fire","hidden":null}'
+
+
+@pytest.mark.parametrize("backend", ["compat", "fast"])
+@pytest.mark.parametrize("validate", ["full", "sampled", "off"])
+@pytest.mark.parametrize(
+    "model_name, data",
+    [("mods", MODS), ("mods", {}), ("tags", ["attribute", "default"]), ("tags", [])],
+)
+def test_streamed_files_are_the_files_of_the_whole_object(tmp_path, monkeypatch, backend, validate, model_name, data):
+    if backend == "fast":
+        pytest.importorskip("orjson")
+    monkeypatch.setattr(util.writer_options, "json_backend", get_backend(backend))
+    monkeypatch.setattr(util.writer_options, "validate", validate)
+    whole, streamed = str(tmp_path / "whole") + os.sep, str(tmp_path / "streamed") + os.sep
+    os.makedirs(whole)
+    if validate == "full":
+        write_model(import_module("RePoE.model." + model_name).Model(data), whole, model_name)
+    else:
+        util.write_plain(data, whole, model_name)
+    entries = data if isinstance(data, list) else data.items()
+    util.write_json_stream(entries, streamed, model_name, array=isinstance(data, list))
+    for extension in [".json", ".min.json"]:
+        assert _read(streamed + model_name + extension) == _read(whole + model_name + extension)
+    assert os.listdir(streamed) == os.listdir(whole)
+
+
+def test_failed_streams_leave_the_previous_files(tmp_path):
+    data_path = str(tmp_path) + os.sep
+    util.write_json_stream(["attribute"], data_path, "tags", array=True)
+    with pytest.raises(ValueError):
+        with util.JsonStreamWriter(data_path, "tags", array=True) as writer:
+            writer.append("default")
+            raise ValueError("the module failed")
+    assert _read(data_path + "tags.json") == b'[\n  "attribute"\n]'
+    assert sorted(os.listdir(data_path)) == ["tags.json", "tags.min.json"]
+
+
+def _fail() -> None:
+    raise ValueError("the serializer failed")
+
+
+def test_failed_background_writes_are_raised_by_drain_writes(tmp_path, monkeypatch):
+    monkeypatch.setattr(util.writer_options, "write_behind", 2)
+    data_path = str(tmp_path) + os.sep
+    with manifest.recording() as files:
+        util.write_any_json({"a": 1}, data_path, "written")
+        util.write_behind(_fail, "broken")
+        with pytest.raises(RuntimeError, match="Writing broken failed"):
+            util.drain_writes()
+    # the files written in the background are recorded in this process
+    assert set(files) == {data_path + "written.json", data_path + "written.min.json"}
+    assert not util._pending_writes
+
+
+def test_samples_are_random_subsets():
+    entries = {f"Strength{i}": i for i in range(10)}
+    sampled = util.sample(entries, 3)
+    assert len(sampled) == 3 and sampled.items() <= entries.items()
+    assert set(util.sample(list(range(10)), 3)) <= set(range(10))
+    assert util.sample(entries, 10) is entries
+    assert util.sample("text", 1) == "text"
+
+
+@pytest.mark.parametrize(
+    "model_name, valid, invalid",
+    [
+        # streamed one entry at a time
+        ("mods", MODS, {**MODS, "Broken1": {**MODS["Strength1"], "required_level": "high"}}),
+        # sampled from the whole object
+        ("gem_tags", {"fire": "Fire"}, {"fire": "Fire", "Broken1": 1}),
+    ],
+)
+def test_sampled_validation_rejects_invalid_entries_it_samples(tmp_path, monkeypatch, model_name, valid, invalid):
+    monkeypatch.setattr(util.writer_options, "validate", "sampled")
+    data_path = str(tmp_path) + os.sep
+    util.write_json(valid, data_path, model_name)
+    with pytest.raises(ValueError):
+        util.write_json(invalid, data_path, model_name)
+    # the files of the last valid write are left as they were
+    assert b"Broken1" not in _read(data_path + model_name + ".json")
+    assert sorted(os.listdir(data_path)) == [model_name + ".json", model_name + ".min.json"]
+
+    monkeypatch.setattr(util.writer_options, "validate", "off")
+    util.write_json(invalid, data_path, model_name)
+    assert b"Broken1" in _read(data_path + model_name + ".json")
+
+
+def test_streams_validate_a_sample_of_their_entries(tmp_path, monkeypatch):
+    monkeypatch.setattr(util.writer_options, "validate", "sampled")
+    monkeypatch.setattr(util.writer_options, "sample_size", 5)
+    entries = [f"tag{i}" for i in range(100)]
+    with util.JsonStreamWriter(str(tmp_path) + os.sep, "tags", array=True) as writer:
+        for entry in entries:
+            writer.append(entry)
+    assert writer.seen == 100
+    assert len(writer.sample) == 5 and {tag for [tag] in writer.sample} <= set(entries)